@@ -0,0 +1,105 @@
+# Batched evaluation of sibling nodes with NumPy.
+# two plies above the leaves a MIN node has a child for every empty cell, every child is a MAX node which moves the
+# board in the four directions and evaluates the results. instead of a recursive call per child and per move, all the
+# children of the MIN node are stacked into a single array of packed boards (see bitboard.py) and the moves and the
+# fused row tables of the evaluator (see evaluation.py) are applied to the whole array at once.
+# NumPy is optional, without it BatchEvaluator can't be created and the search stays on the recursive path.
+import bitboard
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+_move_tables = None
+# the fused tables of the evaluators as arrays by the key of the weights of the evaluator, of the last
+# MAX_CACHED_EVALUATORS weights
+MAX_CACHED_EVALUATORS = 8
+_evaluator_arrays = {}
+
+
+def available() -> bool:
+    return np is not None
+
+
+def _tables():
+    # the row tables as arrays, built on first use
+    global _move_tables
+    if _move_tables is None:
+        _move_tables = (np.array(bitboard.ROW_LEFT, dtype='<u2'), np.array(bitboard.ROW_RIGHT, dtype='<u2'))
+    return _move_tables
+
+
+def _rows(boards):
+    # (n, 4) array of the rows of the boards, row i of a board is its i-th little endian 16 bits word
+    return boards.astype('<u8').view('<u2').reshape(-1, bitboard.SIZE)
+
+
+def _from_rows(rows):
+    return np.ascontiguousarray(rows, dtype='<u2').view('<u8').ravel()
+
+
+def transpose(boards):
+    # bitboard.transpose on an array of boards
+    a1 = boards & np.uint64(0xF0F00F0FF0F00F0F)
+    a2 = boards & np.uint64(0x0000F0F00000F0F0)
+    a3 = boards & np.uint64(0x0F0F00000F0F0000)
+    a = a1 | (a2 << np.uint64(12)) | (a3 >> np.uint64(12))
+    b1 = a & np.uint64(0xFF00FF0000FF00FF)
+    b2 = a & np.uint64(0x00FF00FF00000000)
+    b3 = a & np.uint64(0x00000000FF00FF00)
+    return b1 | (b2 >> np.uint64(24)) | (b3 << np.uint64(24))
+
+
+def moves(boards):
+    # the boards after each of the moves up, down, left and right, stacked in this order into a single array
+    row_left, row_right = _tables()
+    rows = _rows(boards)
+    columns = _rows(transpose(boards))
+    return np.concatenate((transpose(_from_rows(row_left[columns])), transpose(_from_rows(row_right[columns])),
+                           _from_rows(row_left[rows]), _from_rows(row_right[rows])))
+
+
+class BatchEvaluator:
+    """Evaluator.evaluate on arrays of packed boards,
+    evaluate_max_children returns the values of all the MAX children of a MIN node one ply above the leaves.
+    """
+
+    def __init__(self, evaluator):
+        if np is None:
+            raise ImportError('batch evaluation requires numpy')
+        _tables()
+        if evaluator.key not in _evaluator_arrays:
+            if len(_evaluator_arrays) >= MAX_CACHED_EVALUATORS:
+                del _evaluator_arrays[next(iter(_evaluator_arrays))]
+            # the table of every row of the board by its place, border rows first and last
+            _evaluator_arrays[evaluator.key] = (np.array(evaluator.row_tables, dtype=np.float64),
+                                                np.array(evaluator.columns, dtype=np.float64),
+                                                [(weight, np.array(table, dtype=np.float64))
+                                                 for weight, table in evaluator.maxima])
+        self.row_tables, self.columns, self.maxima = _evaluator_arrays[evaluator.key]
+
+    def evaluate(self, boards):
+        rows = _rows(boards)
+        columns = _rows(transpose(boards))
+        values = self.row_tables[np.arange(bitboard.SIZE), rows].sum(axis=1) + self.columns[columns].sum(axis=1)
+        for weight, table in self.maxima:
+            values = values + weight * table[rows].max(axis=1)
+        return values
+
+    def evaluate_max_children(self, board: int, value: int = 2, shifts=None):
+        # the children are the boards with value in one of the empty cells, in the order of bitboard.empty_shifts
+        # (or of shifts if they are given).
+        # the value of a child is the max over its legal moves of the moved board, a child without legal moves is
+        # terminal and its value is its own evaluation. returns the values and the terminal flags of the children
+        exponent = bitboard.exponent_of(value)
+        if shifts is None:
+            shifts = bitboard.empty_shifts(board)
+        children = np.array([board | (exponent << shift) for shift in shifts], dtype=np.uint64)
+        moved = moves(children)
+        legal = (moved != np.tile(children, 4)).reshape(4, -1)
+        values = np.where(legal, self.evaluate(moved).reshape(4, -1), -np.inf).max(axis=0)
+        terminal = ~legal.any(axis=0)
+        if terminal.any():
+            values = np.where(terminal, self.evaluate(children), values)
+        return values.tolist(), terminal.tolist()
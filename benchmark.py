@@ -0,0 +1,211 @@
+# Benchmark of the search of the players on a fixed corpus of boards.
+# every player of players.py plays every board of CORPUS a few times with a fixed time per move. the report has the
+# latency percentiles of get_move / get_indices, and for the search players (BitHELPER) the nodes per second, the
+# depth reached and the time to complete every depth. the peak memory of a single call is measured in a separate run
+# with tracemalloc, which slows the search down. every turn is played by a new player, so no turn reuses the
+# transposition table, the cache or the depths of the turns before it. the report is written as json, and compared with the report of an
+# older run (-baseline) the regressions are printed and the exit code is 1.
+# with -sizes the search players also play random boards of every size (see bigboard.py), the report has their nodes
+# per second and depth reached by the size of the board.
+#   python benchmark.py -move_time 0.2 -repeats 5 -output bench.json -baseline old_bench.json
+#   python benchmark.py -move_time 0.2 -sizes 4 5 6 8
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+import players
+import submission
+
+# reference boards by the stage of the game
+CORPUS = {
+    'early': [
+        [[0, 0, 0, 0], [0, 2, 0, 0], [0, 0, 0, 0], [0, 0, 2, 0]],
+        [[2, 0, 0, 0], [4, 0, 0, 0], [0, 0, 2, 0], [0, 0, 0, 4]],
+        [[8, 4, 2, 0], [2, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 2]],
+    ],
+    'mid': [
+        [[64, 32, 16, 4], [8, 8, 2, 0], [2, 0, 0, 0], [0, 0, 0, 2]],
+        [[2, 4, 8, 16], [0, 2, 32, 64], [0, 0, 4, 128], [0, 0, 0, 2]],
+        [[128, 64, 8, 2], [16, 32, 4, 0], [4, 2, 0, 0], [2, 0, 0, 0]],
+    ],
+    'late': [
+        [[1024, 512, 256, 128], [8, 16, 32, 64], [4, 2, 8, 2], [2, 4, 0, 0]],
+        [[2, 512, 1024, 2048], [4, 8, 64, 256], [2, 16, 32, 4], [0, 2, 4, 2]],
+        [[256, 128, 64, 32], [2, 4, 8, 16], [4, 2, 4, 2], [2, 0, 2, 4]],
+    ],
+}
+
+# the boards of the benchmark by size, for every stage the part of the cells with tiles and the biggest exponent
+SIZE_STAGES = {'early': (0.2, 3), 'mid': (0.5, 7), 'late': (0.8, 10)}
+SIZE_BOARDS = 3
+
+# a regression is flagged when a latency percentile grows, or the nodes per second drop, by more than this fraction
+REGRESSION_TOLERANCE = 0.2
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    k = (len(ordered) - 1) * p / 100
+    low = int(k)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (k - low)
+
+
+def _turn(player, board, move_time):
+    if isinstance(player, submission.AbstractIndexPlayer):
+        return player.get_indices([row[:] for row in board], 2, move_time)
+    return player.get_move([row[:] for row in board], move_time)
+
+
+def bench_player(player_class, move_time, repeats):
+    searching = isinstance(getattr(player_class(), 'helper_fun', None), submission.BitHELPER)
+    latencies = []
+    stages = {}
+    nodes = 0
+    search_seconds = 0.0
+    depth_times = {}
+    for stage, boards in CORPUS.items():
+        stage_latencies = []
+        depths = []
+        for board in boards:
+            for _ in range(repeats):
+                player = player_class()
+                started = time.perf_counter()
+                _turn(player, board, move_time)
+                elapsed = time.perf_counter() - started
+                stage_latencies.append(elapsed)
+                if searching:
+                    helper = player.helper_fun
+                    nodes += helper.nodes
+                    search_seconds += elapsed
+                    depths.append(len(helper.nodesPerDepth) - len(helper.reusedDepths))
+                    for D, seconds in enumerate(helper.depthTimes, 1):
+                        if D not in helper.reusedDepths:
+                            depth_times.setdefault(D, []).append(seconds)
+        latencies += stage_latencies
+        stages[stage] = {'p50': percentile(stage_latencies, 50), 'p95': percentile(stage_latencies, 95),
+                         'mean_depth': statistics.mean(depths) if depths else None}
+    # peak memory of a single call on every board, in a separate run since tracemalloc slows the search
+    peak = 0
+    for boards in CORPUS.values():
+        for board in boards:
+            tracemalloc.start()
+            _turn(player_class(), board, move_time)
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+    return {'p50': percentile(latencies, 50), 'p95': percentile(latencies, 95), 'p99': percentile(latencies, 99),
+            'max': max(latencies), 'stages': stages,
+            'nodes_per_second': nodes / search_seconds if searching and search_seconds else None,
+            'time_to_depth': {D: statistics.median(seconds) for D, seconds in sorted(depth_times.items())},
+            'peak_memory_bytes': peak}
+
+
+def size_corpus(size, seed=0):
+    # SIZE_BOARDS random boards of size x size for every stage of SIZE_STAGES
+    rng = random.Random(seed)
+    corpus = {}
+    for stage, (filled, max_exponent) in SIZE_STAGES.items():
+        corpus[stage] = []
+        for _ in range(SIZE_BOARDS):
+            board = [[0] * size for _ in range(size)]
+            cells = rng.sample(range(size * size), max(2, int(filled * size * size)))
+            for cell in cells:
+                board[cell // size][cell % size] = 2 ** rng.randint(1, max_exponent)
+            corpus[stage].append(board)
+    return corpus
+
+
+def bench_sizes(sizes, move_time, repeats, names=None):
+    # the nodes per second, the depth reached and the median latency of the search players by the size of the board
+    report = {}
+    for size in sizes:
+        corpus = size_corpus(size)
+        report[size] = {}
+        for name, player_class in list(players.move_players.items()) + list(players.index_players.items()):
+            if names and name not in names:
+                continue
+            if not isinstance(getattr(player_class(), 'helper_fun', None), submission.BitHELPER):
+                continue
+            nodes = 0
+            latencies = []
+            depths = []
+            for boards in corpus.values():
+                for board in boards:
+                    for _ in range(repeats):
+                        player = player_class()
+                        started = time.perf_counter()
+                        _turn(player, board, move_time)
+                        latencies.append(time.perf_counter() - started)
+                        nodes += player.helper_fun.nodes
+                        depths.append(len(player.helper_fun.nodesPerDepth))
+            report[size][name] = {'nodes_per_second': nodes / sum(latencies), 'mean_depth': statistics.mean(depths),
+                                  'p50': percentile(latencies, 50)}
+    return report
+
+
+def run(move_time, repeats, names=None):
+    report = {'meta': {'python': sys.version.split()[0], 'platform': platform.platform(), 'time': time.time(),
+                       'move_time': move_time, 'repeats': repeats},
+              'players': {}}
+    for name, player_class in list(players.move_players.items()) + list(players.index_players.items()):
+        if names and name not in names:
+            continue
+        report['players'][name] = bench_player(player_class, move_time, repeats)
+    return report
+
+
+def regressions(report, baseline, tolerance=REGRESSION_TOLERANCE):
+    # the differences from the baseline beyond the tolerance, as readable lines
+    found = []
+    for name, result in report['players'].items():
+        old = baseline.get('players', {}).get(name)
+        if old is None:
+            continue
+        for key in ('p50', 'p95', 'p99'):
+            if old[key] and result[key] > old[key] * (1 + tolerance):
+                found.append(f'{name}: {key} latency {old[key]:.4f}s -> {result[key]:.4f}s')
+        if old.get('nodes_per_second') and result['nodes_per_second'] is not None and \
+                result['nodes_per_second'] < old['nodes_per_second'] * (1 - tolerance):
+            found.append(f"{name}: nodes/s {old['nodes_per_second']:.0f} -> {result['nodes_per_second']:.0f}")
+    return found
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-move_time', default=0.2, type=float, help='Time (sec) for each turn.')
+    parser.add_argument('-repeats', default=3, type=int, help='Number of turns on every board of the corpus.')
+    parser.add_argument('-players', default=None, nargs='*', help='Names of the players to benchmark (default all).')
+    parser.add_argument('-output', default=None, type=str, help='File to write the report (json).')
+    parser.add_argument('-baseline', default=None, type=str, help='Report of an older run to compare with.')
+    parser.add_argument('-sizes', default=None, nargs='*', type=int,
+                        help='Sizes of the boards of the benchmark of the search players by size.')
+    args = parser.parse_args()
+
+    report = run(args.move_time, args.repeats, args.players)
+    if args.sizes:
+        report['sizes'] = bench_sizes(args.sizes, args.move_time, args.repeats, args.players)
+        for size, results in report['sizes'].items():
+            for name, result in results.items():
+                print(f"{size}x{size} {name}: {result['nodes_per_second']:.0f} nodes/s, "
+                      f"depth {result['mean_depth']:.1f}, p50 {result['p50']:.4f}s")
+    for name, result in report['players'].items():
+        nodes_per_second = result['nodes_per_second']
+        print(f"{name}: p50 {result['p50']:.4f}s p95 {result['p95']:.4f}s p99 {result['p99']:.4f}s"
+              + (f', {nodes_per_second:.0f} nodes/s' if nodes_per_second else '')
+              + f", peak {result['peak_memory_bytes'] / 2 ** 20:.1f} MB")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = regressions(report, json.load(f))
+        for line in found:
+            print('REGRESSION', line)
+        if found:
+            sys.exit(1)
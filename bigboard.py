@@ -0,0 +1,213 @@
+# Packed boards of any size for the search players.
+# a board of SIZE x SIZE tiles is packed like a 4x4 board in bitboard.py: 4 bits per tile holding the exponent of its
+# value, row i in the ROW_BITS = 4*SIZE bits starting at ROW_BITS*i and the tile (i, j) in the 4 bits starting at
+# ROW_BITS*i + 4*j. the packed board is a single int of more than 64 bits (a python int of several words, four words
+# for 8x8), so adding a tile, the empty cells and the key of the transposition table work on it as on a 4x4 board.
+# a row of SIZE tiles has 2**(4*SIZE) possible values, too many for full tables beyond 4 tiles, so the moves, the
+# transposition and the features of a row are computed on its first use and kept by the row. a game uses only a tiny
+# part of all the rows, so almost every row of the search is found in the tables.
+# a Geometry has the functions of the module bitboard that the search uses, and geometry(4) is the module bitboard
+# itself, so the search (see submission.BitHELPER) runs on any size by the functions of its geometry.
+import bitboard
+
+# the tables of a geometry are emptied when they get this number of rows
+MAX_CACHED_ROWS = 1 << 20
+
+# the geometries by size, the tables of the rows are shared by all the players of a size
+_geometries = {bitboard.SIZE: bitboard}
+
+
+def geometry(size: int):
+    if size not in _geometries:
+        _geometries[size] = Geometry(size)
+    return _geometries[size]
+
+
+class Geometry:
+    """Packed boards of SIZE x SIZE tiles,
+    the same functions as the module bitboard: pack / unpack between the nested lists and the packed board, the moves
+    up, down, left and right returning (new_board, done, score), all_moves, the empty cells and the rows.
+    """
+
+    def __init__(self, size: int):
+        if size < 2:
+            raise ValueError(f'a board of size {size} is too small')
+        self.SIZE = size
+        self.ROW_BITS = 4 * size
+        self.ROW_MASK = (1 << self.ROW_BITS) - 1
+        # the lowest bit of every tile
+        self.TILES_LOW_BITS = sum(1 << (4 * k) for k in range(size * size))
+        # row: (left, right, score of left, score of right)
+        self._moves = {}
+        # row: the row as a column of the transposed board, tile j moved to the bits of row j
+        self._spread = {}
+        # row: (empty, filled, filled at the ends, max value, equal pairs, monotonic, tiles sum) like the feature
+        # tables of bitboard
+        self._features = {}
+
+    def _exponents(self, row):
+        return [(row >> (4 * j)) & 0xF for j in range(self.SIZE)]
+
+    def _row(self, exponents):
+        row = 0
+        for j, exponent in enumerate(exponents):
+            row |= exponent << (4 * j)
+        return row
+
+    def row_moves(self, row: int):
+        moves = self._moves.get(row)
+        if moves is None:
+            if len(self._moves) >= MAX_CACHED_ROWS:
+                self._moves.clear()
+            exponents = self._exponents(row)
+            moved_left, score_left = bitboard.slide_left(exponents)
+            moved_right, score_right = bitboard.slide_left(exponents[::-1])
+            moves = self._moves[row] = (self._row(moved_left), self._row(moved_right[::-1]), score_left, score_right)
+        return moves
+
+    def row_features(self, row: int):
+        features = self._features.get(row)
+        if features is None:
+            if len(self._features) >= MAX_CACHED_ROWS:
+                self._features.clear()
+            values = [2 ** exponent if exponent else 0 for exponent in self._exponents(row)]
+            empty = values.count(0)
+            features = self._features[row] = (
+                empty, self.SIZE - empty, (values[0] > 0) + (values[-1] > 0), max(values),
+                sum(1 for j in range(self.SIZE - 1) if values[j] == values[j + 1]),
+                1 if bitboard.is_monotonic_row(values) else 0,
+                sum(value for value in values if value != 0 and value != 2))
+        return features
+
+    def pack(self, board) -> int:
+        if len(board) != self.SIZE or any(len(row) != self.SIZE for row in board):
+            raise ValueError(f'the board is not {self.SIZE}x{self.SIZE}')
+        bit_board = 0
+        for i in range(self.SIZE):
+            for j in range(self.SIZE):
+                value = board[i][j]
+                if value:
+                    exponent = value.bit_length() - 1
+                    if value != 1 << exponent or not 0 < exponent <= bitboard.MAX_EXPONENT:
+                        raise ValueError(f'tile {value} can not be packed')
+                    bit_board |= exponent << (self.ROW_BITS * i + 4 * j)
+        return bit_board
+
+    def unpack(self, bit_board: int):
+        return [[2 ** exponent if exponent else 0 for exponent in self._exponents(row)] for row in self.rows(bit_board)]
+
+    @staticmethod
+    def exponent_of(value: int) -> int:
+        return value.bit_length() - 1
+
+    def get_tile(self, bit_board: int, i: int, j: int) -> int:
+        exponent = (bit_board >> (self.ROW_BITS * i + 4 * j)) & 0xF
+        return 2 ** exponent if exponent else 0
+
+    def set_tile(self, bit_board: int, i: int, j: int, value: int) -> int:
+        # put value in an empty cell
+        return bit_board | (self.exponent_of(value) << (self.ROW_BITS * i + 4 * j))
+
+    def rows(self, bit_board: int):
+        row_bits, row_mask = self.ROW_BITS, self.ROW_MASK
+        return tuple((bit_board >> (row_bits * i)) & row_mask for i in range(self.SIZE))
+
+    def from_rows(self, rows) -> int:
+        bit_board = 0
+        for i, row in enumerate(rows):
+            bit_board |= row << (self.ROW_BITS * i)
+        return bit_board
+
+    def _spread_row(self, row):
+        spread = self._spread.get(row)
+        if spread is None:
+            if len(self._spread) >= MAX_CACHED_ROWS:
+                self._spread.clear()
+            spread = 0
+            for j, exponent in enumerate(self._exponents(row)):
+                spread |= exponent << (self.ROW_BITS * j)
+            self._spread[row] = spread
+        return spread
+
+    def transpose(self, bit_board: int) -> int:
+        # swap the tile (i, j) with the tile (j, i), row i of the board is column i of the transposed board
+        transposed = 0
+        for i, row in enumerate(self.rows(bit_board)):
+            if row:
+                transposed |= self._spread_row(row) << (4 * i)
+        return transposed
+
+    def _move_rows(self, bit_board, side):
+        new_rows = []
+        score = 0
+        for row in self.rows(bit_board):
+            moves = self.row_moves(row)
+            new_rows.append(moves[side])
+            score += moves[side + 2]
+        return self.from_rows(new_rows), score
+
+    def left(self, bit_board: int):
+        new_board, score = self._move_rows(bit_board, 0)
+        return new_board, new_board != bit_board, score
+
+    def right(self, bit_board: int):
+        new_board, score = self._move_rows(bit_board, 1)
+        return new_board, new_board != bit_board, score
+
+    def up(self, bit_board: int):
+        # the columns of the board are the rows of the transposed board
+        new_board, score = self._move_rows(self.transpose(bit_board), 0)
+        new_board = self.transpose(new_board)
+        return new_board, new_board != bit_board, score
+
+    def down(self, bit_board: int):
+        new_board, score = self._move_rows(self.transpose(bit_board), 1)
+        new_board = self.transpose(new_board)
+        return new_board, new_board != bit_board, score
+
+    def all_moves(self, bit_board: int):
+        # the boards after the moves up, down, left and right (the same board if the move is illegal)
+        rows = [self.row_moves(row) for row in self.rows(bit_board)]
+        columns = [self.row_moves(column) for column in self.rows(self.transpose(bit_board))]
+        return (self.transpose(self.from_rows(moves[0] for moves in columns)),
+                self.transpose(self.from_rows(moves[1] for moves in columns)),
+                self.from_rows(moves[0] for moves in rows), self.from_rows(moves[1] for moves in rows))
+
+    def empty_mask(self, bit_board: int) -> int:
+        # the lowest bit of every empty tile is on
+        x = bit_board | (bit_board >> 1)
+        x |= x >> 2
+        return ~x & self.TILES_LOW_BITS
+
+    def count_empty(self, bit_board: int) -> int:
+        return bin(self.empty_mask(bit_board)).count('1')
+
+    def empty_shifts(self, bit_board: int):
+        # the bit offsets (ROW_BITS*i + 4*j) of the empty tiles in raster order
+        mask = self.empty_mask(bit_board)
+        shifts = []
+        while mask:
+            low = mask & -mask
+            shifts.append(low.bit_length() - 1)
+            mask ^= low
+        return shifts
+
+    def empty_cells(self, bit_board: int):
+        return [self.cell_of(shift) for shift in self.empty_shifts(bit_board)]
+
+    def cell_of(self, shift: int):
+        # the cell (i, j) of the bit offset of a tile
+        i, bits = divmod(shift, self.ROW_BITS)
+        return i, bits >> 2
+
+    def can_move(self, bit_board: int) -> bool:
+        # a move is legal if one of the rows or the columns changes by moving it left or right
+        for row in self.rows(bit_board) + self.rows(self.transpose(bit_board)):
+            moves = self.row_moves(row)
+            if moves[0] != row or moves[1] != row:
+                return True
+        return False
+
+    def tiles_sum(self, bit_board: int) -> int:
+        # the board score of isGoal, the sum of the tiles bigger than two
+        return sum(self.row_features(row)[6] for row in self.rows(bit_board))
@@ -0,0 +1,266 @@
+# Packed board engine for the search players.
+# a 4x4 board is packed into a single int of 64 bits, 4 bits per tile. every tile holds the exponent of its value
+# (0 for an empty cell, k for the value 2**k), so the biggest tile that can be packed is 2**15 = 32768.
+# row i of the board is kept in bits [16*i, 16*i + 16) and the tile (i, j) in the 4 bits starting at 16*i + 4*j.
+# all the moves are done a row at a time with precomputed tables of the 65536 possible rows, the functions
+# {up,down,left,right} receive a packed board and return tuple of (new_board, done, score) like the functions of logic.
+
+SIZE = 4
+ROW_MASK = 0xFFFF
+MAX_EXPONENT = 15
+# the lowest bit of every tile
+TILES_LOW_BITS = 0x1111111111111111
+
+
+def _row_to_exponents(row):
+    return [(row >> (4 * j)) & 0xF for j in range(SIZE)]
+
+
+def _exponents_to_row(exponents):
+    row = 0
+    for j, exponent in enumerate(exponents):
+        row |= exponent << (4 * j)
+    return row
+
+
+def _reverse_row(row):
+    return _exponents_to_row(list(reversed(_row_to_exponents(row))))
+
+
+def slide_left(exponents):
+    # same as logic.left on a single row: cover up, merge every equal pair once from the left and cover up again.
+    # two tiles of 2**15 are not merged since the result can't be packed
+    tiles = [exponent for exponent in exponents if exponent != 0]
+    result = []
+    score = 0
+    k = 0
+    while k < len(tiles):
+        if k + 1 < len(tiles) and tiles[k] == tiles[k + 1] and tiles[k] < MAX_EXPONENT:
+            result.append(tiles[k] + 1)
+            score += 2 ** (tiles[k] + 1)
+            k += 2
+        else:
+            result.append(tiles[k])
+            k += 1
+    return result + [0] * (len(exponents) - len(result)), score
+
+
+def _build_move_tables():
+    row_left = [0] * (1 << 16)
+    row_right = [0] * (1 << 16)
+    score_left = [0] * (1 << 16)
+    score_right = [0] * (1 << 16)
+    for row in range(1 << 16):
+        exponents = _row_to_exponents(row)
+        moved, score = slide_left(exponents)
+        row_left[row] = _exponents_to_row(moved)
+        score_left[row] = score
+        moved, score = slide_left(exponents[::-1])
+        row_right[row] = _exponents_to_row(moved[::-1])
+        score_right[row] = score
+    return row_left, row_right, score_left, score_right
+
+
+# ROW_LEFT[row] / ROW_RIGHT[row] is the row after the move, ROW_SCORE_*[row] is the sum of the merged tiles
+ROW_LEFT, ROW_RIGHT, ROW_SCORE_LEFT, ROW_SCORE_RIGHT = _build_move_tables()
+
+
+def is_monotonic_row(values):
+    # same check as HELPER.isMonotonic for a single row
+    rise = True
+    for j in range(0, len(values) - 1):
+        if values[j] > values[j + 1] and rise:
+            continue
+        elif values[j] > values[j + 1] and not rise:
+            return False
+        elif j == 0 and values[j] < values[j + 1]:
+            rise = False
+    return True
+
+
+def _build_feature_tables():
+    row_empty = [0] * (1 << 16)
+    row_filled = [0] * (1 << 16)
+    row_filled_ends = [0] * (1 << 16)
+    row_max = [0] * (1 << 16)
+    row_pairs = [0] * (1 << 16)
+    row_monotonic = [0] * (1 << 16)
+    row_tiles_sum = [0] * (1 << 16)
+    for row in range(1 << 16):
+        values = [2 ** exponent if exponent else 0 for exponent in _row_to_exponents(row)]
+        row_empty[row] = values.count(0)
+        row_filled[row] = SIZE - row_empty[row]
+        row_filled_ends[row] = (values[0] > 0) + (values[-1] > 0)
+        row_max[row] = max(values)
+        row_pairs[row] = sum(1 for j in range(SIZE - 1) if values[j] == values[j + 1])
+        row_monotonic[row] = 1 if is_monotonic_row(values) else 0
+        row_tiles_sum[row] = sum(value for value in values if value != 0 and value != 2)
+    return row_empty, row_filled, row_filled_ends, row_max, row_pairs, row_monotonic, row_tiles_sum
+
+
+# features of a single row used by the heuristics: empty cells, non empty cells, non empty cells in the two ends of
+# the row, max value, adjacent equal pairs (empty cells included), 1 if the row is monotonic and the sum of all the
+# tiles which are bigger than 2
+ROW_EMPTY, ROW_FILLED, ROW_FILLED_ENDS, ROW_MAX, ROW_PAIRS, ROW_MONOTONIC, ROW_TILES_SUM = _build_feature_tables()
+
+
+def pack(board) -> int:
+    if len(board) != SIZE or any(len(row) != SIZE for row in board):
+        raise ValueError(f'bitboard supports only {SIZE}x{SIZE} boards')
+    bit_board = 0
+    for i in range(SIZE):
+        for j in range(SIZE):
+            value = board[i][j]
+            if value:
+                exponent = value.bit_length() - 1
+                if value != 1 << exponent or not 0 < exponent <= MAX_EXPONENT:
+                    raise ValueError(f'tile {value} can not be packed')
+                bit_board |= exponent << (16 * i + 4 * j)
+    return bit_board
+
+
+def unpack(bit_board: int):
+    board = []
+    for i in range(SIZE):
+        row = (bit_board >> (16 * i)) & ROW_MASK
+        board.append([2 ** exponent if exponent else 0 for exponent in _row_to_exponents(row)])
+    return board
+
+
+def exponent_of(value: int) -> int:
+    return value.bit_length() - 1
+
+
+def get_tile(bit_board: int, i: int, j: int) -> int:
+    exponent = (bit_board >> (16 * i + 4 * j)) & 0xF
+    return 2 ** exponent if exponent else 0
+
+
+def set_tile(bit_board: int, i: int, j: int, value: int) -> int:
+    # put value in an empty cell
+    return bit_board | (exponent_of(value) << (16 * i + 4 * j))
+
+
+def rows(bit_board: int):
+    return (bit_board & ROW_MASK, (bit_board >> 16) & ROW_MASK,
+            (bit_board >> 32) & ROW_MASK, (bit_board >> 48) & ROW_MASK)
+
+
+def transpose(bit_board: int) -> int:
+    # swap the tile (i, j) with the tile (j, i) by moving 2x2 blocks of tiles and then the tiles inside the blocks
+    a1 = bit_board & 0xF0F00F0FF0F00F0F
+    a2 = bit_board & 0x0000F0F00000F0F0
+    a3 = bit_board & 0x0F0F00000F0F0000
+    a = a1 | (a2 << 12) | (a3 >> 12)
+    b1 = a & 0xFF00FF0000FF00FF
+    b2 = a & 0x00FF00FF00000000
+    b3 = a & 0x00000000FF00FF00
+    return b1 | (b2 >> 24) | (b3 << 24)
+
+
+# ROW_REVERSE[row] is the row in the reverse order of its tiles
+ROW_REVERSE = [_reverse_row(row) for row in range(1 << 16)]
+
+
+def mirror(bit_board: int) -> int:
+    # swap the tile (i, j) with the tile (i, SIZE - 1 - j)
+    return ROW_REVERSE[bit_board & ROW_MASK] | (ROW_REVERSE[(bit_board >> 16) & ROW_MASK] << 16) | \
+        (ROW_REVERSE[(bit_board >> 32) & ROW_MASK] << 32) | (ROW_REVERSE[(bit_board >> 48) & ROW_MASK] << 48)
+
+
+def flip(bit_board: int) -> int:
+    # swap the row i with the row SIZE - 1 - i
+    return ((bit_board & ROW_MASK) << 48) | (((bit_board >> 16) & ROW_MASK) << 32) | \
+        (((bit_board >> 32) & ROW_MASK) << 16) | ((bit_board >> 48) & ROW_MASK)
+
+
+def _move_rows(bit_board, row_table, score_table):
+    r0 = bit_board & ROW_MASK
+    r1 = (bit_board >> 16) & ROW_MASK
+    r2 = (bit_board >> 32) & ROW_MASK
+    r3 = (bit_board >> 48) & ROW_MASK
+    new_board = row_table[r0] | (row_table[r1] << 16) | (row_table[r2] << 32) | (row_table[r3] << 48)
+    score = score_table[r0] + score_table[r1] + score_table[r2] + score_table[r3]
+    return new_board, score
+
+
+def left(bit_board: int):
+    new_board, score = _move_rows(bit_board, ROW_LEFT, ROW_SCORE_LEFT)
+    return new_board, new_board != bit_board, score
+
+
+def right(bit_board: int):
+    new_board, score = _move_rows(bit_board, ROW_RIGHT, ROW_SCORE_RIGHT)
+    return new_board, new_board != bit_board, score
+
+
+def up(bit_board: int):
+    # the columns of the board are the rows of the transposed board
+    new_board, score = _move_rows(transpose(bit_board), ROW_LEFT, ROW_SCORE_LEFT)
+    new_board = transpose(new_board)
+    return new_board, new_board != bit_board, score
+
+
+def down(bit_board: int):
+    new_board, score = _move_rows(transpose(bit_board), ROW_RIGHT, ROW_SCORE_RIGHT)
+    new_board = transpose(new_board)
+    return new_board, new_board != bit_board, score
+
+
+def all_moves(bit_board: int):
+    # the boards after the moves up, down, left and right (the same board if the move is illegal), the rows and the
+    # columns are taken once for the four moves
+    r0, r1, r2, r3 = rows(bit_board)
+    c0, c1, c2, c3 = rows(transpose(bit_board))
+    return (transpose(ROW_LEFT[c0] | (ROW_LEFT[c1] << 16) | (ROW_LEFT[c2] << 32) | (ROW_LEFT[c3] << 48)),
+            transpose(ROW_RIGHT[c0] | (ROW_RIGHT[c1] << 16) | (ROW_RIGHT[c2] << 32) | (ROW_RIGHT[c3] << 48)),
+            ROW_LEFT[r0] | (ROW_LEFT[r1] << 16) | (ROW_LEFT[r2] << 32) | (ROW_LEFT[r3] << 48),
+            ROW_RIGHT[r0] | (ROW_RIGHT[r1] << 16) | (ROW_RIGHT[r2] << 32) | (ROW_RIGHT[r3] << 48))
+
+
+def empty_mask(bit_board: int) -> int:
+    # the lowest bit of every empty tile is on
+    x = bit_board | (bit_board >> 1)
+    x |= x >> 2
+    return ~x & TILES_LOW_BITS
+
+
+def count_empty(bit_board: int) -> int:
+    return bin(empty_mask(bit_board)).count('1')
+
+
+def empty_shifts(bit_board: int):
+    # the bit offsets (16*i + 4*j) of the empty tiles in raster order
+    mask = empty_mask(bit_board)
+    shifts = []
+    while mask:
+        low = mask & -mask
+        shifts.append(low.bit_length() - 1)
+        mask ^= low
+    return shifts
+
+
+def empty_cells(bit_board: int):
+    return [(shift >> 4, (shift & 0xF) >> 2) for shift in empty_shifts(bit_board)]
+
+
+def cell_of(shift: int):
+    # the cell (i, j) of the bit offset of a tile
+    return shift >> 4, (shift & 0xF) >> 2
+
+
+def can_move(bit_board: int) -> bool:
+    # a move is legal if one of the rows or the columns changes by moving it left or right
+    for row in rows(bit_board):
+        if ROW_LEFT[row] != row or ROW_RIGHT[row] != row:
+            return True
+    for column in rows(transpose(bit_board)):
+        if ROW_LEFT[column] != column or ROW_RIGHT[column] != column:
+            return True
+    return False
+
+
+def tiles_sum(bit_board: int) -> int:
+    # the board score of isGoal, the sum of the tiles bigger than two
+    r0, r1, r2, r3 = rows(bit_board)
+    return ROW_TILES_SUM[r0] + ROW_TILES_SUM[r1] + ROW_TILES_SUM[r2] + ROW_TILES_SUM[r3]
@@ -0,0 +1,313 @@
+# Opening and endgame book of the search players.
+# the book keeps the best move of the move player and the best cell of the index player for a set of positions, found
+# by a fixed depth search when the book is built. every position is kept once for the symmetries of the evaluator of
+# the search (see symmetry.py and cache.py), by its canonical board, and the answer is mapped back to the symmetry of
+# the board that is looked up. the book answers only the players that evaluate with the same evaluator (the same
+# weights, or the same n-tuple network), it keeps a digest of the key of the evaluator.
+# the file is opened with mmap and searched in place (binary search over sorted records of fixed size), so opening a
+# book costs nothing and the records are read only when a player looks up a board.
+# file format (little endian):
+#   header  MAGIC, version (H), search of the move records (16s), search of the index records (16s), digest of the
+#           evaluator (16s), symmetries (B, bit k for symmetry.SYMMETRIES[k]), count (Q)
+#   record  board (Q), kind (B), action (B), depth (B), pad byte, value (f)
+# the records are sorted by (board, kind), kind is MOVE or INDEX, action is the index of the move in Move or the cell
+# 4*i + j of the canonical board.
+# building a book of all the positions of the first 4 plies and the late positions of 20 games, on 8 processes:
+#   python book.py -output book.bin -plies 4 -games 20 -max_empty 3 -depth 3 -workers 8
+import argparse
+import concurrent.futures
+import hashlib
+import mmap
+import os
+import struct
+import bitboard
+import evaluation
+import symmetry
+from AbstractPlayers import Move
+
+MAGIC = b'2048BOOK'
+VERSION = 2
+HEADER = struct.Struct('<8sH16s16s16sBQ')
+RECORD = struct.Struct('<QBBBxf')
+# the board and the kind of a record, the key of the binary search
+RECORD_KEY = struct.Struct('<QB')
+
+MOVE = 0
+INDEX = 1
+MOVES = list(Move)
+# the same as submission.bit_commands, without importing the players
+_COMMANDS = {Move.UP: bitboard.up, Move.DOWN: bitboard.down, Move.LEFT: bitboard.left, Move.RIGHT: bitboard.right}
+
+# searches that give the same values, a book built with one of them answers players of the other
+_SAME_VALUES = {'AlphaBeta': 'RB_MINIMAX'}
+
+# the book of the players, opened by open_book
+_book = None
+
+
+def _same_search(search: str) -> str:
+    return _SAME_VALUES.get(search, search)
+
+
+def evaluator_digest(evaluator) -> bytes:
+    # the digest of the key of an evaluator (its weights, or the file of the network)
+    return hashlib.blake2b(repr(evaluator.key).encode(), digest_size=16).digest()
+
+
+def _symmetries_mask(symmetries) -> int:
+    return sum(1 << k for k, s in enumerate(symmetry.SYMMETRIES) if s in symmetries)
+
+
+class Book:
+    """Book file opened with mmap,
+    best_move / best_indices return the answer of the book for a packed board, or None if the board is not in the
+    book or the book was built with another search or another evaluator.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.file = open(path, 'rb')
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.data) < HEADER.size:
+            self.close()
+            raise ValueError(f'{path} is not a book')
+        magic, version, move_search, index_search, self.evaluatorDigest, mask, self.count = \
+            HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION or len(self.data) != HEADER.size + self.count * RECORD.size:
+            self.close()
+            raise ValueError(f'{path} is not a book of version {VERSION}')
+        self.searches = {MOVE: move_search.rstrip(b'\0').decode(), INDEX: index_search.rstrip(b'\0').decode()}
+        # the symmetries the positions were made canonical under, those of the evaluator
+        self.symmetries = [s for k, s in enumerate(symmetry.SYMMETRIES) if mask >> k & 1]
+        self.hits = 0
+        self.misses = 0
+
+    def _find(self, board: int, kind: int):
+        # binary search of the record of (board, kind)
+        key = (board, kind)
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) >> 1
+            offset = HEADER.size + middle * RECORD.size
+            if RECORD_KEY.unpack_from(self.data, offset) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.count:
+            record = RECORD.unpack_from(self.data, HEADER.size + low * RECORD.size)
+            if record[:2] == key:
+                return record
+        return None
+
+    def _lookup(self, board: int, kind: int, search: str, evaluator):
+        if _same_search(search) != _same_search(self.searches[kind]) or \
+                evaluator_digest(evaluator) != self.evaluatorDigest:
+            return None, None
+        canonical, board_symmetry = symmetry.canonical(board, self.symmetries)
+        record = self._find(canonical, kind)
+        if record is None:
+            self.misses += 1
+            return None, None
+        self.hits += 1
+        return record, board_symmetry
+
+    def best_move(self, board: int, search: str, evaluator):
+        record, board_symmetry = self._lookup(board, MOVE, search, evaluator)
+        if record is None:
+            return None
+        return symmetry.move_from(board_symmetry, MOVES[record[2]])
+
+    def best_indices(self, board: int, search: str, evaluator):
+        record, board_symmetry = self._lookup(board, INDEX, search, evaluator)
+        if record is None:
+            return None
+        return symmetry.cell_from(board_symmetry, record[2] >> 2, record[2] & 3)
+
+    def close(self):
+        if self.data is not None:
+            self.data.close()
+            self.data = None
+        self.file.close()
+
+
+def open_book(path: str):
+    # the book used by the search players from now on
+    global _book
+    if _book is not None and _book.path == path:
+        return
+    close_book()
+    _book = Book(path)
+
+
+def close_book():
+    global _book
+    if _book is not None:
+        _book.close()
+    _book = None
+
+
+def enabled() -> bool:
+    return _book is not None
+
+
+def book_path():
+    # the file of the book in use, None if there is none
+    return _book.path if _book is not None else None
+
+
+def lookup_move(board: int, search: str, evaluator):
+    return _book.best_move(board, search, evaluator) if _book is not None else None
+
+
+def lookup_indices(board: int, search: str, evaluator):
+    return _book.best_indices(board, search, evaluator) if _book is not None else None
+
+
+def write_book(path: str, records, move_search: str, index_search: str, evaluator):
+    # records are tuples of (canonical board, kind, action, depth, value) searched with evaluator, the file is
+    # replaced at once
+    records = sorted(records)
+    temporary = path + '.tmp'
+    with open(temporary, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, move_search.encode(), index_search.encode(), evaluator_digest(evaluator),
+                            _symmetries_mask(evaluator.symmetries), len(records)))
+        for record in records:
+            f.write(RECORD.pack(*record))
+    os.replace(temporary, path)
+
+
+def opening_positions(plies: int, values=(2,), symmetries=symmetry.SYMMETRIES):
+    """the canonical positions (under symmetries) of the first plies of a game, from all the boards with two tiles of
+    2 (like simulator.new_board). a ply is a move of the move player or a tile placed by the index player (one of
+    values). returns a set of (canonical board, kind).
+    """
+    cells = [(i, j) for i in range(bitboard.SIZE) for j in range(bitboard.SIZE)]
+    frontier = {symmetry.canonical(bitboard.set_tile(bitboard.set_tile(0, *first, 2), *second, 2), symmetries)[0]
+                for k, first in enumerate(cells) for second in cells[k + 1:]}
+    kind = MOVE
+    positions = set()
+    for _ in range(plies):
+        positions.update((board, kind) for board in frontier)
+        children = set()
+        for board in frontier:
+            if kind == MOVE:
+                for move in Move:
+                    new_board, done, score = _COMMANDS[move](board)
+                    if done:
+                        children.add(symmetry.canonical(new_board, symmetries)[0])
+            else:
+                for shift in bitboard.empty_shifts(board):
+                    for value in values:
+                        children.add(symmetry.canonical(board | (bitboard.exponent_of(value) << shift),
+                                                        symmetries)[0])
+        frontier = children
+        kind = INDEX if kind == MOVE else MOVE
+    return positions
+
+
+def late_positions(games: int, seed: int, max_empty: int, move_player: str, index_player: str, depth: int,
+                   symmetries=symmetry.SYMMETRIES):
+    # the canonical positions (under symmetries) with at most max_empty empty cells of games played by the simulator at
+    # a fixed depth
+    import simulator
+    turns = []
+    for k in range(games):
+        simulator.play_game(move_player, index_player, seed + k, depth=depth, turns=turns)
+    positions = set()
+    for board, turn in turns:
+        board = bitboard.pack(board)
+        if bitboard.count_empty(board) <= max_empty:
+            positions.add((symmetry.canonical(board, symmetries)[0], MOVE if turn == 'move' else INDEX))
+    return positions
+
+
+# the helper of a process that builds records, created by _init_worker
+_helper = None
+
+
+def _init_worker():
+    global _helper
+    import submission
+    import transposition
+    _helper = submission.BitHELPER(transposition.TranspositionTable())
+
+
+def _child_value(search, board, agent, D, value):
+    if search == 'AlphaBeta':
+        return _helper.AlphaBeta(board, agent, D, float('-inf'), float('inf'), value)
+    return getattr(_helper, search)(board, agent, D, value)
+
+
+def _solve(task):
+    # the record of a position, the best move or cell of a search of depth D like the roots of the players
+    import submission
+    board, kind, search, D = task
+    if _helper is None:
+        _init_worker()
+    if kind == MOVE:
+        agent = submission.CHANCE_PLAYER if search == 'RB_Expectimax' else submission.MIN_PLAYER
+        best, action = float('-inf'), None
+        for k, move in enumerate(MOVES):
+            new_board, done, score = _COMMANDS[move](board)
+            if done:
+                v = _child_value(search, new_board, agent, D - 1, 2)
+                if v > best:
+                    best, action = v, k
+    else:
+        values_probabilities = [(2, submission.P2), (4, submission.P4)] if search == 'RB_Expectimax' else [(2, 1)]
+        best, action = float('inf'), None
+        for shift in bitboard.empty_shifts(board):
+            v = sum(probability * _child_value(search, board | (bitboard.exponent_of(value) << shift),
+                                               submission.MAX_PLAYER, D - 1, value)
+                    for value, probability in values_probabilities)
+            if v < best:
+                best, action = v, (shift >> 4) * bitboard.SIZE + ((shift & 0xF) >> 2)
+    if action is None:
+        # no legal move or no empty cell, nothing to keep
+        return None
+    return board, kind, action, D, best
+
+
+def build(path: str, positions, move_search: str, index_search: str, depth: int, workers: int = 1):
+    # search all the positions (pairs of board and kind, canonical under the symmetries of the default evaluator) with
+    # the default evaluator (see evaluation.default_evaluator) and write the book, returns the number of records
+    tasks = [(board, kind, move_search if kind == MOVE else index_search, depth) for board, kind in positions]
+    if workers <= 1:
+        results = [_solve(task) for task in tasks]
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            results = list(pool.map(_solve, tasks, chunksize=64))
+    records = [record for record in results if record is not None]
+    write_book(path, records, move_search, index_search, evaluation.default_evaluator())
+    return len(records)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-output', default='book.bin', type=str, help='File to write the book.')
+    parser.add_argument('-plies', default=4, type=int, help='Number of plies of the opening positions.')
+    parser.add_argument('-values', default=[2], type=int, nargs='*',
+                        help='Values the index player places in the opening positions.')
+    parser.add_argument('-games', default=0, type=int, help='Number of games to collect the late positions from.')
+    parser.add_argument('-seed', default=0, type=int, help='Seed of the first game.')
+    parser.add_argument('-max_empty', default=3, type=int, help='Max empty cells of a late position.')
+    parser.add_argument('-player1', default='ABMovePlayer', type=str, help='Move player of the games.')
+    parser.add_argument('-player2', default='MiniMaxIndexPlayer', type=str, help='Index player of the games.')
+    parser.add_argument('-move_search', default='AlphaBeta', type=str,
+                        choices=['RB_MINIMAX', 'AlphaBeta', 'RB_Expectimax'], help='Search of the move records.')
+    parser.add_argument('-index_search', default='RB_MINIMAX', type=str,
+                        choices=['RB_MINIMAX', 'AlphaBeta', 'RB_Expectimax'], help='Search of the index records.')
+    parser.add_argument('-depth', default=4, type=int, help='Depth of the search of every position.')
+    parser.add_argument('-workers', default=1, type=int, help='Number of processes searching the positions.')
+    args = parser.parse_args()
+
+    symmetries = evaluation.default_evaluator().symmetries
+    positions = opening_positions(args.plies, args.values, symmetries)
+    print(len(positions), 'opening positions')
+    if args.games:
+        late = late_positions(args.games, args.seed, args.max_empty, args.player1, args.player2, args.depth,
+                              symmetries)
+        print(len(late), 'late positions')
+        positions |= late
+    count = build(args.output, positions, args.move_search, args.index_search, args.depth, args.workers)
+    print(count, 'records written to', args.output)
@@ -0,0 +1,67 @@
+# Cache of the values of searched nodes, by the canonical symmetry of the board.
+# boards which are rotations or reflections of each other (see symmetry.py) have the same value when the evaluator is
+# symmetric under the rotation or reflection, so the key of a node is made of the smallest of its boards under the
+# symmetries of the evaluator. the cache is shared by RB_MINIMAX, AlphaBeta and RB_Expectimax of BitHELPER: minimax and
+# alpha beta keep their exact values under the same keys, expectimax under keys of its own. the least recently used
+# entry is dropped when the cache is full.
+# the sharing is only as wide as the symmetries of the evaluator: the monotonic feature of the default weights is
+# directional (see evaluation.py), so with the default weights only the identity and the flip of the rows keep the
+# value and a node shares its entry with a single other board, not with its 8 symmetries. the n-tuple network (see
+# ntuple.py) and weights without the monotonic feature are symmetric under all 8.
+from collections import OrderedDict
+import symmetry
+import transposition
+
+DEFAULT_MAX_ENTRIES = 1 << 16
+# nodes closer to the leaves are cheaper to search than to look up
+MIN_DEPTH = 2
+
+MINIMAX = 0
+EXPECTIMAX = 1
+
+
+class EvaluationCache:
+    """LRU cache of node values,
+    an entry is (value, depth) by the key of the canonical node, get returns the value only if it was searched at least
+    as deep.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, symmetries=(symmetry.IDENTITY,)):
+        self.max_entries = max_entries
+        self.symmetries = symmetries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def key(self, board: int, agent: int, value: int, kind: int) -> int:
+        canonical = symmetry.canonical(board, self.symmetries)[0]
+        return (transposition.node_key(canonical, agent, value) << 1) | kind
+
+    def get(self, key: int, depth: int):
+        entry = self.entries.get(key)
+        if entry is None or entry[1] < depth:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key: int, value, depth: int):
+        entry = self.entries.get(key)
+        if entry is not None:
+            # keep the deeper value
+            if entry[1] <= depth:
+                self.entries[key] = (value, depth)
+            self.entries.move_to_end(key)
+            return
+        self.entries[key] = (value, depth)
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self):
+        return {'entries': len(self.entries), 'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
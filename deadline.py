@@ -0,0 +1,52 @@
+# Hard deadline for the search.
+# the search functions of BitHELPER poll the context of the search at every node, once every POLL_NODES nodes the
+# clock is checked and SearchTimeout is raised if the deadline passed. the exception unwinds the whole search at once,
+# the iterative deepening catches it and returns the result of the last completed depth.
+# a node of a bigger board (see bigboard.py) has more children and every child costs more to evaluate, the clock of
+# its search is checked more often (see poll_nodes_for).
+import time
+
+# a 4x4 node costs about 150 microseconds, so the clock is read about every 5 ms, well inside SAFETY_MARGIN
+POLL_NODES = 32
+# the board size POLL_NODES is measured for
+POLL_SIZE = 4
+# the deadline is set a bit before the time limit, to leave time to return the move
+SAFETY_MARGIN = 0.01
+
+
+def poll_nodes_for(geometry) -> int:
+    # the nodes between two checks of the clock on the boards of geometry, the cost of a node grows with the square
+    # of the number of cells (the children of a node times the cells of every evaluation)
+    return max(1, POLL_NODES * POLL_SIZE ** 4 // geometry.SIZE ** 4)
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+class SearchContext:
+    """Deadline of a single search,
+    poll is called at every node and raises SearchTimeout after the deadline.
+    """
+
+    def __init__(self, deadline: float, poll_nodes: int = POLL_NODES):
+        self.deadline = deadline
+        self.poll_nodes = poll_nodes
+        self.countdown = poll_nodes
+
+    @classmethod
+    def for_time_limit(cls, time_limit: float, poll_nodes: int = POLL_NODES):
+        return cls(time.time() + time_limit - min(SAFETY_MARGIN, time_limit / 10), poll_nodes)
+
+    def poll(self):
+        self.countdown -= 1
+        if self.countdown <= 0:
+            self.countdown = self.poll_nodes
+            if time.time() > self.deadline:
+                raise SearchTimeout()
+
+    def remaining(self) -> float:
+        return max(0.0, self.deadline - time.time())
+
+    def expired(self) -> bool:
+        return time.time() > self.deadline
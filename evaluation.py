@@ -0,0 +1,312 @@
+# Leaf evaluation of packed boards (see bitboard.py) with fused row tables.
+# the value of a leaf is a weighted sum of features. a feature is registered once (see register_feature) by its row
+# tables: what a row adds to the feature on the border of the board (the first and last rows), in the middle rows and
+# as a column, or by a single table of the rows whose max over the rows of the board is the feature. the weights of
+# the features come from a config file (see load_weights), the default weights give HELPER.heuristics with the board
+# score of isGoal. the weighted tables of all the summed features are summed once into three tables: the border rows,
+# the middle rows and the columns, and the evaluation is compiled into a single function for the weights, without the
+# lookups of a table that is all zeros. evaluating a board with the default weights costs eight lookups and a max.
+# placing a single tile changes only one row and one column, so the children of a MIN node are evaluated by updating
+# the values of the parent instead of evaluating them from scratch.
+# boards of other sizes (see bigboard.py) are evaluated by SizedEvaluator, from the features of every row computed on
+# its first use, for the features that are also registered for rows of any size.
+# the evaluators made without weights are the n-tuple network of ntuple.py instead when one is set (see
+# default_evaluator). the network values the afterstates of the moves only, so the leaves of the searches that are
+# afterstates (the boards of the MIN and CHANCE nodes) are evaluated by evaluate_after, the same as evaluate for the
+# heuristics.
+import json
+import os
+import bigboard
+import bitboard
+import ntuple
+import symmetry
+
+# the file of the weights of the evaluators made without weights, kept in the environment so the processes of the
+# search (see parallel.py, ponder.py and simulator.py) use it too
+CONFIG_ENV = 'EVALUATION_WEIGHTS'
+
+# name: (edge rows, middle rows, columns, max rows, symmetries, functions of any size), see register_feature
+FEATURES = {}
+
+# the weights of HELPER.heuristics
+DEFAULT_WEIGHTS = {'score': 50, 'squares': 150, 'max': 50, 'near': 200, 'monotonic': 200}
+
+# fused tables and compiled evaluations by weights, they are built once for every set of weights. only the last
+# MAX_CACHED_WEIGHTS sets are kept, a process that tries many weights (see tuner.py) doesn't keep all of their tables
+MAX_CACHED_WEIGHTS = 8
+_tables_cache = {}
+_evaluate_cache = {}
+# the weights of the config file by its path
+_config_cache = {}
+
+
+def register_feature(name: str, edge_rows=None, middle_rows=None, columns=None, max_rows=None,
+                     symmetries=symmetry.SYMMETRIES, sized=None):
+    """register a feature of the board by tables of the 65536 rows (see bitboard.py),
+    the feature is the sum of edge_rows over the first and last rows, middle_rows over the middle rows (edge_rows if
+    not given) and columns over the columns, or the max of max_rows over the rows. symmetries are the symmetries (see
+    symmetry.py) that keep the value of the feature of every 4x4 board.
+    sized are the same four (edge rows, middle rows, columns, max rows) as functions of the features of a row of any
+    size (see bigboard.Geometry.row_features), None for a feature of 4x4 boards only.
+    """
+    if max_rows is not None and (edge_rows is not None or middle_rows is not None or columns is not None):
+        raise ValueError(f'feature {name} is both a sum and a max')
+    if middle_rows is None:
+        middle_rows = edge_rows
+    if sized is not None and sized[1] is None:
+        sized = (sized[0], sized[0], sized[2], sized[3])
+    FEATURES[name] = (edge_rows, middle_rows, columns, max_rows, list(symmetries), sized)
+    # the tables of a feature that is registered again are out of date
+    _tables_cache.clear()
+    _evaluate_cache.clear()
+
+
+# the features of HELPER.heuristics, every equal pair is counted from both of its tiles (see HELPER.countEqualNear),
+# all the tiles of the first and last rows are around the board, from the middle rows only the two ends. the monotonic
+# rows are checked only from left to right and not in the columns, so only flipping the order of the rows keeps them
+# the features of a row of any size are (empty, filled, filled at the ends, max, pairs, monotonic, tiles sum)
+register_feature('score', edge_rows=bitboard.ROW_TILES_SUM, sized=(lambda f: f[6], None, None, None))
+register_feature('squares',
+                 edge_rows=[empty + filled for empty, filled in zip(bitboard.ROW_EMPTY, bitboard.ROW_FILLED)],
+                 middle_rows=[empty + filled for empty, filled in zip(bitboard.ROW_EMPTY, bitboard.ROW_FILLED_ENDS)],
+                 sized=(lambda f: f[0] + f[1], lambda f: f[0] + f[2], None, None))
+register_feature('max', max_rows=bitboard.ROW_MAX, sized=(None, None, None, lambda f: f[3]))
+_ROW_NEAR = [2 * pairs for pairs in bitboard.ROW_PAIRS]
+register_feature('near', edge_rows=_ROW_NEAR, columns=_ROW_NEAR,
+                 sized=(lambda f: 2 * f[4], None, lambda f: 2 * f[4], None))
+register_feature('monotonic', edge_rows=bitboard.ROW_MONOTONIC, symmetries=[symmetry.IDENTITY, symmetry.FLIP_ROWS],
+                 sized=(lambda f: f[5], None, None, None))
+
+
+def load_weights(path: str) -> dict:
+    # the weights of a config file, a json object of feature names and weights. the features it doesn't name keep
+    # their default weights
+    with open(path) as f:
+        weights = json.load(f)
+    if not isinstance(weights, dict) or not all(isinstance(weight, (int, float)) for weight in weights.values()):
+        raise ValueError(f'{path}: the config is an object of feature names and weights')
+    return dict(DEFAULT_WEIGHTS, **weights)
+
+
+def use_config(path: str):
+    # the evaluators made from now on without weights, in this process and in the processes it starts, use the weights
+    # of the config file (None for the default weights)
+    if path is None:
+        os.environ.pop(CONFIG_ENV, None)
+    else:
+        load_weights(path)
+        os.environ[CONFIG_ENV] = path
+
+
+def default_weights() -> dict:
+    path = os.environ.get(CONFIG_ENV)
+    if not path:
+        return dict(DEFAULT_WEIGHTS)
+    if path not in _config_cache:
+        _config_cache[path] = load_weights(path)
+    return dict(_config_cache[path])
+
+
+def _weighted(weights, sized=False):
+    # the (weight, feature) of the features with a weight, with sized all of them must have functions of any size
+    for name in weights:
+        if name not in FEATURES:
+            raise ValueError(f'unknown feature {name}, the features are {", ".join(FEATURES)}')
+        if sized and weights[name] != 0 and FEATURES[name][5] is None:
+            raise ValueError(f'feature {name} is only for {bitboard.SIZE}x{bitboard.SIZE} boards')
+    return [(weights[name], FEATURES[name]) for name in FEATURES if weights.get(name, 0) != 0]
+
+
+def _build_tables(weighted):
+    summed = [(weight, feature) for weight, feature in weighted if feature[3] is None]
+    fused = []
+    for place in range(3):
+        tables = [(weight, feature[place]) for weight, feature in summed if feature[place] is not None]
+        if not tables:
+            fused.append([0] * (1 << 16))
+        elif len(tables) == 1:
+            weight, table = tables[0]
+            fused.append([weight * v for v in table])
+        else:
+            fused.append([sum(weight * table[row] for weight, table in tables) for row in range(1 << 16)])
+    return tuple(fused)
+
+
+def _compile(key, has_rows, has_columns, max_count):
+    # the source of the evaluation of a board and of the placements for the weights, the tables are globals of the
+    # compiled functions
+    lines = ['def evaluate(board):', '    r0, r1, r2, r3 = rows(board)']
+    terms = []
+    if has_rows:
+        terms.append('edge_rows[r0] + middle_rows[r1] + middle_rows[r2] + edge_rows[r3]')
+    if has_columns:
+        lines.append('    c0, c1, c2, c3 = rows(transpose(board))')
+        terms.append('columns[c0] + columns[c1] + columns[c2] + columns[c3]')
+    for k in range(max_count):
+        terms.append(f'weight_{k} * max(max_{k}[r0], max_{k}[r1], max_{k}[r2], max_{k}[r3])')
+    lines.append('    return ' + (' + '.join(terms) if terms else '0'))
+    # placing a tile changes a single row and a single column, a max feature of the child is the max of the new row and
+    # the max of the other rows of the board
+    lines += ['def evaluate_placements(board, value=2, shifts=None):',
+              '    board_rows = rows(board)',
+              '    row_values = [edge_rows[board_rows[0]], middle_rows[board_rows[1]], middle_rows[board_rows[2]], '
+              'edge_rows[board_rows[3]]]',
+              '    total = sum(row_values)']
+    terms = ['total', '- row_values[i] + row_tables[i][new_row]']
+    if has_columns:
+        lines += ['    board_columns = rows(transpose(board))',
+                  '    column_values = [columns[column] for column in board_columns]',
+                  '    total += sum(column_values)']
+        terms.append('- column_values[j] + columns[board_columns[j] | (exponent << (4 * i))]')
+    for k in range(max_count):
+        lines += [f'    values = [max_{k}[row] for row in board_rows]',
+                  '    first, second = sorted(values, reverse=True)[:2]',
+                  f'    others_{k} = [second if v == first else first for v in values]']
+        terms.append(f'+ weight_{k} * max(others_{k}[i], max_{k}[new_row])')
+    lines += ['    exponent = exponent_of(value)',
+              '    values = []',
+              '    for shift in shifts if shifts is not None else empty_shifts(board):',
+              '        i = shift >> 4',
+              '        j = (shift & 0xF) >> 2',
+              '        new_row = board_rows[i] | (exponent << (4 * j))',
+              '        values.append(' + ' '.join(terms) + ')',
+              '    return values']
+    return compile('\n'.join(lines) + '\n', f'<evaluation {key}>', 'exec')
+
+
+class Evaluator:
+    """Heuristic value of packed boards,
+    evaluate returns the value of a single board and evaluate_placements the values of all the boards made by placing
+    a value in one of the empty cells of the board. weights are the weights of the features by their names (see
+    register_feature), the weights of the config file (see use_config) if not given.
+    """
+
+    def __init__(self, weights: dict = None):
+        weights = dict(weights) if weights is not None else default_weights()
+        weighted = _weighted(weights)
+        self.weights = weights
+        # the weights as a hashable key of the fused tables
+        self.key = tuple(sorted((name, weight) for name, weight in weights.items() if weight != 0))
+        if self.key not in _tables_cache:
+            if len(_tables_cache) >= MAX_CACHED_WEIGHTS:
+                oldest = next(iter(_tables_cache))
+                del _tables_cache[oldest]
+                _evaluate_cache.pop(oldest, None)
+            _tables_cache[self.key] = _build_tables(weighted)
+        edge_rows, middle_rows, self.columns = _tables_cache[self.key]
+        self.row_tables = (edge_rows, middle_rows, middle_rows, edge_rows)
+        # the max features as (weight, table of the rows)
+        self.maxima = [(weight, feature[3]) for weight, feature in weighted if feature[3] is not None]
+        if self.key not in _evaluate_cache:
+            has_rows = any(edge_rows) or any(middle_rows)
+            namespace = {'rows': bitboard.rows, 'transpose': bitboard.transpose, 'exponent_of': bitboard.exponent_of,
+                         'empty_shifts': bitboard.empty_shifts, 'edge_rows': edge_rows, 'middle_rows': middle_rows,
+                         'row_tables': self.row_tables, 'columns': self.columns}
+            for k, (weight, table) in enumerate(self.maxima):
+                namespace[f'weight_{k}'] = weight
+                namespace[f'max_{k}'] = table
+            exec(_compile(self.key, has_rows, any(self.columns), len(self.maxima)), namespace)
+            _evaluate_cache[self.key] = (namespace['evaluate'], namespace['evaluate_placements'])
+        # evaluate(board) returns the value of a single board and evaluate_placements(board, value=2, shifts=None)
+        # the values of the boards with value in every empty cell, in the order of bitboard.empty_shifts(board) or of
+        # shifts if they are given
+        self.evaluate, self.evaluate_placements = _evaluate_cache[self.key]
+        # the heuristics value an afterstate (a board after a move, see ntuple.py) like any other board
+        self.evaluate_after = self.evaluate
+        # the symmetries (see symmetry.py) that keep the value of every board, those of all the weighted features
+        self.symmetries = [s for s in symmetry.SYMMETRIES if all(s in feature[4] for weight, feature in weighted)]
+
+
+class SizedEvaluator:
+    """Evaluator of the boards of a geometry of another size (see bigboard.py),
+    the same value as Evaluator with the same weights, from the weighted features of every row computed on its first
+    use. the evaluation cache keeps only the identity symmetry.
+    """
+
+    def __init__(self, geometry, weights: dict = None):
+        weights = dict(weights) if weights is not None else default_weights()
+        weighted = _weighted(weights, sized=True)
+        self.geometry = geometry
+        self.weights = weights
+        self.key = (('size', geometry.SIZE),) + tuple(sorted((name, weight) for name, weight in weights.items()
+                                                             if weight != 0))
+        # (weight, function) of every place of a row, the max features are the fourth place
+        self.places = [[(weight, feature[5][place]) for weight, feature in weighted if feature[5][place] is not None]
+                       for place in range(4)]
+        self.hasColumns = bool(self.places[2])
+        self.symmetries = [symmetry.IDENTITY]
+        self.evaluate_after = self.evaluate
+        # row: (edge value, middle value, column value, values of the max features without their weights)
+        self._rows = {}
+
+    def _row(self, row):
+        values = self._rows.get(row)
+        if values is None:
+            if len(self._rows) >= bigboard.MAX_CACHED_ROWS:
+                self._rows.clear()
+            features = self.geometry.row_features(row)
+            values = self._rows[row] = tuple(sum(weight * function(features) for weight, function in self.places[p])
+                                             for p in range(3)) + \
+                (tuple(function(features) for weight, function in self.places[3]),)
+        return values
+
+    def _row_value(self, i, row):
+        # the value of a row in its place, the first and last rows are on the border
+        return self._row(row)[0 if i == 0 or i == self.geometry.SIZE - 1 else 1]
+
+    def evaluate(self, board: int):
+        rows = [self._row(row) for row in self.geometry.rows(board)]
+        total = rows[0][0] + rows[-1][0] + sum(values[1] for values in rows[1:-1])
+        if self.hasColumns:
+            total += sum(self._row(column)[2] for column in self.geometry.rows(self.geometry.transpose(board)))
+        for k, (weight, function) in enumerate(self.places[3]):
+            total += weight * max(values[3][k] for values in rows)
+        return total
+
+    def evaluate_placements(self, board: int, value: int = 2, shifts=None):
+        # the values of the children in the order of empty_shifts(board) of the geometry, or of shifts if they are
+        # given. like Evaluator, a child changes a single row and a single column of the board
+        geometry = self.geometry
+        rows = geometry.rows(board)
+        row_values = [self._row_value(i, row) for i, row in enumerate(rows)]
+        total = sum(row_values)
+        if self.hasColumns:
+            columns = geometry.rows(geometry.transpose(board))
+            column_values = [self._row(column)[2] for column in columns]
+            total += sum(column_values)
+        # every max feature with its max over the other rows than row i
+        maxima = []
+        for k, (weight, function) in enumerate(self.places[3]):
+            values = [self._row(row)[3][k] for row in rows]
+            first, second = sorted(values, reverse=True)[:2]
+            maxima.append((weight, [second if v == first else first for v in values]))
+        exponent = bitboard.exponent_of(value)
+        values = []
+        for shift in shifts if shifts is not None else geometry.empty_shifts(board):
+            i, j = geometry.cell_of(shift)
+            new_row = rows[i] | (exponent << (4 * j))
+            child = total - row_values[i] + self._row_value(i, new_row)
+            if self.hasColumns:
+                child += self._row(columns[j] | (exponent << (4 * i)))[2] - column_values[j]
+            new_maxima = self._row(new_row)[3]
+            for k, (weight, others) in enumerate(maxima):
+                child += weight * max(others[i], new_maxima[k])
+            values.append(child)
+        return values
+
+
+def default_evaluator():
+    # the evaluator of the 4x4 boards without weights: the network of ntuple.use_network if one is set, otherwise the
+    # heuristics with the weights of the config file
+    path = os.environ.get(ntuple.WEIGHTS_ENV)
+    if path:
+        return ntuple.network_of(path)
+    return Evaluator()
+
+
+def evaluator_for(geometry, weights: dict = None):
+    # the evaluator of the boards of a geometry (see bigboard.py), bitboard for 4x4. the network is for 4x4 boards
+    # only, the other sizes are evaluated by the heuristics
+    if geometry is bitboard:
+        return Evaluator(weights) if weights is not None else default_evaluator()
+    return SizedEvaluator(geometry, weights)
@@ -0,0 +1,163 @@
+# Instrumentation of the search players.
+# instrument_player wraps get_move / get_indices of a player, and the search functions, the moves, the terminal checks
+# and the evaluator of its BitHELPER, with counting and timing functions. the wrappers are set on the instances only,
+# so players which are not instrumented run the original code and pay nothing. after every move a trace is written
+# as a json line: nodes by agent and by remaining depth, cutoffs, leaf evaluations, the time spent in moves, in the
+# heuristics and in the terminal checks, and the depth reached by the iterative deepening. the terminal check of a node
+# is made by its children (see BitHELPER.expand): the empty cells of the MIN and CHANCE nodes are timed as the terminal
+# checks, the MAX nodes are checked by their moves, so their time is in the moves.
+import json
+import time
+import submission
+
+AGENT_NAMES = {submission.MAX_PLAYER: 'MAX', submission.MIN_PLAYER: 'MIN', submission.CHANCE_PLAYER: 'CHANCE'}
+
+
+class Tracer:
+    """Counters of a single move and the file of the traces (json lines, None to keep the traces in memory only),
+    record writes the trace of the move and resets the counters. the fields of context are added to every trace.
+    """
+
+    def __init__(self, path: str = None, **context):
+        self.path = path
+        self.context = context
+        self.file = open(path, 'a') if path else None
+        self.traces = []
+        self.reset()
+
+    def reset(self):
+        self.nodes = {}
+        self.nodesPerDepth = {}
+        self.cutoffs = 0
+        self.leafEvaluations = 0
+        self.seconds = {'moves': 0.0, 'heuristics': 0.0, 'terminal': 0.0}
+
+    def record(self, **fields):
+        trace = dict(self.context, **fields)
+        trace.update(nodes=self.nodes, nodes_per_depth=self.nodesPerDepth, cutoffs=self.cutoffs,
+                     leaf_evaluations=self.leafEvaluations, seconds_in=self.seconds)
+        self.traces.append(trace)
+        if self.file is not None:
+            self.file.write(json.dumps(trace) + '\n')
+            self.file.flush()
+        self.reset()
+        return trace
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+def _timed(function, tracer, part, count_leaves=None):
+    def traced(*args, **kwargs):
+        started = time.perf_counter()
+        result = function(*args, **kwargs)
+        tracer.seconds[part] += time.perf_counter() - started
+        if count_leaves is not None:
+            tracer.leafEvaluations += count_leaves(result)
+        return result
+    return traced
+
+
+def _counted(search, tracer):
+    def traced(board, agent, D, *args, **kwargs):
+        name = AGENT_NAMES[agent]
+        tracer.nodes[name] = tracer.nodes.get(name, 0) + 1
+        tracer.nodesPerDepth[D] = tracer.nodesPerDepth.get(D, 0) + 1
+        result = search(board, agent, D, *args, **kwargs)
+        # AlphaBeta returns an infinite value when the node is cut
+        if result == float('inf') or result == float('-inf'):
+            tracer.cutoffs += 1
+        return result
+    return traced
+
+
+def _expanded(expand, tracer):
+    # the children of the MAX nodes are timed by maxChildren as moves
+    def traced(board, agent):
+        if agent == submission.MAX_PLAYER:
+            return expand(board, agent)
+        started = time.perf_counter()
+        result = expand(board, agent)
+        tracer.seconds['terminal'] += time.perf_counter() - started
+        return result
+    return traced
+
+
+def _instrument_commands(helper, tracer):
+    helper.commands = {move: _timed(command, tracer, 'moves') for move, command in helper.commands.items()}
+
+
+def _instrument_evaluator(helper, tracer):
+    # the evaluator may be shared with other helpers, so the wrappers are set on a copy of it
+    evaluator = object.__new__(type(helper.evaluator))
+    evaluator.__dict__.update(helper.evaluator.__dict__)
+    evaluator.evaluate = _timed(helper.evaluator.evaluate, tracer, 'heuristics', lambda value: 1)
+    evaluator.evaluate_after = _timed(helper.evaluator.evaluate_after, tracer, 'heuristics', lambda value: 1)
+    evaluator.evaluate_placements = _timed(helper.evaluator.evaluate_placements, tracer, 'heuristics', len)
+    helper.evaluator = evaluator
+    if helper.batch is not None:
+        batch = object.__new__(type(helper.batch))
+        batch.__dict__.update(helper.batch.__dict__)
+        batch.evaluate_max_children = _timed(helper.batch.evaluate_max_children, tracer, 'heuristics',
+                                             lambda result: len(result[0]))
+        helper.batch = batch
+
+
+def instrument_helper(helper: submission.BitHELPER, tracer: Tracer):
+    for name in ('RB_MINIMAX', 'AlphaBeta', 'RB_Expectimax'):
+        setattr(helper, name, _counted(getattr(helper, name), tracer))
+    helper.maxChildren = _timed(helper.maxChildren, tracer, 'moves')
+    helper.expand = _expanded(helper.expand, tracer)
+    _instrument_commands(helper, tracer)
+    _instrument_evaluator(helper, tracer)
+    # a new evaluator (see simulator.set_weights) or geometry replaces the wrapped ones, they are wrapped again
+    set_evaluator = helper.setEvaluator
+    set_geometry = helper.setGeometry
+
+    def setEvaluator(evaluator):
+        set_evaluator(evaluator)
+        _instrument_evaluator(helper, tracer)
+
+    def setGeometry(geometry):
+        # the evaluator of the geometry is set by setEvaluator of the helper, already wrapped
+        set_geometry(geometry)
+        _instrument_commands(helper, tracer)
+
+    helper.setEvaluator = setEvaluator
+    helper.setGeometry = setGeometry
+
+
+def instrument_player(player, tracer: Tracer, name: str = None):
+    """trace every move of player, the search of a BitHELPER player is instrumented as well"""
+    name = name or type(player).__name__
+    helper = getattr(player, 'helper_fun', None)
+    if isinstance(helper, submission.BitHELPER):
+        instrument_helper(helper, tracer)
+    turns = [0]
+
+    def traced(get):
+        def turn(board, *args):
+            tracer.reset()
+            started = time.perf_counter()
+            result = get(board, *args)
+            fields = {'player': name, 'turn': turns[0], 'seconds': time.perf_counter() - started,
+                      'result': result.name if isinstance(result, submission.Move) else result}
+            if isinstance(helper, submission.BitHELPER):
+                fields['depth'] = len(helper.nodesPerDepth)
+                fields['nodes_per_iteration'] = helper.nodesPerDepth
+                if helper.rootWidth is not None:
+                    # the root was searched by width (see submission.adaptive_best_indices)
+                    fields['root_width'] = helper.rootWidth
+                    fields['guaranteed'] = helper.rootWidth[0] == helper.rootWidth[1]
+            turns[0] += 1
+            tracer.record(**fields)
+            return result
+        return turn
+
+    if hasattr(player, 'get_move'):
+        player.get_move = traced(player.get_move)
+    if hasattr(player, 'get_indices'):
+        player.get_indices = traced(player.get_indices)
+    return player
@@ -1,23 +1,19 @@
 import argparse
-import submission
+import book
+import evaluation
+import instrumentation
+import ntuple
+import parallel
+import ponder
+import records
+import time
+import timemanager
 import Games
+from players import move_players, index_players
 
 if __name__ == "__main__":
     games = {'KeyBoardGame': Games.KeyBoardGame, 'CustomGame': Games.CustomGame}
 
-    move_players = {'GreedyMovePlayer': submission.GreedyMovePlayer,
-                    'ImprovedGreedyMovePlayer': submission.ImprovedGreedyMovePlayer,
-                    'MiniMaxMovePlayer': submission.MiniMaxMovePlayer,
-                    'ABMovePlayer': submission.ABMovePlayer,
-                    'ExpectimaxMovePlayer': submission.ExpectimaxMovePlayer,
-                    'ContestMovePlayer': submission.ContestMovePlayer
-                    }
-
-    index_players = {'RandomIndexPlayer': submission.RandomIndexPlayer,
-                    'MiniMaxIndexPlayer': submission.MiniMaxIndexPlayer,
-                    'ExpectimaxIndexPlayer': submission.ExpectimaxIndexPlayer
-                    }
-
     parser = argparse.ArgumentParser()
 
     parser.add_argument('-game', default='CustomGame', type=str,
@@ -34,6 +30,33 @@ if __name__ == "__main__":
     parser.add_argument('-move_time', default=1.0, type=float,
                         help='Time (sec) for each turn.')
 
+    parser.add_argument('-trace', default=None, type=str,
+                        help='File to write the trace of the search of every move (json lines).')
+
+    parser.add_argument('-record', default=None, type=str,
+                        help='Log to append the record of every ply of the game (see records.py).')
+
+    parser.add_argument('-time_budget', default=None, type=float,
+                        help='Average seconds per turn of the search players over the game, at most -move_time in a '
+                             'turn (see timemanager.py).')
+
+    parser.add_argument('-book', default=None, type=str,
+                        help='Book of positions the search players answer from before searching (see book.py).')
+
+    parser.add_argument('-weights', default=None, type=str,
+                        help='Config file of the weights of the heuristic features (json, see evaluation.py).')
+
+    parser.add_argument('-ntuple', default=None, type=str,
+                        help='File of an n-tuple network the search players evaluate with instead of the heuristic '
+                             'features (see ntuple.py).')
+
+    parser.add_argument('-workers', default=0, type=int,
+                        help='Number of processes searching the root moves of the search players (0 to search in a '
+                             'single process).')
+
+    parser.add_argument('-ponder', action='store_true',
+                        help='The search players search during the turn of the opponent (see ponder.py).')
+
     args = parser.parse_args()
 
     # Players inherit from AbstractPlayer
@@ -44,11 +67,45 @@ if __name__ == "__main__":
     # print game info to terminal
     print(f'Starting {args.game}!')
 
+    # the weights are set before the processes of the search start, so they use them too
+    if args.weights:
+        evaluation.use_config(args.weights)
+        print('Evaluating with the weights of', args.weights)
+    if args.ntuple:
+        ntuple.use_network(args.ntuple)
+        print('Evaluating with the n-tuple network', args.ntuple)
+    # start the processes of the search before the game
+    if args.workers > 0:
+        parallel.start(args.workers)
+        print('Searching with', args.workers, 'worker processes.')
+    if args.ponder:
+        ponder.enable()
+    if args.book:
+        book.open_book(args.book)
+        print('Answering from the book', args.book)
+
     # create game with the given args
+    tracer = None
+    recorder = None
     if args.game == 'CustomGame':
         # Create players
         player_1 = move_players[player_1_type]()
         player_2 = index_players[player_2_type]()
+        if args.trace:
+            tracer = instrumentation.Tracer(args.trace)
+            instrumentation.instrument_player(player_1, tracer, player_1_type)
+            instrumentation.instrument_player(player_2, tracer, player_2_type)
+        managers = {}
+        if args.time_budget:
+            for name, player in ((player_1_type, player_1), (player_2_type, player_2)):
+                manager = timemanager.manage(player, args.time_budget)
+                if manager is not None:
+                    managers[name] = manager
+        if args.record:
+            # the game of the records is the time it started
+            recorder = records.Recorder(args.record)
+            records.record_players(player_1, player_2, recorder, int(time.time()))
+            print('Recording the game to', args.record)
 
         print(args.player1, 'VS', args.player2)
         print('Players have', args.move_time, 'seconds to make a single move.')
@@ -61,5 +118,19 @@ if __name__ == "__main__":
         print('Push the buttons to move')
 
     # start playing!
-    game.run_game()
+    try:
+        game.run_game()
+        if args.game == 'CustomGame':
+            for name, manager in managers.items():
+                report = manager.report()
+                print(f"{name}: {report['turns']} turns, {report['mean_spent']:.3f}s per turn of a budget of "
+                      f"{report['average_budget']:.3f}s")
+    finally:
+        if tracer is not None:
+            tracer.close()
+        if recorder is not None:
+            recorder.close()
+    parallel.shutdown()
+    ponder.shutdown()
+    book.close_book()
 
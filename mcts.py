@@ -0,0 +1,220 @@
+# Monte Carlo tree search of the move player.
+# the tree has two kinds of nodes: a MAX node is a board where the move player moves, its children are the chance nodes
+# of its legal moves. a chance node is the board after a move, the index player places a tile in it, and its children
+# are the MAX nodes of the placements that were sampled so far. the index player is taken as random: a uniform empty
+# cell with 4 with probability PROBABILITY_4 and 2 otherwise.
+# every iteration walks down the tree by UCT at the MAX nodes and by sampling at the chance nodes, adds a node and
+# plays rollouts from it: the moves of the rollout policy and random tiles, cut after a few moves and evaluated by
+# the evaluator (see evaluation.py). with several rollouts per node their last boards are evaluated in a single batch
+# when numpy is installed (see batch.py). the values are averaged back up the path.
+# the boards are 4x4 by default, the boards of other sizes are searched in their geometry (see bigboard.py).
+import math
+import random
+import time
+import batch
+import bitboard
+
+EXPLORATION = 1.4
+ROLLOUT_DEPTH = 4
+ROLLOUTS = 1
+PROBABILITY_4 = 0.1
+# the tree stops growing at this number of nodes, the iterations go on with rollouts from the leaves
+MAX_NODES = 200000
+
+# rollout policies: 'random' plays a uniform legal move, 'greedy' the move of the best evaluated board and 'none'
+# evaluates the node itself without a rollout
+ROLLOUT_POLICIES = ('random', 'greedy', 'none')
+
+
+class MaxNode:
+    __slots__ = ('board', 'visits', 'total', 'children')
+
+    def __init__(self, board: int):
+        self.board = board
+        self.visits = 0
+        self.total = 0.0
+        # the chance nodes of the legal moves, made on the first visit
+        self.children = None
+
+
+class ChanceNode:
+    __slots__ = ('move', 'board', 'visits', 'total', 'children')
+
+    def __init__(self, move, board: int):
+        self.move = move
+        self.board = board
+        self.visits = 0
+        self.total = 0.0
+        # the sampled MAX nodes by their board
+        self.children = {}
+
+
+def _count(root):
+    # the number of nodes of the subtree of root
+    count = 0
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        count += 1
+        if isinstance(node, MaxNode):
+            stack.extend(node.children or ())
+        else:
+            stack.extend(node.children.values())
+    return count
+
+
+class MCTS:
+    """UCT search of a move player,
+    moves is the list of the moves in the order of the bitboard functions (up, down, left, right). set_root moves
+    the root to a board (keeping the subtree of the board if it was reached by the last move), search runs iterations
+    until the deadline or the number of iterations and best_move returns the most visited move of the root.
+    geometry is the module bitboard or a bigboard.Geometry of the boards.
+    """
+
+    def __init__(self, evaluator, moves, batch_evaluator=None, exploration: float = EXPLORATION,
+                 rollout_policy: str = 'random', rollout_depth: int = ROLLOUT_DEPTH, rollouts: int = ROLLOUTS,
+                 max_nodes: int = MAX_NODES, geometry=bitboard):
+        if rollout_policy not in ROLLOUT_POLICIES:
+            raise ValueError(f'unknown rollout policy {rollout_policy}')
+        self.geometry = geometry
+        self.evaluator = evaluator
+        self.moves = moves
+        self.batch = batch_evaluator
+        self.exploration = exploration
+        self.rolloutPolicy = rollout_policy
+        self.rolloutDepth = rollout_depth
+        self.rollouts = rollouts
+        self.maxNodes = max_nodes
+        self.root = None
+        self.nodes = 0
+        # the range of the values seen so far, the values are scaled into [0, 1] for UCT
+        self.low = float('inf')
+        self.high = float('-inf')
+        # iterations of the last search and the visits of the root that were kept from the previous move
+        self.iterations = 0
+        self.reused = 0
+
+    def set_root(self, board: int):
+        # reuse the node of board under the chance node of the last move, otherwise start a new tree
+        previous = self.root
+        self.root = None
+        if previous is not None and isinstance(previous, ChanceNode):
+            self.root = previous.children.get(board)
+        self.reused = self.root.visits if self.root is not None else 0
+        if self.root is not None:
+            self.nodes = _count(self.root)
+        else:
+            self.root = MaxNode(board)
+            self.nodes = 1
+            self.low = float('inf')
+            self.high = float('-inf')
+
+    def advance(self, move):
+        # keep the subtree of the chosen move for the next turn
+        for child in self.root.children or ():
+            if child.move == move:
+                self.root = child
+                return
+        self.root = None
+
+    def search(self, deadline: float = None, max_iterations: int = None):
+        # iterations until the time is over (time.time() > deadline) or max_iterations, at least one
+        self.iterations = 0
+        while True:
+            self._iterate()
+            self.iterations += 1
+            if max_iterations is not None and self.iterations >= max_iterations:
+                break
+            if deadline is not None and time.time() > deadline:
+                break
+
+    def best_move(self):
+        children = self.root.children or []
+        if not children:
+            return None
+        return max(children, key=lambda child: (child.visits, child.total / child.visits if child.visits else 0)).move
+
+    def _expand(self, node: MaxNode):
+        node.children = []
+        boards = self.geometry.all_moves(node.board)
+        for move, new_board in zip(self.moves, boards):
+            if new_board != node.board:
+                node.children.append(ChanceNode(move, new_board))
+        self.nodes += len(node.children)
+
+    def _select(self, node: MaxNode):
+        # the unvisited children first, then the child of the highest upper confidence bound
+        scale = self.high - self.low if self.high > self.low else 1.0
+        log_visits = math.log(node.visits) if node.visits else 0.0
+        best, best_score = None, float('-inf')
+        for child in node.children:
+            if child.visits == 0:
+                return child
+            score = (child.total / child.visits - self.low) / scale + \
+                self.exploration * math.sqrt(log_visits / child.visits)
+            if score > best_score:
+                best, best_score = child, score
+        return best
+
+    def _sample(self, node: ChanceNode):
+        # a random placement of the index player, the MAX node of the placed board
+        shifts = self.geometry.empty_shifts(node.board)
+        exponent = 2 if random.random() < PROBABILITY_4 else 1
+        board = node.board | (exponent << random.choice(shifts))
+        child = node.children.get(board)
+        if child is None:
+            if self.nodes >= self.maxNodes:
+                return None, board
+            child = node.children[board] = MaxNode(board)
+            self.nodes += 1
+        return child, board
+
+    def _iterate(self):
+        path = []
+        node = self.root
+        value = None
+        while True:
+            path.append(node)
+            if node.visits == 0 and node is not self.root:
+                value = self._rollout(node.board)
+                break
+            if node.children is None:
+                self._expand(node)
+            if not node.children:
+                # no legal move, the end of the game
+                value = self.evaluator.evaluate(node.board)
+                break
+            chance = self._select(node)
+            path.append(chance)
+            node, board = self._sample(chance)
+            if node is None:
+                # the tree is full, a rollout from the sampled board without adding it
+                value = self._rollout(board)
+                break
+        self.low = min(self.low, value)
+        self.high = max(self.high, value)
+        for visited in path:
+            visited.visits += 1
+            visited.total += value
+
+    def _rollout(self, board: int):
+        if self.rolloutPolicy == 'none' or self.rolloutDepth == 0:
+            return self.evaluator.evaluate(board)
+        ends = [self._play_out(board) for _ in range(self.rollouts)]
+        if self.batch is not None and len(ends) > 1:
+            return float(self.batch.evaluate(batch.np.array(ends, dtype=batch.np.uint64)).mean())
+        return sum(self.evaluator.evaluate(end) for end in ends) / len(ends)
+
+    def _play_out(self, board: int):
+        # the board at the end of a rollout
+        for _ in range(self.rolloutDepth):
+            boards = [new_board for new_board in self.geometry.all_moves(board) if new_board != board]
+            if not boards:
+                break
+            if self.rolloutPolicy == 'greedy':
+                board = max(boards, key=self.evaluator.evaluate_after)
+            else:
+                board = random.choice(boards)
+            shifts = self.geometry.empty_shifts(board)
+            board |= (2 if random.random() < PROBABILITY_4 else 1) << random.choice(shifts)
+        return board
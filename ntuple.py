@@ -0,0 +1,282 @@
+# N-tuple network evaluator of packed 4x4 boards (see bitboard.py), trained by TD(0) self-play.
+# a tuple is a set of 4 cells, its 4 tiles (exponents of 4 bits) make a 16 bits index into a table of 65536 weights.
+# the value of a board is the sum of the weights of all the tuples on all the 8 symmetries of the board (see
+# symmetry.py), so the network is symmetric by construction and the evaluation cache keeps all the symmetries.
+# the value of the network estimates the sum of the merged tiles from an afterstate (the board after a move, before
+# the tile of the index player) until the end of the game. as the leaf value of the searches (see evaluation.py) the
+# score merged so far is added to it, computed from the tiles of the board (a tile 2**e was merged e - 1 times), so the
+# rewards of the moves on the path of the search count like the score feature of the heuristics: evaluate_after is
+# the value of an afterstate and evaluate the value of a board where the move player moves, by its best move.
+# the weights are a single file of float32 tables, opened with mmap: the players read the weights in place (shared by
+# all the processes of the search) and the training updates them in place.
+# the evaluation is compiled into a single function for the tuples (like evaluation.py), the index of a tuple is made
+# of the runs of its cells that are next to each other in a row, each run taken by a single shift and mask.
+# file format (little endian):
+#   header  MAGIC, version (H), number of tuples (H), weights per tuple (I)
+#   weights float32 for every tuple and index
+# training 100000 games from a new file (or going on with the weights of the file):
+#   python ntuple.py -output ntuple.bin -games 100000 -alpha 0.1
+import argparse
+import mmap
+import os
+import random
+import struct
+import sys
+import time
+import bitboard
+import symmetry
+from AbstractPlayers import Move
+
+MAGIC = b'2048NTUP'
+VERSION = 1
+HEADER = struct.Struct('<8sHHI')
+WEIGHT_BYTES = 4
+TUPLE_WEIGHTS = 1 << 16
+
+# the cells of every tuple: the outer and the inner row and three squares of 2x2, on all the symmetries they cover all
+# the rows, the columns and the squares of the board
+TUPLES = [
+    [(0, 0), (0, 1), (0, 2), (0, 3)],
+    [(1, 0), (1, 1), (1, 2), (1, 3)],
+    [(0, 0), (0, 1), (1, 0), (1, 1)],
+    [(1, 0), (1, 1), (2, 0), (2, 1)],
+    [(1, 1), (1, 2), (2, 1), (2, 2)],
+]
+
+# the file of the network of the evaluators made without weights (see evaluation.default_evaluator), kept in the
+# environment so the processes of the search use it too
+WEIGHTS_ENV = 'NTUPLE_WEIGHTS'
+
+LEARNING_RATE = 0.1
+PROBABILITY_4 = 0.1
+# the same as submission.bit_commands, without importing the players
+_COMMANDS = {Move.UP: bitboard.up, Move.DOWN: bitboard.down, Move.LEFT: bitboard.left, Move.RIGHT: bitboard.right}
+
+
+def _build_score_table():
+    # the score merged to make the tiles of every row, (e - 1) * 2**e for a tile 2**e (the spawned 4s are counted too)
+    table = [0] * (1 << 16)
+    for row in range(1 << 16):
+        table[row] = sum((e - 1) << e for e in ((row >> (4 * k)) & 0xF for k in range(4)) if e > 1)
+    return table
+
+
+ROW_SCORE = _build_score_table()
+
+
+def merged_score(board: int) -> int:
+    return ROW_SCORE[board & 0xFFFF] + ROW_SCORE[(board >> 16) & 0xFFFF] + ROW_SCORE[(board >> 32) & 0xFFFF] + \
+        ROW_SCORE[(board >> 48) & 0xFFFF]
+
+
+def _index_source(cells, board='b'):
+    # the expression of the index of a tuple on a board, a run of cells next to each other in a row is a single mask
+    terms = []
+    k = 0
+    while k < len(cells):
+        i, j = cells[k]
+        length = 1
+        while k + length < len(cells) and cells[k + length] == (i, j + length):
+            length += 1
+        shift = 16 * i + 4 * j - 4 * k
+        mask = ((1 << (4 * length)) - 1) << (4 * k)
+        if shift >= 0:
+            terms.append(f'(({board} >> {shift}) & {mask:#x})')
+        else:
+            terms.append(f'(({board} << {-shift}) & {mask:#x})')
+        k += length
+    return ' | '.join(terms)
+
+
+def _compile(tuples):
+    # features(board) returns the indices into the weights of all the tuples on all the symmetries, value(board) the
+    # sum of their weights
+    boards = ['board', 'mirror(board)', 'flip(board)', 'flip(mirror(board))',
+              't', 'mirror(t)', 'flip(t)', 'flip(mirror(t))']
+    indices = [f'{k * TUPLE_WEIGHTS} + ({_index_source(cells)})' for k, cells in enumerate(tuples)]
+    lines = ['def features(board):',
+             '    t = transpose(board)',
+             '    result = []',
+             f'    for b in ({", ".join(boards)}):',
+             '        result += (' + ', '.join(indices) + ')',
+             '    return result',
+             'def value(board):',
+             '    t = transpose(board)',
+             '    total = 0.0',
+             f'    for b in ({", ".join(boards)}):',
+             '        total += ' + ' + '.join(f'weights[{index}]' for index in indices),
+             '    return total']
+    return compile('\n'.join(lines) + '\n', '<ntuple>', 'exec')
+
+
+def create(path: str, tuples=TUPLES):
+    # a new file of the network with all the weights 0
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(tuples), TUPLE_WEIGHTS))
+        f.truncate(HEADER.size + len(tuples) * TUPLE_WEIGHTS * WEIGHT_BYTES)
+
+
+class NTupleEvaluator:
+    """Evaluator (see evaluation.py) of a network file opened with mmap,
+    value returns the value of the network of an afterstate, evaluate_after the leaf value of an afterstate (with the
+    merged score), evaluate the leaf value of a board where the move player moves and evaluate_placements the values
+    of all the boards made by placing a value in one of the empty cells of the board. values are the weights of the
+    tuples in the file, with writable they can be updated in place (see update).
+    """
+
+    def __init__(self, path: str, writable: bool = False):
+        if sys.byteorder != 'little':
+            raise ValueError('the weights of the network are little endian')
+        self.path = path
+        self.file = open(path, 'r+b' if writable else 'rb')
+        self.values = None
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ)
+        magic, version, count, per_tuple = HEADER.unpack_from(self.data, 0) if len(self.data) >= HEADER.size else \
+            (None, None, 0, 0)
+        if magic != MAGIC or version != VERSION or count != len(TUPLES) or per_tuple != TUPLE_WEIGHTS or \
+                len(self.data) != HEADER.size + count * per_tuple * WEIGHT_BYTES:
+            self.close()
+            raise ValueError(f'{path} is not a network of version {VERSION} with {len(TUPLES)} tuples')
+        self.values = memoryview(self.data)[HEADER.size:].cast('f')
+        namespace = {'transpose': bitboard.transpose, 'mirror': bitboard.mirror, 'flip': bitboard.flip,
+                     'weights': self.values}
+        exec(_compile(TUPLES), namespace)
+        self.features = namespace['features']
+        self.value = namespace['value']
+        # the value doesn't change under any of the symmetries (see cache.py)
+        self.symmetries = symmetry.SYMMETRIES
+        self.key = ('ntuple', os.path.abspath(path))
+
+    def evaluate_after(self, board: int):
+        return merged_score(board) + self.value(board)
+
+    def evaluate(self, board: int):
+        # the best afterstate of the legal moves, the merged score if there is none (the end of the game)
+        best = None
+        for after in bitboard.all_moves(board):
+            if after != board:
+                v = merged_score(after) + self.value(after)
+                if best is None or v > best:
+                    best = v
+        return best if best is not None else merged_score(board)
+
+    def evaluate_placements(self, board: int, value: int = 2, shifts=None):
+        # the values of the children in the order of bitboard.empty_shifts(board), or of shifts if they are given
+        exponent = bitboard.exponent_of(value)
+        evaluate = self.evaluate
+        return [evaluate(board | (exponent << shift))
+                for shift in (shifts if shifts is not None else bitboard.empty_shifts(board))]
+
+    def update(self, board: int, delta: float):
+        # move the value of board by delta, spread over all its weights
+        features = self.features(board)
+        step = delta / len(features)
+        weights = self.values
+        for index in features:
+            weights[index] += step
+
+    def flush(self):
+        self.data.flush()
+
+    def close(self):
+        if self.values is not None:
+            self.values.release()
+            self.values = None
+        if self.data is not None:
+            self.data.close()
+            self.data = None
+        self.file.close()
+
+
+def use_network(path: str):
+    # the evaluators made from now on without weights, in this process and in the processes it starts, are the
+    # network of the file (None for the heuristics, see evaluation.py)
+    if path is None:
+        os.environ.pop(WEIGHTS_ENV, None)
+    else:
+        NTupleEvaluator(path).close()
+        os.environ[WEIGHTS_ENV] = path
+
+
+# the networks by path, opened once in every process
+_networks = {}
+
+
+def network_of(path: str) -> NTupleEvaluator:
+    if path not in _networks:
+        _networks[path] = NTupleEvaluator(path)
+    return _networks[path]
+
+
+def _random_tile(board: int, rng):
+    shifts = bitboard.empty_shifts(board)
+    return board | ((2 if rng.random() < PROBABILITY_4 else 1) << rng.choice(shifts))
+
+
+def play_and_learn(network: NTupleEvaluator, rng, learning_rate: float = LEARNING_RATE):
+    """play a single game by the network and learn from it by TD(0) on the afterstates (the boards after the moves).
+    every turn takes the move of the highest merged score plus the value of its afterstate, and the value of the
+    previous afterstate moves towards this sum. the value of the last afterstate moves towards 0.
+    returns the score and the max tile of the game.
+    """
+    board = _random_tile(_random_tile(0, rng), rng)
+    score = 0
+    previous = None
+    evaluate = network.value
+    while True:
+        best = None
+        for move in Move:
+            new_board, done, reward = _COMMANDS[move](board)
+            if done:
+                v = reward + evaluate(new_board)
+                if best is None or v > best[0]:
+                    best = (v, new_board, reward)
+        if best is None:
+            break
+        v, after, reward = best
+        if previous is not None:
+            network.update(previous, learning_rate * (v - evaluate(previous)))
+        previous = after
+        score += reward
+        board = _random_tile(after, rng)
+    if previous is not None:
+        network.update(previous, learning_rate * -evaluate(previous))
+    return score, max(max(row) for row in bitboard.unpack(board))
+
+
+def train(path: str, games: int, learning_rate: float = LEARNING_RATE, seed: int = 0, report_every: int = 1000):
+    # train the network of the file for games games (a new network if the file doesn't exist), the weights are
+    # flushed to the file with every report
+    if not os.path.exists(path):
+        create(path)
+    network = NTupleEvaluator(path, writable=True)
+    rng = random.Random(seed)
+    scores = []
+    max_tiles = {}
+    started = time.time()
+    try:
+        for game in range(1, games + 1):
+            score, max_tile = play_and_learn(network, rng, learning_rate)
+            scores.append(score)
+            max_tiles[max_tile] = max_tiles.get(max_tile, 0) + 1
+            if game % report_every == 0 or game == games:
+                network.flush()
+                print(f'game {game}: mean score {sum(scores) / len(scores):.0f}, max tiles '
+                      f'{dict(sorted(max_tiles.items()))}, {time.time() - started:.0f}s')
+                scores = []
+                max_tiles = {}
+    finally:
+        network.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-output', default='ntuple.bin', type=str,
+                        help='File of the network, the training goes on with its weights if it exists.')
+    parser.add_argument('-games', default=10000, type=int, help='Number of games of self-play.')
+    parser.add_argument('-alpha', default=LEARNING_RATE, type=float, help='Learning rate of TD(0).')
+    parser.add_argument('-seed', default=0, type=int, help='Seed of the random tiles.')
+    parser.add_argument('-report_every', default=1000, type=int, help='Games between the reports.')
+    args = parser.parse_args()
+
+    train(args.output, args.games, args.alpha, args.seed, args.report_every)
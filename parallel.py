@@ -0,0 +1,123 @@
+# Root parallel search for the search players.
+# the children of the root (the moves of a move player or the cells of an index player) are searched at the same time
+# by a persistent pool of processes. every process keeps its own BitHELPER (with a transposition table) between the
+# searches, one for every options of the helpers of the players (see options_of): a child is searched with the pruning
+# and the evaluator of the player that searches the root, and its nodes are counted in the helper of the player. all
+# the children of a root share a single deadline, a child that starts after the deadline is skipped, a
+# running child is aborted at the deadline (see deadline.py) and the children that didn't start yet are cancelled.
+import concurrent.futures
+import deadline as search_deadline
+import time
+
+_pool = None
+_workers = 0
+
+# the helpers of a worker process by their options, only the last MAX_HELPERS are kept (every helper has its own
+# transposition table)
+MAX_HELPERS = 4
+_helpers = {}
+
+
+def options_of(helper_fun) -> tuple:
+    # the options of a helper that change the values of its searches: the pruning of RB_Expectimax and its evaluator,
+    # the weights of the heuristics or the file of the n-tuple network
+    weights = getattr(helper_fun.evaluator, 'weights', None)
+    evaluator = ('weights', tuple(sorted(weights.items()))) if weights is not None else \
+        ('ntuple', helper_fun.evaluator.path)
+    return helper_fun.probThreshold, helper_fun.maxCells, evaluator
+
+
+def _helper_of(options):
+    import cache
+    import evaluation
+    import ntuple
+    import submission
+    import transposition
+    helper = _helpers.pop(options, None)
+    if helper is None:
+        prob_threshold, max_cells, (kind, evaluator) = options
+        evaluator = evaluation.Evaluator(dict(evaluator)) if kind == 'weights' else ntuple.network_of(evaluator)
+        helper = submission.BitHELPER(transposition.TranspositionTable(), evaluator, prob_threshold=prob_threshold,
+                                      max_cells=max_cells, cache_entries=cache.DEFAULT_MAX_ENTRIES)
+        if len(_helpers) >= MAX_HELPERS:
+            del _helpers[next(iter(_helpers))]
+    # the last used helper is the last one dropped
+    _helpers[options] = helper
+    return helper
+
+
+def _ready():
+    return True
+
+
+def _search(task, options, deadline):
+    # task is (name of the BitHELPER search function, board, agent, depth, value, probability of the node) searched by
+    # the helper of options, returns the value and the number of searched and pruned nodes. the search is aborted in
+    # the middle at the deadline and its value is None
+    if time.time() > deadline:
+        return None, 0, 0
+    name, board, agent, D, value, prob = task
+    helper = _helper_of(options)
+    helper.nodes = 0
+    helper.prunedBranches = 0
+    helper.context = search_deadline.SearchContext(deadline)
+    try:
+        if name == 'AlphaBeta':
+            result = helper.AlphaBeta(board, agent, D, float('-inf'), float('inf'), value)
+        elif name == 'RB_Expectimax':
+            result = helper.RB_Expectimax(board, agent, D, value, prob)
+        else:
+            result = getattr(helper, name)(board, agent, D, value)
+    except search_deadline.SearchTimeout:
+        result = None
+    finally:
+        helper.context = None
+    return result, helper.nodes, helper.prunedBranches
+
+
+def start(workers: int):
+    # create the pool and start all of its processes now, before the game (and its window) is created
+    global _pool, _workers
+    shutdown()
+    _pool = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+    _workers = workers
+    concurrent.futures.wait([_pool.submit(_ready) for _ in range(workers)])
+
+
+def shutdown():
+    global _pool, _workers
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+    _pool = None
+    _workers = 0
+
+
+def enabled() -> bool:
+    return _pool is not None
+
+
+def workers() -> int:
+    return _workers
+
+
+def search_children(helper_fun, tasks, allowed_time):
+    # the values of all the tasks in their order searched with the options of helper_fun, None if the time is over
+    # before all of them are done. the nodes of the searches are counted in helper_fun
+    deadline = time.time() + allowed_time
+    options = options_of(helper_fun)
+    futures = [_pool.submit(_search, task, options, deadline) for task in tasks]
+    # the first depth of the iterative deepening has no deadline
+    timeout = max(0.0, deadline - time.time()) if allowed_time != float('inf') else None
+    done, not_done = concurrent.futures.wait(futures, timeout=timeout)
+    for future in not_done:
+        future.cancel()
+    for future in done:
+        value, nodes, pruned = future.result()
+        helper_fun.nodes += nodes
+        helper_fun.prunedBranches += pruned
+    if not_done:
+        return None
+    values = [future.result()[0] for future in futures]
+    if any(value is None for value in values):
+        return None
+    return values
@@ -0,0 +1,22 @@
+# The players that can be picked by name, used by main.py and by the headless tools.
+import functools
+import submission
+
+move_players = {'GreedyMovePlayer': submission.GreedyMovePlayer,
+                'ImprovedGreedyMovePlayer': submission.ImprovedGreedyMovePlayer,
+                'MiniMaxMovePlayer': submission.MiniMaxMovePlayer,
+                'ABMovePlayer': submission.ABMovePlayer,
+                'ExpectimaxMovePlayer': submission.ExpectimaxMovePlayer,
+                'ContestMovePlayer': submission.ContestMovePlayer,
+                'MCTSMovePlayer': submission.MCTSMovePlayer
+                }
+
+index_players = {'RandomIndexPlayer': submission.RandomIndexPlayer,
+                 'MiniMaxIndexPlayer': submission.MiniMaxIndexPlayer,
+                 'ExpectimaxIndexPlayer': submission.ExpectimaxIndexPlayer,
+                 # the index players that search only the worst looking cells of the root (see
+                 # submission.adaptive_best_indices)
+                 'AdaptiveMiniMaxIndexPlayer': functools.partial(submission.MiniMaxIndexPlayer, adaptive_width=True),
+                 'AdaptiveExpectimaxIndexPlayer': functools.partial(submission.ExpectimaxIndexPlayer,
+                                                                    adaptive_width=True)
+                 }
@@ -0,0 +1,202 @@
+# Pondering: the search players search during the turn of the opponent.
+# after a player returns its move (or cell), a process of its own searches the positions the player may get next: the
+# boards after the most likely replies of the opponent. the search is an iterative deepening over all these boards,
+# one depth at a time, and the result of every completed depth is sent back. when the next turn of the player starts,
+# if its board is one of the pondered boards, the process keeps searching only this board from the next depth, at the
+# same time as the search of the turn itself. at the end of the turn the deepest of the two results is used (see
+# submission.iterative_deepening), so the pondered board gets the time of the opponent's turn on top of its own.
+# the pondering process keeps its player, and so its transposition table, between the turns, so every ponder starts
+# from the entries of the previous ones. pondering is off unless enable() is called (the -ponder option of main.py).
+import functools
+import multiprocessing
+import queue
+import bitboard
+import deadline
+
+# the replies of the index player that are pondered for a move player, the cells that look worst for it
+PONDER_REPLIES = 4
+# the pondered boards are not searched deeper than this
+MAX_PONDER_DEPTH = 20
+# seconds to wait for the pondering process to stop
+STOP_TIMEOUT = 1.0
+
+_enabled = False
+# the ponderers of all the players, closed by shutdown
+_ponderers = []
+
+
+class PonderContext(deadline.SearchContext):
+    """Context of a ponder search (see deadline.py),
+    poll raises SearchTimeout once the stop event is set instead of at a deadline.
+    """
+
+    def __init__(self, stop, poll_nodes: int = deadline.POLL_NODES):
+        deadline.SearchContext.__init__(self, float('inf'), poll_nodes)
+        self.stop = stop
+
+    def poll(self):
+        self.countdown -= 1
+        if self.countdown <= 0:
+            self.countdown = self.poll_nodes
+            if self.stop.is_set():
+                raise deadline.SearchTimeout()
+
+    def expired(self) -> bool:
+        return self.stop.is_set()
+
+
+def _ponder_loop(player_factory, requests, results, stop):
+    # the pondering process, requests are (generation, boards, first depth) and None to exit. the results are
+    # (generation, board, depth, result) and (generation, None, 0, None) when the ponder of the generation stopped
+    player = player_factory()
+    helper = player.helper_fun
+    while True:
+        request = requests.get()
+        if request is None:
+            return
+        generation, boards, D = request
+        helper.newSearch()
+        helper.context = PonderContext(stop)
+        try:
+            while boards and not stop.is_set() and D <= MAX_PONDER_DEPTH:
+                for board in boards:
+                    result = player.play(board=board, D=D, allowed_time=float('inf'))
+                    if result is not None:
+                        results.put((generation, board, D, result))
+                D += 1
+        except deadline.SearchTimeout:
+            pass
+        finally:
+            helper.context = None
+        results.put((generation, None, 0, None))
+
+
+class Ponderer:
+    """Pondering process of a player,
+    start ponders a list of packed boards, focus keeps pondering only the board of the turn and take stops pondering
+    and returns the deepest result of the board.
+    """
+
+    def __init__(self, player_factory):
+        # a new interpreter, a forked process would inherit the process pool of parallel
+        context = multiprocessing.get_context('spawn')
+        self.requests = context.Queue()
+        self.results = context.Queue()
+        self.stop = context.Event()
+        self.process = context.Process(target=_ponder_loop,
+                                       args=(player_factory, self.requests, self.results, self.stop), daemon=True)
+        self.process.start()
+        self.generation = 0
+        self.pondering = False
+        # the deepest result of every pondered board, (depth, result) by the board
+        self.best = {}
+
+    def start(self, boards, first_depth: int = 1):
+        self._stop()
+        self.generation += 1
+        self.stop.clear()
+        self.requests.put((self.generation, list(boards), first_depth))
+        self.pondering = True
+
+    def _stop(self):
+        # stop the ponder and collect its results
+        if not self.pondering:
+            return
+        self.stop.set()
+        self.pondering = False
+        while True:
+            try:
+                generation, board, D, result = self.results.get(timeout=STOP_TIMEOUT)
+            except queue.Empty:
+                break
+            if generation != self.generation:
+                continue
+            if board is None:
+                break
+            if board not in self.best or D > self.best[board][0]:
+                self.best[board] = (D, result)
+
+    def focus(self, board: int):
+        # the turn of board started, keep pondering it from the next depth if it was pondered
+        self._stop()
+        best = self.best.get(board)
+        self.best = {board: best} if best is not None else {}
+        if best is not None and best[0] < MAX_PONDER_DEPTH:
+            self.start([board], best[0] + 1)
+
+    def take(self, board: int):
+        # stop pondering, returns (depth, result) of the deepest completed depth of board or None
+        self._stop()
+        best = self.best.get(board)
+        self.best = {}
+        return best
+
+    def close(self):
+        self.stop.set()
+        self.requests.put(None)
+        self.process.join(STOP_TIMEOUT)
+        if self.process.is_alive():
+            self.process.terminate()
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def shutdown():
+    global _enabled
+    for ponderer in _ponderers:
+        ponderer.close()
+    _ponderers.clear()
+    _enabled = False
+
+
+def ponderer_of(player):
+    # the ponderer of player, created on its first turn, None if pondering is off. the pondering process searches 4x4
+    # boards only (see bigboard.py)
+    if not _enabled or player.helper_fun.geometry is not bitboard:
+        return None
+    ponderer = getattr(player, 'ponderer', None)
+    if ponderer is None:
+        # a player made with the same arguments (see the options of the search players), like the players of the
+        # functools.partial of players.py
+        ponderer = player.ponderer = Ponderer(functools.partial(type(player), **getattr(player, 'options', {})))
+        _ponderers.append(ponderer)
+    return ponderer
+
+
+def focus(player, board: int):
+    ponderer = ponderer_of(player)
+    if ponderer is not None:
+        ponderer.focus(board)
+
+
+def take(player, board: int):
+    ponderer = ponderer_of(player)
+    return ponderer.take(board) if ponderer is not None else None
+
+
+def after_move(player, new_board: int):
+    # ponder the boards after the index player places 2 in the cells that look worst for the move player
+    ponderer = ponderer_of(player)
+    if ponderer is None:
+        return
+    shifts = bitboard.empty_shifts(new_board)
+    static = player.helper_fun.evaluator.evaluate_placements(new_board, 2, shifts)
+    replies = [new_board | (1 << shift) for v, shift in sorted(zip(static, shifts))[:PONDER_REPLIES]]
+    ponderer.start(replies)
+
+
+def after_indices(player, new_board: int):
+    # ponder the boards after every legal move of the move player, the best looking first
+    ponderer = ponderer_of(player)
+    if ponderer is None:
+        return
+    children = player.helper_fun.maxChildren(new_board)
+    children.sort(key=lambda child: player.helper_fun.evaluator.evaluate_after(child[1]), reverse=True)
+    ponderer.start([child for move, child in children])
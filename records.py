@@ -0,0 +1,300 @@
+# Binary records of the games: one record of fixed size for every ply, appended to a log file.
+# a record has the packed board before the ply (see bitboard.py), the game and the ply, the kind of the ply (the move
+# player or the index player), its action, the value placed by the index player, the depth reached by the search of
+# the player and the seconds of the turn. a record is written by a single append, so the processes of the simulator
+# can record into the same log, and a log cut by a crash loses at most its last record.
+# the log is read with mmap (see GameLog): the records are unpacked while they are iterated, so a log of millions of
+# records is read without loading it.
+# on top of the reader, analyze re-scores the logged positions with any player of players.py, by its own choice and,
+# for the search players, by the value of the logged action against the value of its best action at the depth it
+# reached. the positions of the largest loss are the blunders of the logged player.
+# file format (little endian):
+#   header  MAGIC, version (H), record size (H), 4 pad bytes
+#   record  board (Q), game (I), ply (H), kind (B), action (B), value (B), depth (B), seconds (f)
+# kind is MOVE or INDEX, action is the index of the move in Move or the cell 4*i + j, value is the exponent of the
+# placed value (0 for a move).
+# recording the games of the simulator and finding the blunders of ContestMovePlayer by a deeper search:
+#   python simulator.py -player1 ContestMovePlayer -games 50 -move_time 0.1 -record games.rec
+#   python records.py -log games.rec -player1 ExpectimaxMovePlayer -depth 4 -workers 8 -top 20
+import argparse
+import concurrent.futures
+import json
+import mmap
+import os
+import struct
+import time
+import bitboard
+from AbstractPlayers import Move
+
+MAGIC = b'2048GREC'
+VERSION = 1
+HEADER = struct.Struct('<8sHH4x')
+RECORD = struct.Struct('<QIHBBBBf')
+
+MOVE = 0
+INDEX = 1
+MOVES = list(Move)
+MAX_DEPTH = 255
+# the same as submission.bit_commands, without importing the players
+_COMMANDS = {Move.UP: bitboard.up, Move.DOWN: bitboard.down, Move.LEFT: bitboard.left, Move.RIGHT: bitboard.right}
+
+# the search of the root of every search player (see book.py), the other players are analyzed by their choice only
+SEARCHES = {'MiniMaxMovePlayer': 'RB_MINIMAX', 'ABMovePlayer': 'AlphaBeta', 'ExpectimaxMovePlayer': 'RB_Expectimax',
+            'ContestMovePlayer': 'AlphaBeta', 'MiniMaxIndexPlayer': 'RB_MINIMAX',
+            'ExpectimaxIndexPlayer': 'RB_Expectimax', 'AdaptiveMiniMaxIndexPlayer': 'RB_MINIMAX',
+            'AdaptiveExpectimaxIndexPlayer': 'RB_Expectimax'}
+
+
+class Recorder:
+    """Log file of records opened for appending,
+    record appends the record of a single ply. a new file gets its header first.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        try:
+            # only the process that creates the file writes the header
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL | os.O_APPEND, 0o644)
+            os.write(fd, HEADER.pack(MAGIC, VERSION, RECORD.size))
+        except FileExistsError:
+            fd = os.open(path, os.O_WRONLY | os.O_APPEND)
+        self.fd = fd
+
+    def record(self, board: int, game: int, ply: int, kind: int, action: int, value: int = 0, depth: int = 0,
+               seconds: float = 0.0):
+        os.write(self.fd, RECORD.pack(board, game & 0xFFFFFFFF, min(ply, 0xFFFF), kind, action, value,
+                                      min(depth, MAX_DEPTH), seconds))
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+def _depth_of(player) -> int:
+    # the depth completed by the last search of a search player, 0 for the other players
+    helper = getattr(player, 'helper_fun', None)
+    return len(getattr(helper, 'nodesPerDepth', ()))
+
+
+def record_players(player_1, player_2, recorder: Recorder, game: int):
+    """record every turn of the move player player_1 and the index player player_2 of a 4x4 game, the plies are
+    counted from the first turn of the game.
+    """
+    plies = [0]
+
+    def record(board, kind, action, value, player, seconds):
+        recorder.record(bitboard.pack(board), game, plies[0], kind, action, value, _depth_of(player), seconds)
+        plies[0] += 1
+
+    get_move = player_1.get_move
+    get_indices = player_2.get_indices
+
+    def recorded_move(board, time_limit):
+        started = time.perf_counter()
+        move = get_move(board, time_limit)
+        record(board, MOVE, MOVES.index(move), 0, player_1, time.perf_counter() - started)
+        return move
+
+    def recorded_indices(board, value, time_limit):
+        started = time.perf_counter()
+        i, j = get_indices(board, value, time_limit)
+        record(board, INDEX, i * bitboard.SIZE + j, bitboard.exponent_of(value), player_2,
+               time.perf_counter() - started)
+        return i, j
+
+    player_1.get_move = recorded_move
+    player_2.get_indices = recorded_indices
+
+
+class GameLog:
+    """Log file of records opened with mmap,
+    len is the number of records, iterating yields the records as tuples (board, game, ply, kind, action, value,
+    depth, seconds) and log[k] is the record k. a record cut at the end of the file is not counted.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.file = open(path, 'rb')
+        size = os.fstat(self.file.fileno()).st_size
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        if size < HEADER.size:
+            self.close()
+            raise ValueError(f'{path} is not a log of games')
+        magic, version, record_size = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION or record_size != RECORD.size:
+            self.close()
+            raise ValueError(f'{path} is not a log of games of version {VERSION}')
+        self.count = (size - HEADER.size) // RECORD.size
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, k: int):
+        if not -self.count <= k < self.count:
+            raise IndexError(k)
+        return RECORD.unpack_from(self.data, HEADER.size + (k % self.count) * RECORD.size)
+
+    def __iter__(self):
+        return self.records()
+
+    def records(self, start: int = 0, end: int = None):
+        # the records start .. end - 1, unpacked one at a time from the mapped file
+        end = self.count if end is None else min(end, self.count)
+        if start >= end:
+            return iter(())
+        view = memoryview(self.data)[HEADER.size + start * RECORD.size:HEADER.size + end * RECORD.size]
+        return RECORD.iter_unpack(view)
+
+    def close(self):
+        if self.data is not None:
+            self.data.close()
+            self.data = None
+        self.file.close()
+
+
+def action_values(helper, search: str, board: int, kind: int, value: int, D: int):
+    """the value of every action of a position by a search of depth D of helper (a BitHELPER), like the roots of the
+    players: the moves of a MOVE position and the cells of an INDEX position, where the index player places value. the
+    value of a cell for RB_Expectimax is the expectation of placing 2 or 4 in it, the value the expectimax index player
+    chooses by (the placed value doesn't count).
+    """
+    import submission
+    values = {}
+    if kind == MOVE:
+        agent = submission.CHANCE_PLAYER if search == 'RB_Expectimax' else submission.MIN_PLAYER
+        for k, move in enumerate(MOVES):
+            new_board, done, score = _COMMANDS[move](board)
+            if done:
+                values[k] = _search_value(helper, search, new_board, agent, D - 1, 2)
+    else:
+        for shift in bitboard.empty_shifts(board):
+            i, j = bitboard.cell_of(shift)
+            if search == 'RB_Expectimax':
+                values[i * bitboard.SIZE + j] = sum(
+                    probability * helper.RB_Expectimax(board | (bitboard.exponent_of(placed) << shift),
+                                                       submission.MAX_PLAYER, D - 1, prob=probability)
+                    for placed, probability in ((2, submission.P2), (4, submission.P4)))
+            else:
+                child = board | (bitboard.exponent_of(value) << shift)
+                values[i * bitboard.SIZE + j] = _search_value(helper, search, child, submission.MAX_PLAYER, D - 1,
+                                                              value)
+    return values
+
+
+def _search_value(helper, search, board, agent, D, value):
+    if search == 'AlphaBeta':
+        return helper.AlphaBeta(board, agent, D, float('-inf'), float('inf'), value)
+    return getattr(helper, search)(board, agent, D, value)
+
+
+# the players of a process that analyzes records by their names
+_analysts = {}
+
+
+def _analyst(name: str, depth: int):
+    import players
+    import simulator
+    if name not in _analysts:
+        player = players.move_players[name]() if name in players.move_players else players.index_players[name]()
+        if depth is not None:
+            simulator.set_depth(player, depth)
+        _analysts[name] = player
+    return _analysts[name]
+
+
+def analyze_record(record, move_player: str = None, index_player: str = None, depth: int = None,
+                   move_time: float = 1.0):
+    """re-score a single record with the analyst of its kind (names of players.py), None if there is no analyst of the
+    kind. returns the analysis: the logged and the chosen action, and for the search players the values of both and
+    the loss of the logged action (how much worse it is than the chosen one for its player, 0 if it is as good).
+    """
+    board, game, ply, kind, action, value, depth_reached, seconds = record
+    name = move_player if kind == MOVE else index_player
+    if name is None:
+        return None
+    player = _analyst(name, depth)
+    unpacked = bitboard.unpack(board)
+    time_limit = move_time if depth is None else float('inf')
+    placed = 2 ** value if value else 0
+    if kind == MOVE:
+        chosen = MOVES.index(player.get_move(unpacked, time_limit))
+    else:
+        i, j = player.get_indices(unpacked, placed, time_limit)
+        chosen = i * bitboard.SIZE + j
+    analysis = {'game': game, 'ply': ply, 'kind': 'move' if kind == MOVE else 'index', 'board': unpacked,
+                'value': placed, 'logged': action, 'logged_depth': depth_reached, 'logged_seconds': seconds,
+                'chosen': chosen, 'agrees': chosen == action, 'depth': _depth_of(player), 'loss': None}
+    search = SEARCHES.get(name)
+    if search is not None and analysis['depth'] > 0:
+        values = action_values(player.helper_fun, search, board, kind, placed, analysis['depth'])
+        if action in values:
+            best = max(values.values()) if kind == MOVE else min(values.values())
+            analysis.update(logged_value=values[action], best_value=best,
+                            loss=best - values[action] if kind == MOVE else values[action] - best)
+    return analysis
+
+
+def _analyze_range(task):
+    path, start, end, options = task
+    log = GameLog(path)
+    try:
+        return [analysis for analysis in (analyze_record(record, **options) for record in log.records(start, end))
+                if analysis is not None]
+    finally:
+        log.close()
+
+
+def analyze(path: str, move_player: str = None, index_player: str = None, depth: int = None, move_time: float = 1.0,
+            workers: int = 1, chunk: int = 256):
+    """re-score all the records of the log with the analysts (see analyze_record) and yield the analyses, in the
+    order of the records. with workers > 1 the chunks of records are analyzed by a pool of processes, every process
+    reads its chunk from the log by itself.
+    """
+    log = GameLog(path)
+    count = len(log)
+    log.close()
+    options = dict(move_player=move_player, index_player=index_player, depth=depth, move_time=move_time)
+    tasks = [(path, start, min(start + chunk, count), options) for start in range(0, count, chunk)]
+    if workers <= 1:
+        for task in tasks:
+            yield from _analyze_range(task)
+        return
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        for analyses in pool.map(_analyze_range, tasks):
+            yield from analyses
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-log', required=True, type=str, help='Log of the recorded games.')
+    parser.add_argument('-player1', default=None, type=str, help='Move player that re-scores the move records.')
+    parser.add_argument('-player2', default=None, type=str, help='Index player that re-scores the index records.')
+    parser.add_argument('-depth', default=None, type=int, help='Fixed search depth of the analysts.')
+    parser.add_argument('-move_time', default=1.0, type=float, help='Time (sec) of the analysts without -depth.')
+    parser.add_argument('-workers', default=1, type=int, help='Number of processes analyzing the records.')
+    parser.add_argument('-top', default=10, type=int, help='Number of the worst positions to print.')
+    parser.add_argument('-output', default=None, type=str, help='File to write every analysis (json lines).')
+    args = parser.parse_args()
+
+    if args.player1 is None and args.player2 is None:
+        parser.error('at least one of -player1 and -player2 is needed')
+    output = open(args.output, 'w') if args.output else None
+    analyses = 0
+    agreements = 0
+    worst = []
+    try:
+        for analysis in analyze(args.log, args.player1, args.player2, args.depth, args.move_time, args.workers):
+            analyses += 1
+            agreements += analysis['agrees']
+            if analysis['loss']:
+                worst.append(analysis)
+                worst = sorted(worst, key=lambda a: a['loss'], reverse=True)[:args.top]
+            if output is not None:
+                output.write(json.dumps(analysis) + '\n')
+    finally:
+        if output is not None:
+            output.close()
+    print(f'{analyses} positions, the analysts agree on {agreements}')
+    for analysis in worst:
+        print(json.dumps(analysis))
@@ -0,0 +1,326 @@
+# Match server: many games at the same time in a single asyncio process.
+# a game request names the players (see players.py), the time of a move and the seed of the game. the games run on the
+# event loop, only the turns of the players run on a bounded pool of worker processes: every game is hosted by one
+# worker, which keeps the players of the game (and their tables) between its turns. a worker plays one turn at a time,
+# the turns of the games it hosts wait for it in turn, so the clock of a turn starts when the worker starts it.
+# a turn that takes more than its move_time plus MOVE_GRACE loses the game by time. the worker still finishes the late
+# turn, its answer is dropped.
+# the results are streamed back as the games finish, not in the order of the requests.
+# serving json lines on a local port, every request line gets a result line with the same id when its game is over:
+#   python server.py -port 8048 -workers 8
+#   {"id": 1, "move_player": "ExpectimaxMovePlayer", "index_player": "MiniMaxIndexPlayer", "move_time": 0.2, "seed": 7}
+# or playing the requests of a file (json lines) and printing the results:
+#   python server.py -requests bracket.jsonl -workers 8 -output results.jsonl
+import argparse
+import asyncio
+import concurrent.futures
+import itertools
+import json
+import os
+import random
+import sys
+import time
+import players
+import simulator
+import submission
+from AbstractPlayers import Move
+
+# seconds a turn may take after its move_time before it loses the game
+MOVE_GRACE = 0.5
+# games played at the same time, the next requests wait for a game to finish
+MAX_GAMES = 256
+
+# the fields of a request and their default values
+DEFAULT_REQUEST = {'id': None, 'move_player': 'ExpectimaxMovePlayer', 'index_player': 'MiniMaxIndexPlayer',
+                   'move_time': 1.0, 'seed': 0, 'depth': None, 'random_value': None, 'max_moves': None,
+                   'size': simulator.SIZE}
+
+# the players of the games hosted by a worker process by the id of the game
+_games = {}
+
+
+def _new_game(game_id, move_player, index_player, depth):
+    player_1 = players.move_players[move_player]()
+    player_2 = players.index_players[index_player]()
+    if depth is not None:
+        simulator.set_depth(player_1, depth)
+        simulator.set_depth(player_2, depth)
+    _games[game_id] = (player_1, player_2)
+
+
+def _get_move(game_id, board, time_limit, seed):
+    # the random players of a turn are seeded by the game and the ply, so a game of fixed depth is replayed by its seed
+    random.seed(seed)
+    return _games[game_id][0].get_move(board, time_limit)
+
+
+def _get_indices(game_id, board, value, time_limit, seed):
+    random.seed(seed)
+    return _games[game_id][1].get_indices(board, value, time_limit)
+
+
+def _end_game(game_id):
+    _games.pop(game_id, None)
+
+
+def _ready():
+    return True
+
+
+class MoveTimeout(Exception):
+    pass
+
+
+def _release_when_done(future, lock):
+    # the worker is busy until the future is done, then its result or its error is dropped
+    def release(done):
+        lock.release()
+        if not done.cancelled():
+            done.exception()
+    future.add_done_callback(release)
+
+
+def check_request(request: dict) -> dict:
+    # the request with the default values of the missing fields, ValueError if it can't be played
+    unknown = set(request) - set(DEFAULT_REQUEST)
+    if unknown:
+        raise ValueError(f'unknown fields {", ".join(sorted(unknown))}, the fields are {", ".join(DEFAULT_REQUEST)}')
+    request = dict(DEFAULT_REQUEST, **request)
+    if request['move_player'] not in players.move_players:
+        raise ValueError(f"unknown move player {request['move_player']}")
+    if request['index_player'] not in players.index_players:
+        raise ValueError(f"unknown index player {request['index_player']}")
+    if request['depth'] is None and not request['move_time'] > 0:
+        raise ValueError('a game without a fixed depth needs a positive move_time')
+    return request
+
+
+class MatchServer:
+    """Games between the players on a pool of workers processes,
+    play plays a single game and returns its result, run plays many games and yields their results as they finish.
+    start starts the worker processes and close stops them, or use the server as an async context manager.
+    """
+
+    def __init__(self, workers: int = None, max_games: int = MAX_GAMES, move_grace: float = MOVE_GRACE):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_games = max_games
+        self.move_grace = move_grace
+        self._pools = []
+        # a worker plays a single turn at a time, the lock is held from the start of a turn to its end
+        self._locks = []
+        # the number of games hosted by every worker, a new game goes to the worker with the fewest games
+        self._hosted = []
+        self._ids = itertools.count()
+        self._slots = None
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        self._pools = [concurrent.futures.ProcessPoolExecutor(max_workers=1) for _ in range(self.workers)]
+        self._locks = [asyncio.Lock() for _ in range(self.workers)]
+        self._hosted = [0] * self.workers
+        self._slots = asyncio.Semaphore(self.max_games)
+        # start all the processes now, before the first game
+        await asyncio.gather(*[loop.run_in_executor(pool, _ready) for pool in self._pools])
+
+    async def close(self):
+        for pool in self._pools:
+            pool.shutdown(wait=False, cancel_futures=True)
+        self._pools = []
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def _call(self, worker: int, timeout, function, *args):
+        # run function on the worker and return its result and its seconds, MoveTimeout after timeout seconds (None
+        # for no timeout). the worker is busy until the function returns, also after a timeout
+        loop = asyncio.get_running_loop()
+        lock = self._locks[worker]
+        await lock.acquire()
+        started = time.time()
+        try:
+            future = loop.run_in_executor(self._pools[worker], function, *args)
+        except BaseException:
+            lock.release()
+            raise
+        try:
+            result = await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            _release_when_done(future, lock)
+            raise MoveTimeout()
+        except BaseException:
+            _release_when_done(future, lock)
+            raise
+        lock.release()
+        return result, time.time() - started
+
+    async def play(self, request: dict) -> dict:
+        """play the game of a request (see DEFAULT_REQUEST) and return its result, the same fields as the result of
+        simulator.play_game with the id of the request, the worker of the game and the player that lost by time
+        ('move' or 'index', None if none did) or the error that stopped the game.
+        """
+        request = check_request(request)
+        async with self._slots:
+            worker = min(range(self.workers), key=lambda k: self._hosted[k])
+            self._hosted[worker] += 1
+            game_id = next(self._ids)
+            try:
+                return await self._play(request, worker, game_id)
+            finally:
+                self._hosted[worker] -= 1
+                try:
+                    await self._call(worker, None, _end_game, game_id)
+                except Exception:
+                    pass
+
+    async def _play(self, request, worker, game_id):
+        seed = request['seed']
+        rng = random.Random(seed)
+        size = request['size']
+        depth = request['depth']
+        random_value = request['random_value']
+        if random_value is None:
+            random_value = request['move_player'] == 'ExpectimaxMovePlayer'
+        # with a fixed depth the turns have no time limit
+        time_limit = request['move_time'] if depth is None else float('inf')
+        timeout = time_limit + self.move_grace if depth is None else None
+        board = [[0] * size for _ in range(size)]
+        for i, j in rng.sample([(i, j) for i in range(size) for j in range(size)], 2):
+            board[i][j] = 2
+        commands = simulator.board_commands(size)
+        result = {'id': request['id'], 'player1': request['move_player'], 'player2': request['index_player'],
+                  'seed': seed, 'worker': worker, 'score': 0, 'moves': 0, 'timeout': None, 'error': None}
+        move_seconds = []
+        index_seconds = []
+        started = time.time()
+        ply = 0
+        try:
+            await self._call(worker, None, _new_game, game_id, request['move_player'], request['index_player'],
+                             depth)
+            max_moves = request['max_moves']
+            while simulator.can_move(board, commands) and (max_moves is None or result['moves'] < max_moves):
+                turn = 'move'
+                move, seconds = await self._call(worker, timeout, _get_move, game_id, board, time_limit,
+                                                 seed * 1000003 + ply)
+                ply += 1
+                move_seconds.append(seconds)
+                board, done, move_score = commands[Move(move)](board)
+                if not done:
+                    break
+                result['score'] += move_score
+                result['moves'] += 1
+                value = 4 if random_value and rng.random() < submission.PROBABILITY else 2
+                turn = 'index'
+                (i, j), seconds = await self._call(worker, timeout, _get_indices, game_id, board, value, time_limit,
+                                                   seed * 1000003 + ply)
+                ply += 1
+                index_seconds.append(seconds)
+                board[i][j] = value
+        except MoveTimeout:
+            result['timeout'] = turn
+        except Exception as error:
+            result['error'] = f'{type(error).__name__}: {error}'
+        result.update({'max_tile': max(max(row) for row in board), 'seconds': time.time() - started,
+                       'max_move_seconds': max(move_seconds, default=0.0),
+                       'max_index_seconds': max(index_seconds, default=0.0), 'board': board})
+        return result
+
+    async def run(self, requests):
+        """play the games of all the requests at the same time (up to max_games) and yield their results as they
+        finish. a request that can't be played yields a result with its error.
+        """
+        async def play(request):
+            try:
+                return await self.play(request)
+            except ValueError as error:
+                return {'id': request.get('id'), 'error': str(error)}
+
+        for task in asyncio.as_completed([asyncio.ensure_future(play(request)) for request in requests]):
+            yield await task
+
+    async def serve(self, host: str = 'localhost', port: int = 8048):
+        # serve json lines until cancelled: every line of a client is a request, every finished game a result line
+        async def client(reader, writer):
+            write_lock = asyncio.Lock()
+            games = set()
+
+            async def send(result):
+                async with write_lock:
+                    writer.write((json.dumps(result) + '\n').encode())
+                    await writer.drain()
+
+            async def answer(request):
+                try:
+                    result = await self.play(request)
+                except ValueError as error:
+                    result = {'id': request.get('id'), 'error': str(error)}
+                await send(result)
+
+            try:
+                while line := await reader.readline():
+                    if not line.strip():
+                        continue
+                    try:
+                        request = json.loads(line)
+                        if not isinstance(request, dict):
+                            raise ValueError('a request is a json object')
+                    except ValueError as error:
+                        await send({'id': None, 'error': str(error)})
+                        continue
+                    game = asyncio.ensure_future(answer(request))
+                    games.add(game)
+                    game.add_done_callback(games.discard)
+                # the client closed its side, its games still answer
+                if games:
+                    await asyncio.wait(games)
+            finally:
+                writer.close()
+
+        server = await asyncio.start_server(client, host, port)
+        async with server:
+            await server.serve_forever()
+
+
+def _read_requests(path):
+    with open(path) if path != '-' else sys.stdin as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+async def _main(args):
+    async with MatchServer(args.workers, args.max_games, args.move_grace) as server:
+        if args.requests is None:
+            print(f'Serving games on {args.host}:{args.port} with {server.workers} workers')
+            await server.serve(args.host, args.port)
+            return
+        output = open(args.output, 'w') if args.output else None
+        try:
+            async for result in server.run(_read_requests(args.requests)):
+                print(json.dumps({key: value for key, value in result.items() if key != 'board'}))
+                if output is not None:
+                    output.write(json.dumps(result) + '\n')
+                    output.flush()
+        finally:
+            if output is not None:
+                output.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-workers', default=os.cpu_count(), type=int, help='Number of processes playing the turns.')
+    parser.add_argument('-max_games', default=MAX_GAMES, type=int, help='Games played at the same time.')
+    parser.add_argument('-move_grace', default=MOVE_GRACE, type=float,
+                        help='Seconds a turn may take after its move_time before it loses the game.')
+    parser.add_argument('-host', default='localhost', type=str, help='Host to serve on.')
+    parser.add_argument('-port', default=8048, type=int, help='Port to serve on.')
+    parser.add_argument('-requests', default=None, type=str,
+                        help='File of requests (json lines, - for stdin) to play instead of serving.')
+    parser.add_argument('-output', default=None, type=str, help='File to write the result of every game (json lines).')
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(_main(args))
+    except KeyboardInterrupt:
+        pass
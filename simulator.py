@@ -0,0 +1,266 @@
+# Headless games between a move player and an index player, without the window of Games.
+# every game is seeded, so the same seed with the same players and fixed depth replays the same game. batches of games
+# run at the same time on a pool of processes, one game per task.
+# for example, 200 games of fixed depth 3 on 8 processes:
+#   python simulator.py -player1 ExpectimaxMovePlayer -player2 RandomIndexPlayer -games 200 -depth 3 -workers 8
+import argparse
+import bigboard
+import book
+import concurrent.futures
+import evaluation
+import json
+import ntuple
+import os
+import random
+import records
+import statistics
+import time
+import instrumentation
+import players
+import ponder
+import submission
+import timemanager
+from AbstractPlayers import Move
+
+SIZE = 4
+
+
+def new_board(size=SIZE):
+    # an empty board with two tiles of 2 in random cells
+    board = [[0] * size for _ in range(size)]
+    for i, j in random.sample([(i, j) for i in range(size) for j in range(size)], 2):
+        board[i][j] = 2
+    return board
+
+
+def _packed_command(geometry, move):
+    def command(board):
+        new_board, done, score = move(geometry.pack(board))
+        return geometry.unpack(new_board), done, score
+    return command
+
+
+def board_commands(size: int = SIZE):
+    # the commands of the game (see submission.commands) for boards of size, other sizes than 4x4 are moved as packed
+    # boards (see bigboard.py)
+    if size == SIZE:
+        return submission.commands
+    geometry = bigboard.geometry(size)
+    return {Move.UP: _packed_command(geometry, geometry.up), Move.DOWN: _packed_command(geometry, geometry.down),
+            Move.LEFT: _packed_command(geometry, geometry.left), Move.RIGHT: _packed_command(geometry, geometry.right)}
+
+
+def can_move(board, commands=None):
+    commands = commands if commands is not None else submission.commands
+    return any(commands[move](board)[1] for move in Move)
+
+
+def set_depth(player, depth):
+    # fixed depth for the iterative deepening of the search players, the other players have no depth
+    helper = getattr(player, 'helper_fun', None)
+    if isinstance(helper, submission.BitHELPER):
+        helper.maxDepth = depth
+
+
+def set_weights(player, weights):
+    # the weights of the heuristic features of the search players (see evaluation.py), the other players have none
+    helper = getattr(player, 'helper_fun', None)
+    if isinstance(helper, submission.BitHELPER):
+        helper.setEvaluator(evaluation.evaluator_for(helper.geometry, weights))
+
+
+def play_game(move_player: str, index_player: str, seed: int, move_time: float = 1.0, depth: int = None,
+              random_value: bool = None, max_moves: int = None, trace: str = None, book_path: str = None,
+              turns: list = None, pondering: bool = False, weights_path: str = None, move_weights: dict = None,
+              size: int = SIZE, ntuple_path: str = None, record: str = None, time_budget: float = None):
+    """play a single game between the players (names of players.move_players / players.index_players) and return its
+    result. with depth the players search to this fixed depth without a time limit, otherwise they have move_time
+    seconds for every turn. random_value places 4 with probability PROBABILITY (like main.py, on by default only
+    against ExpectimaxMovePlayer). with trace the moves of both players are traced to this file (see
+    instrumentation.py). with book_path the search players answer from this book when they can (see book.py).
+    turns, if given, gets a copy of the board before every turn with the player of the turn ('move' or 'index').
+    with pondering the search players search during the turn of the opponent (see ponder.py). with weights_path the
+    players evaluate with the weights of this config file (see evaluation.py), move_weights are weights of the move
+    player only. with ntuple_path the players evaluate the 4x4 boards with this n-tuple network (see ntuple.py). the
+    board is size x size (see bigboard.py for the sizes other than 4x4). with record every ply of a 4x4 game is
+    appended to this log of records, the game is the seed (see records.py). with time_budget the search players spend
+    this average of seconds per turn over the game, by the difficulty of every turn, and never more than move_time in a
+    turn (see timemanager.py), the result has the allocation of their time.
+    """
+    random.seed(seed)
+    # the book, the pondering and the evaluators of the processes are global, the game restores them when it is over
+    previous_book = book.book_path()
+    previous_pondering = ponder.enabled()
+    previous_config = os.environ.get(evaluation.CONFIG_ENV)
+    previous_network = os.environ.get(ntuple.WEIGHTS_ENV)
+    tracer = None
+    recorder = None
+    try:
+        if book_path is not None:
+            book.open_book(book_path)
+        if pondering:
+            ponder.enable()
+        if weights_path is not None:
+            evaluation.use_config(weights_path)
+        if ntuple_path is not None:
+            ntuple.use_network(ntuple_path)
+        if random_value is None:
+            random_value = move_player == 'ExpectimaxMovePlayer'
+        player_1 = players.move_players[move_player]()
+        player_2 = players.index_players[index_player]()
+        if move_weights is not None:
+            set_weights(player_1, move_weights)
+        managers = {}
+        if time_budget is not None:
+            for turn, player in (('move', player_1), ('index', player_2)):
+                manager = timemanager.manage(player, time_budget)
+                if manager is not None:
+                    managers[turn] = manager
+        time_limit = move_time
+        if depth is not None:
+            set_depth(player_1, depth)
+            set_depth(player_2, depth)
+            time_limit = float('inf')
+        if trace is not None:
+            tracer = instrumentation.Tracer(trace, seed=seed)
+            instrumentation.instrument_player(player_1, tracer, move_player)
+            instrumentation.instrument_player(player_2, tracer, index_player)
+        if record is not None:
+            if size != SIZE:
+                raise ValueError(f'only {SIZE}x{SIZE} games can be recorded')
+            recorder = records.Recorder(record)
+            records.record_players(player_1, player_2, recorder, seed)
+        board = new_board(size)
+        commands = board_commands(size)
+        score = 0
+        moves = 0
+        move_seconds = []
+        index_seconds = []
+        started = time.time()
+        while can_move(board, commands) and (max_moves is None or moves < max_moves):
+            if turns is not None:
+                turns.append(([row[:] for row in board], 'move'))
+            started_move = time.time()
+            move = player_1.get_move(board, time_limit)
+            move_seconds.append(time.time() - started_move)
+            board, done, move_score = commands[move](board)
+            if not done:
+                break
+            score += move_score
+            moves += 1
+            value = submission.gen_value() if random_value else 2
+            if turns is not None:
+                turns.append(([row[:] for row in board], 'index'))
+            started_move = time.time()
+            i, j = player_2.get_indices(board, value, time_limit)
+            index_seconds.append(time.time() - started_move)
+            board[i][j] = value
+    finally:
+        if tracer is not None:
+            tracer.close()
+        if recorder is not None:
+            recorder.close()
+        if pondering:
+            ponder.shutdown()
+            if previous_pondering:
+                ponder.enable()
+        if book_path is not None:
+            if previous_book is None:
+                book.close_book()
+            else:
+                book.open_book(previous_book)
+        if weights_path is not None:
+            evaluation.use_config(previous_config)
+        if ntuple_path is not None:
+            ntuple.use_network(previous_network)
+    result = {'player1': move_player, 'player2': index_player, 'seed': seed, 'score': score, 'moves': moves,
+              'max_tile': max(max(row) for row in board), 'seconds': time.time() - started,
+              'max_move_seconds': max(move_seconds, default=0.0), 'max_index_seconds': max(index_seconds, default=0.0),
+              'board': board}
+    if managers:
+        result['time_allocation'] = {turn: manager.report() for turn, manager in managers.items()}
+    return result
+
+
+def _play_game(kwargs):
+    return play_game(**kwargs)
+
+
+def simulate(move_player: str, index_player: str, games: int, seed: int = 0, workers: int = 1, **options):
+    """play games games with the seeds seed, seed + 1, ... and yield their results as they finish, on workers processes
+    (in this process if workers is 1). options are passed to play_game.
+    """
+    tasks = [dict(move_player=move_player, index_player=index_player, seed=seed + k, **options) for k in range(games)]
+    if workers <= 1:
+        for task in tasks:
+            yield _play_game(task)
+        return
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        for future in concurrent.futures.as_completed([pool.submit(_play_game, task) for task in tasks]):
+            yield future.result()
+
+
+def summarize(results):
+    scores = [result['score'] for result in results]
+    max_tiles = {}
+    for result in results:
+        max_tiles[result['max_tile']] = max_tiles.get(result['max_tile'], 0) + 1
+    return {'games': len(results), 'mean_score': statistics.mean(scores) if scores else 0,
+            'median_score': statistics.median(scores) if scores else 0,
+            'stdev_score': statistics.stdev(scores) if len(scores) > 1 else 0.0,
+            'mean_moves': statistics.mean(result['moves'] for result in results) if results else 0,
+            'max_tiles': dict(sorted(max_tiles.items()))}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-player1', default='MiniMaxMovePlayer', type=str,
+                        help='The type of the first player(Move player).',
+                        choices=players.move_players.keys())
+    parser.add_argument('-player2', default='MiniMaxIndexPlayer', type=str,
+                        help='The type of the second player(Index Player).',
+                        choices=players.index_players.keys())
+    parser.add_argument('-games', default=10, type=int, help='Number of games to play.')
+    parser.add_argument('-seed', default=0, type=int, help='Seed of the first game, the next games use the next seeds.')
+    parser.add_argument('-move_time', default=1.0, type=float, help='Time (sec) for each turn.')
+    parser.add_argument('-depth', default=None, type=int,
+                        help='Fixed search depth for each turn instead of a time limit.')
+    parser.add_argument('-workers', default=1, type=int, help='Number of processes playing games at the same time.')
+    parser.add_argument('-output', default=None, type=str, help='File to write the result of every game (json lines).')
+    parser.add_argument('-trace', default=None, type=str, help='File to write the trace of every move (json lines).')
+    parser.add_argument('-book', default=None, type=str, help='Book of the search players (see book.py).')
+    parser.add_argument('-ponder', action='store_true', help='Search during the turn of the opponent.')
+    parser.add_argument('-weights', default=None, type=str,
+                        help='Config file of the weights of the heuristic features (see evaluation.py).')
+    parser.add_argument('-ntuple', default=None, type=str,
+                        help='File of an n-tuple network to evaluate with instead of the weights (see ntuple.py).')
+    parser.add_argument('-record', default=None, type=str,
+                        help='Log to append the record of every ply (see records.py).')
+    parser.add_argument('-time_budget', default=None, type=float,
+                        help='Average seconds per turn of the search players over a game, at most -move_time in a '
+                             'turn (see timemanager.py).')
+    parser.add_argument('-size', default=SIZE, type=int, help='Size of the board (see bigboard.py).')
+    args = parser.parse_args()
+
+    print(args.player1, 'VS', args.player2, '-', args.games, 'games')
+    results = []
+    output = open(args.output, 'w') if args.output else None
+    try:
+        for result in simulate(args.player1, args.player2, args.games, args.seed, args.workers,
+                               move_time=args.move_time, depth=args.depth, trace=args.trace,
+                               book_path=args.book, pondering=args.ponder, weights_path=args.weights,
+                               size=args.size, ntuple_path=args.ntuple, record=args.record,
+                               time_budget=args.time_budget):
+            results.append(result)
+            print(f"seed {result['seed']}: score {result['score']}, max tile {result['max_tile']}, "
+                  f"{result['moves']} moves")
+            for turn, report in result.get('time_allocation', {}).items():
+                print(f"  {turn} player: {report['mean_spent']:.3f}s per turn of a budget of "
+                      f"{report['average_budget']:.3f}s, {report['bank']:.2f}s saved")
+            if output is not None:
+                output.write(json.dumps(result) + '\n')
+                output.flush()
+    finally:
+        if output is not None:
+            output.close()
+    print(json.dumps(summarize(results), indent=2))
@@ -1,4 +1,16 @@
 import logic
+import batch
+import bigboard
+import bitboard
+import book
+import cache
+import deadline
+import evaluation
+import mcts
+import parallel
+import ponder
+import transposition
+import math
 import random
 from AbstractPlayers import *
 import time
@@ -8,7 +20,22 @@ MIN_PLAYER = 2
 CHANCE_PLAYER = 3
 P2 = 0.9
 P4 = 0.1
+# the next depth of the iterative deepening is expected to take MUL_TIME times the last one, until the growth of the
+# searched nodes is measured (see next_depth_growth)
 MUL_TIME = 20
+# expectimax branches whose probability is below this are evaluated instead of searched, when the pruning is on (see
+# BitHELPER and ExpectimaxMovePlayer)
+PROB_THRESHOLD = 0.001
+# MIN nodes two plies above the leaves with at least this number of children are evaluated in a batch
+BATCH_MIN_CHILDREN = 4
+
+# adaptive width of the index players (see adaptive_best_indices): a root searches at least MIN_WIDTH cells and at
+# least MIN_WIDTH_FRACTION of its empty cells, so boards with few empty cells are always searched in full
+MIN_WIDTH = 4
+MIN_WIDTH_FRACTION = 0.25
+
+# iterations of MCTSMovePlayer in a turn without a time limit
+MCTS_ITERATIONS = 2000
 
 # commands to use for move players. dictionary : Move(enum) -> function(board),
 # all the functions {up,down,left,right) receive board as parameter and return tuple of (new_board, done, score).
@@ -17,6 +44,11 @@ MUL_TIME = 20
 # (you can see GreedyMovePlayer implementation for example)
 commands = {Move.UP: logic.up, Move.DOWN: logic.down,
             Move.LEFT: logic.left, Move.RIGHT: logic.right}
+# the same commands for packed boards (see bitboard.py), used by the search players through BitHELPER.
+bit_commands = {Move.UP: bitboard.up, Move.DOWN: bitboard.down,
+                Move.LEFT: bitboard.left, Move.RIGHT: bitboard.right}
+# every move with the place of its board in the result of bitboard.all_moves
+_MOVE_BOARDS = [(move, [Move.UP, Move.DOWN, Move.LEFT, Move.RIGHT].index(move)) for move in Move]
 
 
 # generate value between {2,4} with probability p for 4
@@ -268,6 +300,617 @@ class HELPER:
         return goal, board_score, emptyCells
 
 
+class BitHELPER:
+    """HELPER for packed boards (see bitboard.py),
+    the same search functions as HELPER where the board is a single int. moves and terminal checks are done with the
+    row tables of bitboard instead of scanning the nested lists, the heuristics by the evaluator.
+    AlphaBeta and RB_Expectimax keep the searched nodes in the transposition table if one is given.
+    the leaves are evaluated by the fused row tables of the evaluator (see evaluation.py), the leaves below a MIN node
+    are evaluated all at once from the rows of the MIN node. if numpy is installed, the MAX children of a MIN node two
+    plies above the leaves are evaluated in a single batch (see batch.py).
+    AlphaBeta tries the moves of the last search of a node first (from the transposition table) and the rest by their
+    heuristic value, and the cells which cut MIN nodes before (killers and history) first.
+    RB_Expectimax can cut unlikely branches and search only some of the cells of a MIN node, its value is then an
+    estimate of the full expectimax value.
+    the three searches keep the values of their nodes in the evaluation cache if one is given (see cache.py), by the
+    canonical symmetry of the board.
+    the boards are 4x4 (the geometry is the module bitboard) until pack gets a board of another size, then the search
+    runs on the geometry of this size (see bigboard.py), without the batch evaluation, the book and the processes of
+    parallel and ponder.
+    the evaluator is evaluation.default_evaluator if not given, the n-tuple network (see ntuple.py) when one is set,
+    which has no batch evaluation.
+    """
+
+    def __init__(self, table: transposition.TranspositionTable = None, evaluator: evaluation.Evaluator = None,
+                 use_batch: bool = True, prob_threshold: float = 0.0, max_cells: int = None,
+                 cache_entries: int = 0):
+        self.table = table
+        self.geometry = bitboard
+        self.commands = bit_commands
+        self.evaluator = evaluator if evaluator is not None else evaluation.default_evaluator()
+        # the evaluation cache of the three searches, under the symmetries of the evaluator
+        self.cache = cache.EvaluationCache(cache_entries, self.evaluator.symmetries) if cache_entries else None
+        # the batch evaluation works on the fused tables of the heuristics only, not on the n-tuple network
+        self.useBatch = use_batch and batch.available()
+        self.batch = batch.BatchEvaluator(self.evaluator) \
+            if self.useBatch and isinstance(self.evaluator, evaluation.Evaluator) else None
+        # the deadline of the running search (see deadline.py), polled at every node
+        self.context = None
+        # move ordering of AlphaBeta: the best root move of the last completed depth, the cells that cut MIN nodes
+        # (two killers by depth) and the history score of every cell by its shift
+        self.pvMove = None
+        self.killers = {}
+        self.history = [0] * (4 * bitboard.SIZE * bitboard.SIZE)
+        # number of searched nodes, in total and for every completed depth of the iterative deepening
+        self.nodes = 0
+        self.nodesPerDepth = []
+        # seconds from the start of the iterative deepening to the end of every completed depth
+        self.depthTimes = []
+        # the depths of nodesPerDepth and depthTimes that were not searched but reused from the previous turns (see
+        # iterative_deepening), they have no nodes and the time of the depth before them
+        self.reusedDepths = []
+        # the iterative deepening stops at this depth (None to search until the time is over)
+        self.maxDepth = None
+        # pruning of RB_Expectimax: a node reached with a probability below probThreshold is evaluated instead of
+        # searched, and a MIN node searches only the maxCells worst cells by their static value (None for all of
+        # them). prunedBranches counts the nodes and the cells that were not searched, the value of a node with a
+        # pruned branch below it is an estimate and is kept neither in the transposition table nor in the cache
+        self.probThreshold = prob_threshold
+        self.maxCells = max_cells
+        self.prunedBranches = 0
+        # adaptive width of the root of the index players (see adaptive_best_indices): the value of every searched
+        # cell at the last completed depth, the nodes and the seconds of a searched cell in every completed depth, and
+        # (searched cells, empty cells) of the last completed depth (None if the root was not searched by width)
+        self.cellValues = {}
+        self.cellNodes = []
+        self.cellSeconds = []
+        self.rootWidth = None
+        # the budget of the game of the player (see timemanager.py), None to search every turn until its time limit
+        self.timeManager = None
+
+    def setEvaluator(self, evaluator: evaluation.Evaluator):
+        # evaluate the leaves with another evaluator, the values searched with the old one are dropped
+        self.evaluator = evaluator
+        if self.cache is not None:
+            self.cache = cache.EvaluationCache(self.cache.max_entries, evaluator.symmetries)
+        self.batch = batch.BatchEvaluator(evaluator) \
+            if self.useBatch and isinstance(evaluator, evaluation.Evaluator) else None
+        if self.table is not None:
+            self.table.clear()
+
+    def setGeometry(self, geometry):
+        # search the boards of another size (see bigboard.py), with the same weights of the heuristics
+        self.geometry = geometry
+        self.commands = bit_commands if geometry is bitboard else \
+            {Move.UP: geometry.up, Move.DOWN: geometry.down, Move.LEFT: geometry.left, Move.RIGHT: geometry.right}
+        # the sized evaluators (see evaluation.SizedEvaluator) have no batch evaluation
+        self.setEvaluator(evaluation.evaluator_for(geometry, getattr(self.evaluator, 'weights', None)))
+        self.killers = {}
+        self.history = [0] * (4 * geometry.SIZE * geometry.SIZE)
+
+    def pack(self, board):
+        # the packed board of the nested lists, in the geometry of their size
+        if len(board) != self.geometry.SIZE:
+            self.setGeometry(bigboard.geometry(len(board)))
+        return self.geometry.pack(board)
+
+    def bookMove(self, board, search: str):
+        # the move of the book (see book.py), the book has only 4x4 boards
+        return book.lookup_move(board, search, self.evaluator) if self.geometry is bitboard else None
+
+    def bookIndices(self, board, search: str):
+        return book.lookup_indices(board, search, self.evaluator) if self.geometry is bitboard else None
+
+    def newSearch(self):
+        # called at the start of every iterative deepening, the history of the previous searches counts less
+        if self.table is not None:
+            self.table.new_search()
+        self.pvMove = None
+        self.killers = {}
+        self.history = [score >> 1 for score in self.history]
+        self.nodes = 0
+        self.nodesPerDepth = []
+        self.depthTimes = []
+        self.reusedDepths = []
+        self.prunedBranches = 0
+        self.cellValues = {}
+        self.cellNodes = []
+        self.cellSeconds = []
+        self.rootWidth = None
+
+    def reusedDepth(self, children, agent, value=2):
+        # the depth a root was already searched to in the previous turns, by the entries of its children (boards of
+        # agent) in the transposition table. 0 if one of the children has no entry
+        if self.table is None or not children:
+            return 0
+        depth = None
+        for child in children:
+            entry = self.table.probe(transposition.node_key(child, agent, value))
+            if entry is None:
+                return 0
+            depth = entry[transposition.DEPTH] if depth is None else min(depth, entry[transposition.DEPTH])
+        return depth + 1
+
+    def maxChildren(self, board):
+        # the legal moves of a MAX node with their boards in the order of Move, empty if the node is terminal
+        boards = self.geometry.all_moves(board)
+        return [(move, boards[k]) for move, k in _MOVE_BOARDS if boards[k] != board]
+
+    def expand(self, board, agent):
+        # the children of a node, made once for both the terminal check and the search: the legal moves with their
+        # boards for MAX and the shifts of the empty cells otherwise. empty if the node is terminal
+        if agent == MAX_PLAYER:
+            return self.maxChildren(board)
+        return self.geometry.empty_shifts(board)
+
+    def leafValue(self, board, agent):
+        # the value of a leaf, the boards of the MIN and CHANCE nodes are the afterstates of a move (see ntuple.py)
+        if agent == MAX_PLAYER:
+            return self.evaluator.evaluate(board)
+        return self.evaluator.evaluate_after(board)
+
+    def orderedMoves(self, board, D, firstMove=None, children=None):
+        # the legal moves with their boards (children if they are already made), firstMove first and the rest by the
+        # heuristic value of their boards. one ply above the leaves the children are not sorted since they cost the
+        # same as their evaluation
+        children = list(children) if children is not None else self.maxChildren(board)
+        if D > 1:
+            children.sort(key=lambda child: self.evaluator.evaluate_after(child[1]), reverse=True)
+        if firstMove is not None:
+            children.sort(key=lambda child: child[0] != firstMove)
+        return children
+
+    def orderedCells(self, board, D, value, shifts):
+        # the empty cells of a MIN node, the killers of the depth first, then by the history and by the heuristic
+        # value of placing value in the cell (lowest first)
+        static = self.evaluator.evaluate_placements(board, value, shifts)
+        order = sorted(range(len(shifts)), key=lambda k: (-self.history[shifts[k]], static[k]))
+        ordered = [shifts[k] for k in order]
+        for killer in reversed(self.killers.get(D, ())):
+            if killer in ordered:
+                ordered.remove(killer)
+                ordered.insert(0, killer)
+        return ordered
+
+    def recordCutoff(self, D, shift):
+        self.history[shift] += D * D
+        killers = self.killers.setdefault(D, [])
+        if shift not in killers:
+            killers.insert(0, shift)
+            del killers[2:]
+
+    def batchedChildren(self, board, D, value, shifts):
+        # values and terminal flags of the MAX children of a MIN node two plies above the leaves (one for every
+        # shift), None if the node is searched one child at a time
+        if D != 2 or self.batch is None or len(shifts) < BATCH_MIN_CHILDREN:
+            return None
+        return self.batch.evaluate_max_children(board, value, shifts)
+
+    def cacheKey(self, board, agent, D, value, kind):
+        # the key of the node in the evaluation cache, None if the node is not kept there
+        if self.cache is None or D < cache.MIN_DEPTH:
+            return None
+        return self.cache.key(board, agent, value, kind)
+
+    def RB_MINIMAX(self, board, agent: int, D: int, value: int = 2):
+        self.nodes += 1
+        if self.context is not None:
+            self.context.poll()
+        # check if we reach a goal, the value of a leaf is the heuristics with the board score
+        if D == 0:
+            return self.evaluator.evaluate(board) if agent == MAX_PLAYER else self.evaluator.evaluate_after(board)
+        children = self.expand(board, agent)
+        if not children:
+            return self.leafValue(board, agent)
+        # the children are leaves, evaluate them from the rows of this board
+        if agent == MIN_PLAYER and D == 1:
+            return min(self.evaluator.evaluate_placements(board, value, children))
+        cacheKey = self.cacheKey(board, agent, D, value, cache.MINIMAX)
+        if cacheKey is not None:
+            result = self.cache.get(cacheKey, D)
+            if result is not None:
+                return result
+        # MAX player
+        if agent == MAX_PLAYER:
+            # init max
+            result = float('-inf')
+            # loop over the children to find the max
+            for move, new_board in children:
+                result = max(result, self.RB_MINIMAX(new_board, MIN_PLAYER, D - 1))
+        else:  # MIN player
+            batched = self.batchedChildren(board, D, value, children)
+            if batched is not None:
+                result = min(batched[0])
+            else:
+                # init the min
+                result = float('inf')
+                exponent = bitboard.exponent_of(value)
+                # loop over the empty places
+                for shift in children:
+                    result = min(result, self.RB_MINIMAX(board | (exponent << shift), MAX_PLAYER, D - 1, value))
+        if cacheKey is not None:
+            self.cache.put(cacheKey, result, D)
+        return result
+
+    def AlphaBeta(self, board, agent: int, D: int, Alpha, Beta, value: int = 2):
+        self.nodes += 1
+        if self.context is not None:
+            self.context.poll()
+        # check if we reach a goal, the value of a leaf is the heuristics with the board score
+        if D == 0:
+            return self.evaluator.evaluate(board) if agent == MAX_PLAYER else self.evaluator.evaluate_after(board)
+        children = self.expand(board, agent)
+        if not children:
+            return self.leafValue(board, agent)
+        # the exact value of the node or of a symmetric node
+        cacheKey = self.cacheKey(board, agent, D, value, cache.MINIMAX)
+        if cacheKey is not None:
+            cached = self.cache.get(cacheKey, D)
+            if cached is not None:
+                return cached
+        # look for the node in the transposition table, a bound decides the node only if it is out of the window
+        ttMove = None
+        if self.table is not None:
+            key = transposition.node_key(board, agent, value)
+            entry = self.table.probe(key)
+            if entry is not None:
+                ttMove = entry[transposition.BEST_MOVE]
+            if entry is not None and entry[transposition.DEPTH] >= D:
+                bound = entry[transposition.BOUND]
+                if bound == transposition.EXACT:
+                    return entry[transposition.VALUE]
+                if bound == transposition.LOWER and entry[transposition.VALUE] >= Beta:
+                    return float("inf")
+                if bound == transposition.UPPER and entry[transposition.VALUE] <= Alpha:
+                    return float("-inf")
+        alpha_orig, beta_orig = Alpha, Beta
+        # MAX player
+        if agent == MAX_PLAYER:
+            # init max
+            currMax = float('-inf')
+            bestMove = None
+            # loop over the children to find the max, the best move of the last search of this node first
+            for move, new_board in self.orderedMoves(board, D, ttMove, children):
+                v = self.AlphaBeta(new_board, MIN_PLAYER, D - 1, Alpha, Beta)
+                if v > currMax:
+                    currMax = v
+                    bestMove = move
+                Alpha = max(Alpha, currMax)
+                if currMax >= Beta:
+                    if self.table is not None:
+                        self.table.store(key, currMax, D, transposition.LOWER, bestMove)
+                    return float("inf")
+            if self.table is not None:
+                # the pruned children are not above alpha, so the value is exact only if the max is above it
+                if currMax <= alpha_orig:
+                    self.table.store(key, alpha_orig, D, transposition.UPPER, bestMove)
+                else:
+                    self.table.store(key, currMax, D, transposition.EXACT, bestMove)
+            if cacheKey is not None and currMax > alpha_orig:
+                self.cache.put(cacheKey, currMax, D)
+            return currMax
+        else:  # MIN player
+            # init the min
+            currMin = float('inf')
+            # the children are leaves, evaluate them from the rows of this board
+            shifts = children
+            leaves = self.evaluator.evaluate_placements(board, value, shifts) if D == 1 else None
+            batched = self.batchedChildren(board, D, value, shifts)
+            exponent = bitboard.exponent_of(value)
+            # the order matters only for the children that are searched, the values of the others are already known
+            if leaves is None and batched is None:
+                shifts = self.orderedCells(board, D, value, shifts)
+            # loop over the empty places
+            for k, shift in enumerate(shifts):
+                if leaves is not None:
+                    v = leaves[k]
+                elif batched is not None:
+                    v = batched[0][k]
+                    # the same value the MAX child returns, inf if its max is not below beta
+                    if not batched[1][k] and v >= Beta:
+                        v = float("inf")
+                else:
+                    v = self.AlphaBeta(board | (exponent << shift), MAX_PLAYER, D - 1, Alpha, Beta, value)
+                currMin = min(currMin, v)
+                Beta = min(currMin, Beta)
+                if currMin <= Alpha:
+                    self.recordCutoff(D, shift)
+                    if self.table is not None:
+                        self.table.store(key, currMin, D, transposition.UPPER)
+                    return float("-inf")
+            if self.table is not None:
+                # the pruned children are not below beta, so the value is exact only if the min is below it
+                if currMin >= beta_orig:
+                    self.table.store(key, beta_orig, D, transposition.LOWER)
+                else:
+                    self.table.store(key, currMin, D, transposition.EXACT)
+            if cacheKey is not None and currMin < beta_orig:
+                self.cache.put(cacheKey, currMin, D)
+            return currMin
+
+    def RB_Expectimax(self, board, agent: int, D: int, value: int = 2, prob: float = 1.0):
+        # prob is the probability of the chance outcomes on the way from the root to this node
+        self.nodes += 1
+        if self.context is not None:
+            self.context.poll()
+        # check if we reach a goal, the value of a leaf is the heuristics with the board score
+        if D == 0:
+            return self.evaluator.evaluate(board) if agent == MAX_PLAYER else self.evaluator.evaluate_after(board)
+        children = self.expand(board, agent)
+        if not children:
+            return self.leafValue(board, agent)
+        # the values of expectimax are always exact, use any entry searched at least as deep
+        cacheKey = self.cacheKey(board, agent, D, value, cache.EXPECTIMAX)
+        if cacheKey is not None:
+            cached = self.cache.get(cacheKey, D)
+            if cached is not None:
+                return cached
+        if self.table is not None:
+            key = transposition.node_key(board, agent, value)
+            entry = self.table.probe(key)
+            if entry is not None and entry[transposition.DEPTH] >= D:
+                return entry[transposition.VALUE]
+        # a branch too unlikely to change the value is not searched deeper
+        pruned = self.prunedBranches
+        if prob < self.probThreshold:
+            self.prunedBranches += 1
+            return self.leafValue(board, agent)
+        bestMove = None
+        if agent == CHANCE_PLAYER:
+            result = (self.RB_Expectimax(board, MIN_PLAYER, D - 1, 2, prob * P2) * P2) + (
+                    self.RB_Expectimax(board, MIN_PLAYER, D - 1, 4, prob * P4) * P4)
+        elif agent == MAX_PLAYER:
+            # init max
+            result = float('-inf')
+            # loop over the children to find the max
+            for move, new_board in children:
+                v = self.RB_Expectimax(new_board, CHANCE_PLAYER, D - 1, value, prob)
+                if v > result:
+                    result = v
+                    bestMove = move
+        else:  # MIN player
+            batched = self.batchedChildren(board, D, value, children)
+            if D == 1:
+                # the children are leaves, evaluate them from the rows of this board
+                result = min(self.evaluator.evaluate_placements(board, value, children))
+            elif batched is not None:
+                # the children are one ply above the leaves, evaluate them in a batch
+                result = min(batched[0])
+            else:
+                # init the min
+                result = float('inf')
+                exponent = bitboard.exponent_of(value)
+                shifts = children
+                # search only the cells that look worst for MAX
+                if self.maxCells is not None and len(shifts) > self.maxCells:
+                    static = self.evaluator.evaluate_placements(board, value, shifts)
+                    shifts = [shift for v, shift in sorted(zip(static, shifts))[:self.maxCells]]
+                    self.prunedBranches += len(static) - self.maxCells
+                # loop over the empty places
+                for shift in shifts:
+                    result = min(result, self.RB_Expectimax(board | (exponent << shift), MAX_PLAYER, D - 1, value,
+                                                            prob))
+        # only the values of the full search are exact
+        if self.prunedBranches != pruned:
+            return result
+        if self.table is not None:
+            self.table.store(key, result, D, transposition.EXACT, bestMove)
+        if cacheKey is not None:
+            self.cache.put(cacheKey, result, D)
+        return result
+
+
+def next_depth_growth(nodesPerDepth):
+    """the expected ratio of the nodes (and the time) of the next depth to the last completed depth.
+    the plies of the move player and of the index player alternate and branch differently (the moves against the empty
+    cells, which are many more on bigger boards), so the next depth grows like the last depth of the same player: the
+    ratio of the depth before the last to the one before it. MUL_TIME until there are three measured depths.
+    """
+    if len(nodesPerDepth) < 3 or not nodesPerDepth[-3] or not nodesPerDepth[-2]:
+        return MUL_TIME
+    return max(1.0, nodesPerDepth[-2] / nodesPerDepth[-3])
+
+
+def iterative_deepening(helper_fun, play, time_limit, lookup=None, pondered=None, reused=None, next_cost=None,
+                        root=None):
+    """run play(D, allowed_time) for D = 1, 2, ... and return the result of the deepest completed depth.
+    the first depth is always completed, from the second depth the search of helper_fun is aborted in the middle at
+    the deadline of time_limit. a depth that is expected to take more than the remaining time is not started.
+    the number of nodes searched in every completed depth is kept in helper_fun.nodesPerDepth and the time it was
+    completed in helper_fun.depthTimes. the search stops at helper_fun.maxDepth if it is set.
+    if lookup() (the book, see book.py) returns a result it is returned without a search. pondered() returns
+    (depth, result) of the search of the same board by the pondering process (see ponder.py) or None, it is called
+    after the search and its result is returned if it is deeper.
+    reused() returns the depth the board was already searched to in the previous turns (see BitHELPER.reusedDepth),
+    after the first depth the search goes on from this depth, the depths in between are counted with no nodes and
+    are kept in helper_fun.reusedDepths, so the measures of the search (see benchmark.py) can leave them out.
+    next_cost() returns the expected seconds of the next depth, instead of the time of the last depth times the growth
+    of its nodes (see next_depth_growth).
+    root is (board, agent, value) of the searched root (agent is MAX_PLAYER for the move players and MIN_PLAYER for
+    the index players), with root the turn is planned by the time manager of helper_fun if it has one: the search
+    stops at the hard limit of the plan and starts the next depth only if it fits in the target (see timemanager.py).
+    """
+    turn_started = time.time()
+    manager = helper_fun.timeManager if root is not None else None
+    plan = manager.plan(helper_fun, *root, time_limit) if manager is not None else None
+    context = deadline.SearchContext.for_time_limit(plan['limit'] if plan is not None else time_limit,
+                                                    deadline.poll_nodes_for(helper_fun.geometry))
+    helper_fun.newSearch()
+    if lookup is not None:
+        result = lookup()
+        if result is not None:
+            if plan is not None:
+                manager.finish(plan, time.time() - turn_started, 0)
+            return result
+    started = time.time()
+    # the first depth is searched without a time limit, so there is always a result
+    result = play(1, float('inf'))
+    helper_fun.nodesPerDepth.append(helper_fun.nodes)
+    helper_fun.depthTimes.append(time.time() - started)
+    D = 1
+    # warm start from the subtree kept in the transposition table
+    warm_depth = reused() if reused is not None else 0
+    if helper_fun.maxDepth is not None:
+        warm_depth = min(warm_depth, helper_fun.maxDepth)
+    while D + 1 < warm_depth:
+        helper_fun.nodesPerDepth.append(0)
+        helper_fun.depthTimes.append(helper_fun.depthTimes[-1])
+        D += 1
+        helper_fun.reusedDepths.append(D)
+    helper_fun.context = context
+    try:
+        while result is not None and (helper_fun.maxDepth is None or D < helper_fun.maxDepth) and \
+                (plan is None or plan['target'] > 0):
+            started_time = time.time()
+            started_nodes = helper_fun.nodes
+            curr_result = play(D + 1, context.remaining())
+            if curr_result is None:
+                break
+            if plan is not None and curr_result != result:
+                manager.changed(plan)
+            result = curr_result
+            helper_fun.nodesPerDepth.append(helper_fun.nodes - started_nodes)
+            helper_fun.depthTimes.append(time.time() - started)
+            D += 1
+            # the next depth takes about the growth of the nodes times this one
+            growth = next_depth_growth(helper_fun.nodesPerDepth)
+            cost = next_cost() if next_cost is not None else (time.time() - started_time) * growth
+            if plan is not None:
+                if not manager.next_depth(plan, time.time() - turn_started, cost, growth):
+                    break
+            elif cost > context.remaining():
+                break
+    except deadline.SearchTimeout:
+        pass
+    finally:
+        helper_fun.context = None
+    if pondered is not None:
+        pondered_result = pondered()
+        if pondered_result is not None and pondered_result[0] > len(helper_fun.nodesPerDepth):
+            result = pondered_result[1]
+    if plan is not None:
+        manager.finish(plan, time.time() - turn_started, len(helper_fun.nodesPerDepth))
+    return result
+
+
+def use_parallel(helper_fun) -> bool:
+    # the processes of parallel search 4x4 boards only
+    return parallel.enabled() and helper_fun.geometry is bitboard
+
+
+def parallel_best_move(helper_fun, board, D, allowed_time, search: str, agent: int):
+    """search the children of the root moves in the process pool of parallel (with the BitHELPER search function
+    named search and the options of helper_fun), return the best move or None if the time is over before all the moves
+    are searched.
+    """
+    moves = []
+    tasks = []
+    for move in Move:
+        new_board, done, score = bit_commands[move](board)
+        if done:
+            moves.append(move)
+            tasks.append((search, new_board, agent, D - 1, 2, 1.0))
+    values = parallel.search_children(helper_fun, tasks, allowed_time)
+    if values is None:
+        return None
+    currMax = float('-inf')
+    bestMove = None
+    for move, v in zip(moves, values):
+        if currMax < v:
+            currMax = v
+            bestMove = move
+    return bestMove
+
+
+def parallel_best_indices(helper_fun, board, D, allowed_time, search: str, values_probabilities):
+    """search the empty cells of the root in the process pool of parallel with the options of helper_fun, the value of
+    a cell is the expected value of placing each of values_probabilities (pairs of value and probability) in it.
+    return the cell of the min value or None if the time is over before all the cells are searched.
+    """
+    cells = bitboard.empty_cells(board)
+    tasks = [(search, bitboard.set_tile(board, i, j, value), MAX_PLAYER, D - 1, value, probability)
+             for (i, j) in cells for value, probability in values_probabilities]
+    values = parallel.search_children(helper_fun, tasks, allowed_time)
+    if values is None:
+        return None
+    currMin = float('inf')
+    bestIndicate = None
+    for k, cell in enumerate(cells):
+        children = values[k * len(values_probabilities):(k + 1) * len(values_probabilities)]
+        v = sum(probability * child for (value, probability), child in zip(values_probabilities, children))
+        if currMin > v:
+            currMin = v
+            bestIndicate = cell
+    return bestIndicate
+
+
+def min_width(cells: int) -> int:
+    # the cells a root of this number of empty cells searches at least with the adaptive width
+    return min(cells, max(MIN_WIDTH, math.ceil(MIN_WIDTH_FRACTION * cells)))
+
+
+def cell_cost(helper_fun) -> float:
+    # the expected seconds of searching a single cell of the root at the next depth, by the growth of the nodes of a
+    # cell between the completed depths
+    return helper_fun.cellSeconds[-1] * next_depth_growth(helper_fun.cellNodes)
+
+
+def adaptive_best_indices(helper_fun, board, D, allowed_time, values_probabilities, child_value):
+    """search only the cells of the root that look worst for the move player, as many as are expected to fit in the
+    allowed time (at least min_width of them), and return the cell of the min value. when the time is over the search
+    stops after min_width cells and returns the min of the searched cells (the deadline of the search aborts it before).
+    the first depth has no time limit (see iterative_deepening).
+    the cells are ranked by their value at the last completed depth and the cells that were not searched there by
+    their static value: the expected value of placing each of values_probabilities (pairs of value and probability)
+    in the cell. child_value(child, value, probability) is the value of the child with value placed in a cell.
+    helper_fun.rootWidth is set to (searched cells, empty cells), the result of the search is guaranteed to be the
+    min over all the cells only if they are equal.
+    """
+    started_time = time.time()
+    started_nodes = helper_fun.nodes
+    geometry = helper_fun.geometry
+    shifts = geometry.empty_shifts(board)
+    cells = [geometry.cell_of(shift) for shift in shifts]
+    static = [0.0] * len(cells)
+    for value, probability in values_probabilities:
+        for k, v in enumerate(helper_fun.evaluator.evaluate_placements(board, value, shifts)):
+            static[k] += probability * v
+    previous = helper_fun.cellValues
+    order = sorted(range(len(cells)), key=lambda k: (cells[k] not in previous, previous.get(cells[k], static[k])))
+    width = len(cells)
+    if D > 1 and helper_fun.cellNodes:
+        cost = cell_cost(helper_fun)
+        if cost * len(cells) > allowed_time:
+            width = max(min_width(len(cells)), min(len(cells), int(allowed_time / cost)))
+    currMin = float('inf')
+    bestIndicate = None
+    values = {}
+    # loop over the cells that look worst first
+    for k in order[:width]:
+        if len(values) >= min_width(len(cells)) and time.time() - started_time > allowed_time:
+            width = len(values)
+            break
+        i, j = cells[k]
+        v = sum(probability * child_value(geometry.set_tile(board, i, j, value), value, probability)
+                for value, probability in values_probabilities)
+        values[cells[k]] = v
+        if currMin > v:
+            currMin = v
+            bestIndicate = cells[k]
+    helper_fun.cellValues = values
+    helper_fun.cellNodes.append((helper_fun.nodes - started_nodes) / max(1, width))
+    helper_fun.cellSeconds.append((time.time() - started_time) / max(1, width))
+    helper_fun.rootWidth = (width, len(cells))
+    return bestIndicate
+
+
+def adaptive_next_cost(helper_fun) -> float:
+    # the expected seconds of the next depth of a root searched by width: its narrowest search
+    if helper_fun.rootWidth is None:
+        return 0.0
+    return min_width(helper_fun.rootWidth[1]) * cell_cost(helper_fun)
+
+
 # part B
 class MiniMaxMovePlayer(AbstractMovePlayer):
     """MiniMax Move Player,
@@ -277,34 +920,28 @@ class MiniMaxMovePlayer(AbstractMovePlayer):
 
     def __init__(self):
         AbstractMovePlayer.__init__(self)
-        self.helper_fun = HELPER()
+        self.helper_fun = BitHELPER(cache_entries=cache.DEFAULT_MAX_ENTRIES)
 
     def get_move(self, board, time_limit) -> Move:
-        # init depth
-        D = 1
-        started = time.time()
-        move = self.play(board, D, time_limit)
-        itr_time = time.time() - started
-        curr_time = itr_time
-        next_itr_time = itr_time * MUL_TIME
-        while next_itr_time + curr_time < time_limit:
-            D += 1
-            started_time = time.time()
-            curr_move = self.play(board, D, next_itr_time)
-            if curr_move is not None:
-                move = curr_move
-            itr_time = time.time() - started_time
-            next_itr_time = itr_time * MUL_TIME
-            curr_time = time.time() - started
+        # the search runs on the packed board
+        board = self.helper_fun.pack(board)
+        ponder.focus(self, board)
+        move = iterative_deepening(self.helper_fun, lambda D, allowed_time: self.play(board, D, allowed_time),
+                                   time_limit, lambda: self.helper_fun.bookMove(board, 'RB_MINIMAX'),
+                                   lambda: ponder.take(self, board), root=(board, MAX_PLAYER, 2))
+        if move is not None:
+            ponder.after_move(self, self.helper_fun.commands[move](board)[0])
         return move
 
     def play(self, board, D, allowed_time):
+        if use_parallel(self.helper_fun):
+            return parallel_best_move(self.helper_fun, board, D, allowed_time, 'RB_MINIMAX', MIN_PLAYER)
         started_time = time.time()
         currMax = float('-inf')
         bestMove = None
         # loop over the children to find the max
         for move in Move:
-            new_board, done, score = commands[move](board)
+            new_board, done, score = self.helper_fun.commands[move](board)
             if done:
                 v = self.helper_fun.RB_MINIMAX(new_board, MIN_PLAYER, D - 1)
                 if currMax < v:
@@ -321,45 +958,48 @@ class MiniMaxIndexPlayer(AbstractIndexPlayer):
     the goal of the player is to reduce move player score.
     implement get_indices function according to MiniMax algorithm, the value in minimax player value is only 2.
     (you can add helper functions as you want).
+    with adaptive_width the root searches only the cells that look worst for the move player, as many as the time
+    allows (see adaptive_best_indices), and guaranteed tells if the last answer is the min over all the cells.
     """
 
-    def __init__(self):
+    def __init__(self, adaptive_width=False):
         AbstractIndexPlayer.__init__(self)
-        self.helper_fun = HELPER()
+        self.helper_fun = BitHELPER(cache_entries=cache.DEFAULT_MAX_ENTRIES)
+        self.adaptiveWidth = adaptive_width
+        # the arguments of the constructor, the pondering process makes its copy of the player with them
+        self.options = {'adaptive_width': adaptive_width}
+        self.guaranteed = True
 
     def get_indices(self, board, value, time_limit) -> (int, int):
-        # init depth
-        D = 1
-        started = time.time()
-        indicate = self.play(board, D, time_limit)
-        itr_time = time.time() - started
-        curr_time = itr_time
-        next_itr_time = itr_time * MUL_TIME
-        while next_itr_time + curr_time < time_limit:
-            D += 1
-            started_time = time.time()
-            curr_indicate = self.play(board, D, next_itr_time)
-            if curr_indicate is not None:
-                indicate = curr_indicate
-            itr_time = time.time() - started_time
-            next_itr_time = itr_time * MUL_TIME
-            curr_time = time.time() - started
-        return indicate
+        # the search runs on the packed board
+        board = self.helper_fun.pack(board)
+        ponder.focus(self, board)
+        indices = iterative_deepening(self.helper_fun, lambda D, allowed_time: self.play(board, D, allowed_time),
+                                      time_limit, lambda: self.helper_fun.bookIndices(board, 'RB_MINIMAX'),
+                                      lambda: ponder.take(self, board),
+                                      next_cost=(lambda: adaptive_next_cost(self.helper_fun))
+                                      if self.adaptiveWidth else None, root=(board, MIN_PLAYER, value))
+        width = self.helper_fun.rootWidth
+        self.guaranteed = width is None or width[0] == width[1]
+        if indices is not None:
+            ponder.after_indices(self, self.helper_fun.geometry.set_tile(board, indices[0], indices[1], value))
+        return indices
 
     def play(self, board, D, allowed_time, value=2):
+        if self.adaptiveWidth:
+            return adaptive_best_indices(self.helper_fun, board, D, allowed_time, [(value, 1)],
+                                         lambda child, value, probability:
+                                         self.helper_fun.RB_MINIMAX(child, MAX_PLAYER, D - 1, value))
+        if use_parallel(self.helper_fun):
+            return parallel_best_indices(self.helper_fun, board, D, allowed_time, 'RB_MINIMAX', [(value, 1)])
         started_time = time.time()
         currMin = float('inf')
         bestIndicate = None
-        # save the place of the empty cells
-        cells = [(row_idx, col_idx) for row_idx, row in enumerate(board) for col_idx, item in enumerate(row) if
-                 item == 0]
-        new_board = board.copy()
         # loop over the empty places
-        for (i, j) in cells:
-
-            new_board[i][j] = value
+        geometry = self.helper_fun.geometry
+        for (i, j) in geometry.empty_cells(board):
+            new_board = geometry.set_tile(board, i, j, value)
             v = self.helper_fun.RB_MINIMAX(new_board, MAX_PLAYER, D - 1, value)
-            new_board[i][j] = 0
             if currMin > v:
                 currMin = v
                 bestIndicate = (i, j)
@@ -377,44 +1017,40 @@ class ABMovePlayer(AbstractMovePlayer):
 
     def __init__(self):
         AbstractMovePlayer.__init__(self)
-        self.helper_fun = HELPER()
+        self.helper_fun = BitHELPER(transposition.TranspositionTable(), cache_entries=cache.DEFAULT_MAX_ENTRIES)
 
     def get_move(self, board, time_limit) -> Move:
-        # init depth
-        D = 1
-        started = time.time()
-        move = self.play(board, D, time_limit)
-        itr_time = time.time() - started
-        curr_time = itr_time
-        next_itr_time = itr_time * MUL_TIME
-        while next_itr_time + curr_time < time_limit:
-            D += 1
-            started_time = time.time()
-            curr_move = self.play(board, D, next_itr_time)
-            if curr_move is not None:
-                move = curr_move
-            itr_time = time.time() - started_time
-            next_itr_time = itr_time * MUL_TIME
-            curr_time = time.time() - started
+        # the search runs on the packed board
+        board = self.helper_fun.pack(board)
+        ponder.focus(self, board)
+        move = iterative_deepening(self.helper_fun, lambda D, allowed_time: self.play(board, D, allowed_time),
+                                   time_limit, lambda: self.helper_fun.bookMove(board, 'AlphaBeta'),
+                                   lambda: ponder.take(self, board),
+                                   lambda: self.helper_fun.reusedDepth(
+                                       [child for move, child in self.helper_fun.maxChildren(board)], MIN_PLAYER),
+                                   root=(board, MAX_PLAYER, 2))
+        if move is not None:
+            ponder.after_move(self, self.helper_fun.commands[move](board)[0])
         return move
 
     def play(self, board, D, allowed_time=None):
+        if use_parallel(self.helper_fun):
+            return parallel_best_move(self.helper_fun, board, D, allowed_time, 'AlphaBeta', MIN_PLAYER)
         started_time = time.time()
         currMax = float('-inf')
         Alpha = float("-inf")
         Beta = float("inf")
         bestMove = None
-        # loop over the children to find the max
-        for move in Move:
-            new_board, done, score = commands[move](board)
-            if done:
-                v = self.helper_fun.AlphaBeta(new_board, MIN_PLAYER, D - 1, Alpha, Beta)
-                if v > currMax:
-                    currMax = v
-                    bestMove = move
-                    Alpha = v
+        # loop over the children to find the max, the best move of the previous depth first
+        for move, new_board in self.helper_fun.orderedMoves(board, D, self.helper_fun.pvMove):
+            v = self.helper_fun.AlphaBeta(new_board, MIN_PLAYER, D - 1, Alpha, Beta)
+            if v > currMax:
+                currMax = v
+                bestMove = move
+                Alpha = v
             if time.time() - started_time > allowed_time:
                 return None
+        self.helper_fun.pvMove = bestMove
         return bestMove
 
 
@@ -425,36 +1061,38 @@ class ExpectimaxMovePlayer(AbstractMovePlayer):
     (you can add helper functions as you want)
     """
 
-    def __init__(self):
+    def __init__(self, prob_threshold=0.0, max_cells=None):
         AbstractMovePlayer.__init__(self)
-        self.helper_fun = HELPER()
+        # prob_threshold (PROB_THRESHOLD for instance) and max_cells prune the search (see BitHELPER.RB_Expectimax),
+        # 0 and None for the full search
+        self.helper_fun = BitHELPER(transposition.TranspositionTable(), prob_threshold=prob_threshold,
+                                    max_cells=max_cells, cache_entries=cache.DEFAULT_MAX_ENTRIES)
+        # the arguments of the constructor, the pondering process makes its copy of the player with them
+        self.options = {'prob_threshold': prob_threshold, 'max_cells': max_cells}
 
     def get_move(self, board, time_limit) -> Move:
-        # init depth
-        D = 1
-        started = time.time()
-        move = self.play(board, time_limit, D)
-        itr_time = time.time() - started
-        curr_time = itr_time
-        next_itr_time = itr_time * MUL_TIME
-        while next_itr_time + curr_time < time_limit:
-            D += 1
-            started_time = time.time()
-            curr_move = self.play(board, next_itr_time, D)
-            if curr_move is not None:
-                move = curr_move
-            itr_time = time.time() - started_time
-            next_itr_time = itr_time * MUL_TIME
-            curr_time = time.time() - started
+        # the search runs on the packed board
+        board = self.helper_fun.pack(board)
+        ponder.focus(self, board)
+        move = iterative_deepening(self.helper_fun, lambda D, allowed_time: self.play(board, allowed_time, D),
+                                   time_limit, lambda: self.helper_fun.bookMove(board, 'RB_Expectimax'),
+                                   lambda: ponder.take(self, board),
+                                   lambda: self.helper_fun.reusedDepth(
+                                       [child for move, child in self.helper_fun.maxChildren(board)], CHANCE_PLAYER),
+                                   root=(board, MAX_PLAYER, 2))
+        if move is not None:
+            ponder.after_move(self, self.helper_fun.commands[move](board)[0])
         return move
 
     def play(self, board, allowed_time, D):
+        if use_parallel(self.helper_fun):
+            return parallel_best_move(self.helper_fun, board, D, allowed_time, 'RB_Expectimax', CHANCE_PLAYER)
         started_time = time.time()
         currMax = float('-inf')
         bestMove = None
         # loop over the children to find the max
         for move in Move:
-            new_board, done, score = commands[move](board)
+            new_board, done, score = self.helper_fun.commands[move](board)
             if done:
                 v = self.helper_fun.RB_Expectimax(new_board, CHANCE_PLAYER, D - 1)
                 if currMax < v:
@@ -469,47 +1107,52 @@ class ExpectimaxIndexPlayer(AbstractIndexPlayer):
     """Expectimax Index Player
     implement get_indices function according to Expectimax algorithm, the value is number between {2,4}.
     (you can add helper functions as you want)
+    with adaptive_width the root searches only the cells that look worst for the move player, as many as the time
+    allows (see adaptive_best_indices), and guaranteed tells if the last answer is the min over all the cells.
     """
 
-    def __init__(self):
+    def __init__(self, adaptive_width=False):
         AbstractIndexPlayer.__init__(self)
-        self.helper_fun = HELPER()
+        self.helper_fun = BitHELPER(transposition.TranspositionTable(), cache_entries=cache.DEFAULT_MAX_ENTRIES)
+        self.adaptiveWidth = adaptive_width
+        # the arguments of the constructor, the pondering process makes its copy of the player with them
+        self.options = {'adaptive_width': adaptive_width}
+        self.guaranteed = True
 
     def get_indices(self, board, value, time_limit) -> (int, int):
-        # init depth
-        D = 1
-        started = time.time()
-        indicate = self.play(board, time_limit, D)
-        itr_time = time.time() - started
-        curr_time = itr_time
-        next_itr_time = itr_time * MUL_TIME
-        while next_itr_time + curr_time < time_limit:
-            D += 1
-            started_time = time.time()
-            curr_indicate = self.play(board, next_itr_time, D)
-            if curr_indicate is not None:
-                indicate = curr_indicate
-            itr_time = time.time() - started_time
-            next_itr_time = itr_time * MUL_TIME
-            curr_time = time.time() - started
-        return indicate
+        # the search runs on the packed board
+        board = self.helper_fun.pack(board)
+        ponder.focus(self, board)
+        indices = iterative_deepening(self.helper_fun, lambda D, allowed_time: self.play(board, allowed_time, D),
+                                      time_limit, lambda: self.helper_fun.bookIndices(board, 'RB_Expectimax'),
+                                      lambda: ponder.take(self, board),
+                                      lambda: self.helper_fun.reusedDepth(
+                                          [self.helper_fun.geometry.set_tile(board, i, j, v)
+                                           for (i, j) in self.helper_fun.geometry.empty_cells(board) for v in (2, 4)],
+                                          MAX_PLAYER),
+                                      (lambda: adaptive_next_cost(self.helper_fun)) if self.adaptiveWidth else None,
+                                      root=(board, MIN_PLAYER, value))
+        width = self.helper_fun.rootWidth
+        self.guaranteed = width is None or width[0] == width[1]
+        if indices is not None:
+            ponder.after_indices(self, self.helper_fun.geometry.set_tile(board, indices[0], indices[1], value))
+        return indices
 
     def play(self, board, allowed_time, D):
+        if self.adaptiveWidth:
+            return adaptive_best_indices(self.helper_fun, board, D, allowed_time, [(2, P2), (4, P4)],
+                                         lambda child, value, probability:
+                                         self.helper_fun.RB_Expectimax(child, MAX_PLAYER, D - 1, prob=probability))
+        if use_parallel(self.helper_fun):
+            return parallel_best_indices(self.helper_fun, board, D, allowed_time, 'RB_Expectimax', [(2, P2), (4, P4)])
         started_time = time.time()
         currMin = float('inf')
         bestIndicate = None
-        # save the place of the empty cells
-        cells = [(row_idx, col_idx) for row_idx, row in enumerate(board) for col_idx, item in enumerate(row) if
-                 item == 0]
-        new_board = board.copy()
         # loop over the empty places
-        for (i, j) in cells:
-
-            new_board[i][j] = 2
-            v1 = self.helper_fun.RB_Expectimax(new_board, MAX_PLAYER, D - 1)
-            new_board[i][j] = 4
-            v2 = self.helper_fun.RB_Expectimax(new_board, MAX_PLAYER, D - 1)
-            new_board[i][j] = 0
+        geometry = self.helper_fun.geometry
+        for (i, j) in geometry.empty_cells(board):
+            v1 = self.helper_fun.RB_Expectimax(geometry.set_tile(board, i, j, 2), MAX_PLAYER, D - 1, prob=P2)
+            v2 = self.helper_fun.RB_Expectimax(geometry.set_tile(board, i, j, 4), MAX_PLAYER, D - 1, prob=P4)
             v = P2 * v1 + P4 * v2
             if currMin > v:
                 currMin = v
@@ -528,42 +1171,79 @@ class ContestMovePlayer(AbstractMovePlayer):
 
     def __init__(self):
         AbstractMovePlayer.__init__(self)
-        self.helper_fun = HELPER()
+        self.helper_fun = BitHELPER(transposition.TranspositionTable(), cache_entries=cache.DEFAULT_MAX_ENTRIES)
 
     def get_move(self, board, time_limit) -> Move:
-        # init depth
-        D = 1
-        started = time.time()
-        move = self.play(board, D, time_limit)
-        itr_time = time.time() - started
-        curr_time = itr_time
-        next_itr_time = itr_time * MUL_TIME
-        while next_itr_time + curr_time < time_limit:
-            D += 1
-            started_time = time.time()
-            curr_move = self.play(board, D, next_itr_time)
-            if curr_move is not None:
-                move = curr_move
-            itr_time = time.time() - started_time
-            next_itr_time = itr_time * MUL_TIME
-            curr_time = time.time() - started
+        # the search runs on the packed board
+        board = self.helper_fun.pack(board)
+        ponder.focus(self, board)
+        move = iterative_deepening(self.helper_fun, lambda D, allowed_time: self.play(board, D, allowed_time),
+                                   time_limit, lambda: self.helper_fun.bookMove(board, 'AlphaBeta'),
+                                   lambda: ponder.take(self, board),
+                                   lambda: self.helper_fun.reusedDepth(
+                                       [child for move, child in self.helper_fun.maxChildren(board)], MIN_PLAYER),
+                                   root=(board, MAX_PLAYER, 2))
+        if move is not None:
+            ponder.after_move(self, self.helper_fun.commands[move](board)[0])
         return move
 
     def play(self, board, D, allowed_time=None):
+        if use_parallel(self.helper_fun):
+            return parallel_best_move(self.helper_fun, board, D, allowed_time, 'AlphaBeta', MIN_PLAYER)
         started_time = time.time()
         currMax = float('-inf')
         Alpha = float("-inf")
         Beta = float("inf")
         bestMove = None
-        # loop over the children to find the max
-        for move in Move:
-            new_board, done, score = commands[move](board)
-            if done:
-                v = self.helper_fun.AlphaBeta(new_board, MIN_PLAYER, D - 1, Alpha, Beta)
-                if v > currMax:
-                    currMax = v
-                    bestMove = move
-                    Alpha = v
+        # loop over the children to find the max, the best move of the previous depth first
+        for move, new_board in self.helper_fun.orderedMoves(board, D, self.helper_fun.pvMove):
+            v = self.helper_fun.AlphaBeta(new_board, MIN_PLAYER, D - 1, Alpha, Beta)
+            if v > currMax:
+                currMax = v
+                bestMove = move
+                Alpha = v
             if time.time() - started_time > allowed_time:
                 return None
-        return bestMove
\ No newline at end of file
+        self.helper_fun.pvMove = bestMove
+        return bestMove
+
+
+class MCTSMovePlayer(AbstractMovePlayer):
+    """Monte Carlo Tree Search Move Player,
+    get_move runs UCT iterations (see mcts.py) until the time limit and returns the most visited move. the rollouts
+    are cut after rollout_depth moves and evaluated by the heuristics, the tree of the chosen move is kept for the next
+    turn.
+    """
+
+    def __init__(self, rollout_policy='random', rollout_depth=mcts.ROLLOUT_DEPTH, rollouts=mcts.ROLLOUTS,
+                 exploration=mcts.EXPLORATION):
+        AbstractMovePlayer.__init__(self)
+        # the options of the tree, a new tree is made for the boards of another size
+        self.treeOptions = (exploration, rollout_policy, rollout_depth, rollouts)
+        self.tree = self.newTree(bitboard)
+        # the iterations of a turn, MCTS_ITERATIONS if it is None and there is no time limit
+        self.maxIterations = None
+
+    def newTree(self, geometry):
+        # the tree of the boards of geometry, evaluated by the default evaluator of their size (see
+        # evaluation.evaluator_for), the batch evaluation works on the 4x4 heuristics only
+        evaluator = evaluation.evaluator_for(geometry)
+        exploration, rollout_policy, rollout_depth, rollouts = self.treeOptions
+        return mcts.MCTS(evaluator, [Move.UP, Move.DOWN, Move.LEFT, Move.RIGHT],
+                         batch.BatchEvaluator(evaluator)
+                         if batch.available() and isinstance(evaluator, evaluation.Evaluator) else None,
+                         exploration, rollout_policy, rollout_depth, rollouts, geometry=geometry)
+
+    def get_move(self, board, time_limit) -> Move:
+        # the search runs on the packed board, in the geometry of its size
+        if len(board) != self.tree.geometry.SIZE:
+            self.tree = self.newTree(bitboard if len(board) == bitboard.SIZE else bigboard.geometry(len(board)))
+        board = self.tree.geometry.pack(board)
+        self.tree.set_root(board)
+        max_iterations = self.maxIterations
+        if max_iterations is None and time_limit == float('inf'):
+            max_iterations = MCTS_ITERATIONS
+        self.tree.search(deadline.SearchContext.for_time_limit(time_limit).deadline, max_iterations)
+        move = self.tree.best_move()
+        self.tree.advance(move)
+        return move
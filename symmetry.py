@@ -0,0 +1,88 @@
+# Symmetries of the packed board (see bitboard.py).
+# the 8 rotations and reflections of the square are made of three basic ones, done in this order: transpose (swap
+# the tile (i, j) with (j, i)), flip (reverse the order of the rows) and mirror (reverse the order of the columns).
+# a symmetry is the tuple of the three flags. the rules of the game don't change under a symmetry, a move of a board is
+# the move in the transformed direction on the transformed board, and so is a cell.
+# the heuristics of HELPER are not symmetric (isMonotonic checks only the rows, and not in both directions), so the
+# search of a transformed board may give a different value than the search of the board itself.
+import bitboard
+from AbstractPlayers import Move
+
+SYMMETRIES = [(transpose, flip, mirror) for transpose in (False, True) for flip in (False, True)
+              for mirror in (False, True)]
+IDENTITY = SYMMETRIES[0]
+# reverse the order of the rows only
+FLIP_ROWS = (False, True, False)
+
+_DIRECTIONS = {Move.UP: (-1, 0), Move.DOWN: (1, 0), Move.LEFT: (0, -1), Move.RIGHT: (0, 1)}
+
+
+def _transform_direction(symmetry, di, dj):
+    transpose, flip, mirror = symmetry
+    if transpose:
+        di, dj = dj, di
+    if flip:
+        di = -di
+    if mirror:
+        dj = -dj
+    return di, dj
+
+
+def _transform_cell(symmetry, i, j):
+    transpose, flip, mirror = symmetry
+    if transpose:
+        i, j = j, i
+    if flip:
+        i = bitboard.SIZE - 1 - i
+    if mirror:
+        j = bitboard.SIZE - 1 - j
+    return i, j
+
+
+# the move / cell of the transformed board for every move / cell of the board, and back
+_MOVES = {symmetry: {move: next(other for other in Move
+                                if _DIRECTIONS[other] == _transform_direction(symmetry, *_DIRECTIONS[move]))
+                     for move in Move} for symmetry in SYMMETRIES}
+_MOVES_BACK = {symmetry: {other: move for move, other in moves.items()} for symmetry, moves in _MOVES.items()}
+_CELLS = {symmetry: {(i, j): _transform_cell(symmetry, i, j) for i in range(bitboard.SIZE)
+                     for j in range(bitboard.SIZE)} for symmetry in SYMMETRIES}
+_CELLS_BACK = {symmetry: {other: cell for cell, other in cells.items()} for symmetry, cells in _CELLS.items()}
+
+
+def apply(bit_board: int, symmetry) -> int:
+    transpose, flip, mirror = symmetry
+    if transpose:
+        bit_board = bitboard.transpose(bit_board)
+    if flip:
+        bit_board = bitboard.flip(bit_board)
+    if mirror:
+        bit_board = bitboard.mirror(bit_board)
+    return bit_board
+
+
+def canonical(bit_board: int, symmetries=SYMMETRIES):
+    # the smallest of the transformed boards and the symmetry that gives it
+    best, best_symmetry = bit_board, IDENTITY
+    for symmetry in symmetries:
+        other = apply(bit_board, symmetry)
+        if other < best:
+            best, best_symmetry = other, symmetry
+    return best, best_symmetry
+
+
+def move_to(symmetry, move: Move) -> Move:
+    # the move on the transformed board that does the same as move on the board
+    return _MOVES[symmetry][move]
+
+
+def move_from(symmetry, move: Move) -> Move:
+    # the move on the board that does the same as move on the transformed board
+    return _MOVES_BACK[symmetry][move]
+
+
+def cell_to(symmetry, i: int, j: int):
+    return _CELLS[symmetry][(i, j)]
+
+
+def cell_from(symmetry, i: int, j: int):
+    return _CELLS_BACK[symmetry][(i, j)]
@@ -0,0 +1,134 @@
+# Game-level time management of the search players.
+# without a manager every turn of a player searches until its time_limit (or until the next depth is not expected to
+# fit, see submission.iterative_deepening). a TimeManager gives the player a budget for the whole game instead, an
+# average number of seconds per turn (or a total for an expected number of turns), and spends it by the difficulty of
+# every position:
+#   - a position with a single legal move or empty cell is answered by the first depth only,
+#   - a position with few empty cells or a narrow spread between the two best root values of the first depth gets more
+#     time, an open position with a clear best answer gets less,
+#   - a best answer that changes between two depths extends the time of the turn.
+# the time of a turn is a target: the next depth is started only if its expected cost (the time of the last depth
+# times the measured growth of the nodes, see submission.next_depth_growth) fits in the target. the target is a share of
+# the bank: the time saved in the easy turns (or overspent in the hard ones) is spread over the next HORIZON turns, so
+# the average over the game meets the budget. the time_limit of the turn is never exceeded.
+# every turn is kept in the allocations of the manager, report returns them with the totals.
+#   python simulator.py -player1 ExpectimaxMovePlayer -move_time 1.0 -time_budget 0.3
+
+# a position has few empty cells at this number or below, and is open at OPEN_EMPTY or above
+CRITICAL_EMPTY = 3
+OPEN_EMPTY = 8
+# the spread of the two best root values of the first depth, relative to the best value, is narrow below NARROW_SPREAD
+# and clear above CLEAR_SPREAD. answers of the same value (mostly symmetric cells or moves) are not a narrow choice
+NARROW_SPREAD = 0.005
+CLEAR_SPREAD = 0.03
+# the factors of the base time of a turn
+FEW_EMPTY_FACTOR = 2.0
+NARROW_SPREAD_FACTOR = 1.5
+EASY_FACTOR = 0.5
+# the target grows by this factor every time the best answer changes between depths
+INSTABILITY_FACTOR = 1.5
+# a turn never gets more than this factor of its base time
+MAX_FACTOR = 4.0
+# the bank of a player is spread over this number of turns
+HORIZON = 20
+
+
+def root_values(helper_fun, board: int, agent: int, value: int = 2):
+    """the values of the answers of a root at the first depth, best first: the heuristic value of the board after every
+    legal move for a move player (agent MAX_PLAYER), of placing value in every empty cell for an index player.
+    """
+    import submission
+    if agent == submission.MAX_PLAYER:
+        return sorted((helper_fun.evaluator.evaluate_after(child) for move, child in helper_fun.maxChildren(board)),
+                      reverse=True)
+    shifts = helper_fun.geometry.empty_shifts(board)
+    return sorted(helper_fun.evaluator.evaluate_placements(board, value, shifts)) if shifts else []
+
+
+class TimeManager:
+    """Budget of the turns of a single player in a game,
+    average seconds per turn, or total seconds for an expected number of turns. plan returns the plan of a turn (see
+    submission.iterative_deepening), next_depth tells if the next depth of the turn is started, changed extends the
+    turn when the best answer changes and finish ends the turn. report returns the allocation of all the turns.
+    """
+
+    def __init__(self, average: float = None, total: float = None, turns: int = None):
+        if average is None:
+            if total is None or not turns:
+                raise ValueError('a time budget is an average per turn or a total for a number of turns')
+            average = total / turns
+        if average <= 0:
+            raise ValueError(f'the time budget {average} is not positive')
+        self.average = average
+        self.total = total
+        self.turns = 0
+        self.spent = 0.0
+        self.allocations = []
+
+    def bank(self) -> float:
+        # the seconds saved so far (negative if overspent)
+        return self.average * self.turns - self.spent
+
+    def base(self) -> float:
+        # the time of a turn of normal difficulty
+        return max(0.0, self.average + self.bank() / HORIZON)
+
+    def plan(self, helper_fun, board: int, agent: int, value: int, time_limit: float) -> dict:
+        # the plan of a turn: its target and its hard limit of seconds, and why
+        values = root_values(helper_fun, board, agent, value)
+        empty = helper_fun.geometry.count_empty(board)
+        spread = abs(values[0] - values[1]) / max(abs(values[0]), 1.0) if len(values) > 1 else None
+        base = self.base()
+        reasons = []
+        factor = 1.0
+        if len(values) <= 1:
+            reasons.append('single answer')
+            factor = 0.0
+        else:
+            if empty <= CRITICAL_EMPTY:
+                reasons.append('few empty cells')
+                factor *= FEW_EMPTY_FACTOR
+            if 0 < spread < NARROW_SPREAD:
+                reasons.append('narrow spread')
+                factor *= NARROW_SPREAD_FACTOR
+            if not reasons and empty >= OPEN_EMPTY and spread > CLEAR_SPREAD:
+                reasons.append('easy')
+                factor *= EASY_FACTOR
+        limit = min(time_limit, base * MAX_FACTOR)
+        if self.total is not None:
+            limit = min(limit, max(0.0, self.total - self.spent))
+        return {'turn': self.turns, 'empty': empty, 'answers': len(values), 'spread': spread, 'reasons': reasons,
+                'base': base, 'target': min(limit, base * factor), 'limit': limit, 'changes': 0, 'growth': []}
+
+    def changed(self, plan: dict):
+        # the best answer changed between two depths, the position is harder than it looked
+        plan['changes'] += 1
+        plan['target'] = min(plan['limit'], plan['target'] * INSTABILITY_FACTOR)
+
+    def next_depth(self, plan: dict, elapsed: float, cost: float, growth: float) -> bool:
+        # start the next depth if its expected cost fits in the target of the turn
+        plan['growth'].append(round(growth, 2))
+        return plan['target'] > 0 and elapsed + cost <= plan['target']
+
+    def finish(self, plan: dict, spent: float, depth: int):
+        plan.update(spent=spent, depth=depth)
+        self.turns += 1
+        self.spent += spent
+        self.allocations.append(plan)
+
+    def report(self) -> dict:
+        return {'average_budget': self.average, 'total_budget': self.total, 'turns': self.turns,
+                'spent': self.spent, 'mean_spent': self.spent / self.turns if self.turns else 0.0,
+                'bank': self.bank(), 'allocations': self.allocations}
+
+
+def manage(player, average: float = None, total: float = None, turns: int = None):
+    """give the search player (a player with a BitHELPER) a time manager of this budget, returns the manager or None
+    for the other players.
+    """
+    import submission
+    helper = getattr(player, 'helper_fun', None)
+    if not isinstance(helper, submission.BitHELPER):
+        return None
+    helper.timeManager = TimeManager(average, total, turns)
+    return helper.timeManager
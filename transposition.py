@@ -0,0 +1,110 @@
+# Transposition table for the search on packed boards (see bitboard.py).
+# the same position is reached by different orders of moves and again in every iteration of the iterative deepening,
+# the table keeps the value found for it with the depth it was searched to, the bound type and the best move.
+# the key of a node is the packed board with the agent and the value to place (see node_key), so two different nodes
+# never share a key. the table has a fixed number of buckets of two entries each, the first entry of the bucket keeps
+# the deepest search (depth-preferred) and the second is replaced by every new store (always-replace).
+# the table is kept between the turns of a player, so the subtree of the position that was reached is already in it.
+# every turn is a new generation (see new_search), an entry of an older generation counts as AGE_DEPTH shallower for
+# every generation, so the deep entries of positions that can't be reached anymore give their place to the new ones.
+
+EXACT = 0
+LOWER = 1  # the value of the node is at least the stored value
+UPPER = 2  # the value of the node is at most the stored value
+
+# fields of an entry
+KEY = 0
+VALUE = 1
+DEPTH = 2
+BOUND = 3
+BEST_MOVE = 4
+GENERATION = 5
+
+# rough size (bytes) of a single entry, a tuple of the key, value, depth, bound, move and generation with its slot in
+# the list
+ENTRY_BYTES = 210
+DEFAULT_MAX_BYTES = 64 * 2 ** 20
+# the depth an entry loses for the depth-preferred replacement in every generation after its own
+AGE_DEPTH = 2
+
+
+def node_key(board: int, agent: int, value: int = 2) -> int:
+    # agent is one of 1..3 and value one of {2,4}, both fit in the 4 low bits under the board
+    return (board << 4) | (agent << 2) | (value >> 1)
+
+
+class TranspositionTable:
+    """Bounded table of searched nodes,
+    probe returns the entry stored for the key (or None), store keeps the entry by the replacement policy of the
+    bucket. hits, misses and collisions are counted for every probe.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        # the number of buckets is the biggest power of two which fits the memory cap
+        bits = 0
+        while 2 ** (bits + 1) * 2 * ENTRY_BYTES <= max_bytes:
+            bits += 1
+        buckets = 2 ** bits
+        self.max_bytes = max_bytes
+        self.shift = 64 - bits
+        self.entries = [None] * (2 * buckets)
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0
+        self.stores = 0
+
+    def _index(self, key):
+        # fold the key to 64 bits and take the top bits of its fibonacci hash as the bucket. the keys of the bigger
+        # boards (see bigboard.py) are first folded by xor of their 64 bits words, so all the rows count
+        while key >> 93:
+            key = (key & 0xFFFFFFFFFFFFFFFF) ^ (key >> 64)
+        key = (key ^ (key >> 29)) & 0xFFFFFFFFFFFFFFFF
+        return (((key * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF) >> self.shift) << 1
+
+    def probe(self, key):
+        index = self._index(key)
+        entries = self.entries
+        entry = entries[index]
+        if entry is not None and entry[KEY] == key:
+            self.hits += 1
+            return entry
+        other = entries[index + 1]
+        if other is not None and other[KEY] == key:
+            self.hits += 1
+            return other
+        self.misses += 1
+        # the bucket is taken by other positions
+        if entry is not None or other is not None:
+            self.collisions += 1
+        return None
+
+    def new_search(self):
+        # the entries stored from now on are of a new generation
+        self.generation += 1
+
+    def store(self, key, value, depth: int, bound: int = EXACT, best_move=None):
+        self.stores += 1
+        index = self._index(key)
+        entries = self.entries
+        preferred = entries[index]
+        entry = (key, value, depth, bound, best_move, self.generation)
+        if preferred is None or preferred[KEY] == key or \
+                depth + AGE_DEPTH * (self.generation - preferred[GENERATION]) >= preferred[DEPTH]:
+            entries[index] = entry
+        else:
+            entries[index + 1] = entry
+
+    def clear(self):
+        self.entries = [None] * len(self.entries)
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0
+        self.stores = 0
+
+    def stats(self):
+        probes = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'collisions': self.collisions, 'stores': self.stores,
+                'hit_rate': self.hits / probes if probes else 0.0,
+                'used': sum(1 for entry in self.entries if entry is not None), 'capacity': len(self.entries)}
@@ -0,0 +1,178 @@
+# Tuning of the weights of the heuristic features (see evaluation.py) by an evolution strategy.
+# the tuned weights are kept in log space, so they stay positive and a step changes them by a factor. every generation
+# samples candidates around the mean (the mean itself is the first candidate), every candidate plays headless games
+# (see simulator.py) as the move player against the index players, on all the cores. the games are played in rounds,
+# after every round the candidates that are clearly worse than the best one (by DROP_Z standard errors) are dropped
+# without playing the rest of their games. the mean moves to the average of the best candidates and the step shrinks.
+# all the candidates of a generation play the same seeds, so they are compared on the same games.
+# the state is saved to the checkpoint file after every round and a run with the same checkpoint goes on from there,
+# the best weights are written as a config file for the -weights option of main.py and simulator.py.
+#   python tuner.py -player1 ExpectimaxMovePlayer -opponents RandomIndexPlayer MiniMaxIndexPlayer -depth 2 \
+#       -generations 30 -population 12 -games 8 -checkpoint tuning.json -output weights.json
+import argparse
+import concurrent.futures
+import json
+import math
+import os
+import random
+import statistics
+import evaluation
+import players
+import simulator
+
+SIGMA = 0.3
+# the step is multiplied by SIGMA_DECAY every generation and doesn't go below MIN_SIGMA
+SIGMA_DECAY = 0.95
+MIN_SIGMA = 0.02
+# a candidate is dropped when its mean score is below the mean of the best candidate by DROP_Z standard errors of both
+DROP_Z = 2.0
+
+
+def _play_game(task):
+    k, g, kwargs = task
+    return k, g, simulator.play_game(**kwargs)['score']
+
+
+def to_weights(features, point, base):
+    # the weights of a point in log space, the features that are not tuned keep their weights of base
+    return dict(base, **{name: round(math.exp(x), 3) for name, x in zip(features, point)})
+
+
+def sample(mean, sigma, population, rng):
+    return [list(mean)] + [[x + sigma * rng.gauss(0.0, 1.0) for x in mean] for _ in range(population - 1)]
+
+
+def _stats(scores):
+    mean = statistics.mean(scores)
+    error = statistics.stdev(scores) / math.sqrt(len(scores)) if len(scores) > 1 else float('inf')
+    return mean, error
+
+
+def surviving(scores, dropped):
+    # the candidates that are not dropped after a round, by the racing rule of DROP_Z
+    alive = [k for k in range(len(scores)) if k not in dropped and scores[k]]
+    if not alive:
+        return set()
+    stats = {k: _stats(scores[k]) for k in alive}
+    best = max(alive, key=lambda k: stats[k][0])
+    low = stats[best][0] - DROP_Z * stats[best][1]
+    return {k for k in alive if stats[k][0] + DROP_Z * stats[k][1] >= low}
+
+
+def load_state(path):
+    if path is None or not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_state(path, state):
+    # written to a temporary file first, so an interrupted save doesn't lose the checkpoint
+    if path is None:
+        return
+    with open(path + '.tmp', 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+def tune(move_player: str, opponents, features, generations: int, population: int, parents: int, games: int,
+         round_games: int, depth: int = None, move_time: float = 1.0, max_moves: int = None, workers: int = 1,
+         seed: int = 0, checkpoint: str = None, output: str = None, base=None):
+    """tune the weights of features for move_player against the opponents (names of players.index_players) and
+    return the state of the tuning, with the best weights found in state['best']. with checkpoint the state is saved
+    after every round of games and the tuning goes on from a saved state. the best weights are written to output.
+    """
+    base = dict(base if base is not None else evaluation.default_weights())
+    state = load_state(checkpoint)
+    if state is None:
+        state = {'features': list(features), 'base': base, 'generation': 0,
+                 'mean': [math.log(max(base[name], 1)) for name in features], 'sigma': SIGMA,
+                 'candidates': None, 'scores': None, 'dropped': [], 'best': None, 'history': []}
+    elif state['features'] != list(features):
+        raise ValueError(f'the checkpoint {checkpoint} tunes the features {state["features"]}')
+    features, base = state['features'], state['base']
+    pool = concurrent.futures.ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        while state['generation'] < generations:
+            generation = state['generation']
+            if state['candidates'] is None:
+                rng = random.Random(seed * 1000003 + generation)
+                state['candidates'] = sample(state['mean'], state['sigma'], population, rng)
+                state['scores'] = [[] for _ in state['candidates']]
+                state['dropped'] = []
+            candidates, scores = state['candidates'], state['scores']
+            seeds = [seed + generation * games + g for g in range(games)]
+            for round_end in range(round_games, games + round_games, round_games):
+                round_end = min(round_end, games)
+                tasks = [(k, g, dict(move_player=move_player, index_player=opponents[g % len(opponents)],
+                                     seed=seeds[g], move_time=move_time, depth=depth, max_moves=max_moves,
+                                     move_weights=to_weights(features, candidates[k], base)))
+                         for k in range(len(candidates)) if k not in state['dropped']
+                         for g in range(len(scores[k]), round_end)]
+                if not tasks:
+                    continue
+                results = map(_play_game, tasks) if pool is None else pool.map(_play_game, tasks)
+                for k, g, score in sorted(results):
+                    scores[k].append(score)
+                alive = surviving(scores, state['dropped'])
+                state['dropped'] = [k for k in range(len(candidates)) if k not in alive]
+                save_state(checkpoint, state)
+            # the surviving candidates by their mean score first, then the dropped ones
+            ranked = sorted(range(len(candidates)),
+                            key=lambda k: (k not in state['dropped'], statistics.mean(scores[k])), reverse=True)
+            chosen = ranked[:parents]
+            state['mean'] = [statistics.mean(candidates[k][i] for k in chosen) for i in range(len(features))]
+            best = ranked[0]
+            best_score = statistics.mean(scores[best])
+            entry = {'generation': generation, 'sigma': state['sigma'], 'best_score': best_score,
+                     'mean_score': statistics.mean(scores[0]), 'dropped': len(state['dropped']),
+                     'best_weights': to_weights(features, candidates[best], base)}
+            state['history'].append(entry)
+            if state['best'] is None or best_score > state['best']['score']:
+                state['best'] = {'generation': generation, 'score': best_score, 'weights': entry['best_weights']}
+                if output is not None:
+                    with open(output, 'w') as f:
+                        json.dump(state['best']['weights'], f, indent=2)
+            print(f"generation {generation}: best {best_score:.0f}, mean candidate {entry['mean_score']:.0f}, "
+                  f"{entry['dropped']} dropped, sigma {state['sigma']:.3f}")
+            state['sigma'] = max(MIN_SIGMA, state['sigma'] * SIGMA_DECAY)
+            state['generation'] = generation + 1
+            state['candidates'] = state['scores'] = None
+            state['dropped'] = []
+            save_state(checkpoint, state)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return state
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-player1', default='ExpectimaxMovePlayer', type=str,
+                        help='The move player whose weights are tuned.', choices=players.move_players.keys())
+    parser.add_argument('-opponents', default=['RandomIndexPlayer', 'MiniMaxIndexPlayer'], nargs='+',
+                        help='The index players of the games, in turns.', choices=players.index_players.keys())
+    parser.add_argument('-features', default=list(evaluation.DEFAULT_WEIGHTS), nargs='+',
+                        help='The tuned features, the others keep their weights.', choices=evaluation.FEATURES.keys())
+    parser.add_argument('-weights', default=None, type=str,
+                        help='Config file of the starting weights (the default weights if not given).')
+    parser.add_argument('-generations', default=30, type=int, help='Number of generations.')
+    parser.add_argument('-population', default=12, type=int, help='Candidates of every generation.')
+    parser.add_argument('-parents', default=4, type=int, help='Best candidates the next mean is made of.')
+    parser.add_argument('-games', default=8, type=int, help='Games of every candidate in a generation.')
+    parser.add_argument('-round_games', default=2, type=int,
+                        help='Games of every candidate between the checks that drop the bad candidates.')
+    parser.add_argument('-depth', default=2, type=int, help='Fixed search depth of the games (0 for -move_time).')
+    parser.add_argument('-move_time', default=0.1, type=float, help='Time (sec) for each turn without -depth.')
+    parser.add_argument('-max_moves', default=None, type=int, help='Games are cut after this number of moves.')
+    parser.add_argument('-workers', default=os.cpu_count(), type=int, help='Number of processes playing games.')
+    parser.add_argument('-seed', default=0, type=int, help='Seed of the candidates and of the games.')
+    parser.add_argument('-checkpoint', default='tuning.json', type=str, help='File of the state of the tuning.')
+    parser.add_argument('-output', default='weights.json', type=str, help='File to write the best weights (json).')
+    args = parser.parse_args()
+
+    state = tune(args.player1, args.opponents, args.features, args.generations, args.population, args.parents,
+                 args.games, args.round_games, args.depth or None, args.move_time, args.max_moves, args.workers,
+                 args.seed, args.checkpoint, args.output,
+                 evaluation.load_weights(args.weights) if args.weights else None)
+    print(json.dumps(state['best'], indent=2))